@@ -1,5 +1,8 @@
-from typing import Dict, Any
-import os
+from typing import Dict, Any, List, Optional
+import asyncio
+import re
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from loguru import logger
 
@@ -8,19 +11,26 @@ from pipecat.services.llm_service import FunctionCallParams
 from pipecat.transcriptions.language import Language
 
 print("🚀 Starting Pipecat bot...")
-print("⏳ Loading models and imports (20 seconds, first run only)\n")
+print("⏳ Loading imports (VAD and smart-turn models are loaded once at startup, see app/services/voice_models.py)\n")
 
 from pipecat.adapters.schemas.tools_schema import ToolsSchema
-from pipecat.audio.turn.smart_turn.local_smart_turn_v3 import LocalSmartTurnAnalyzerV3
-logger.info("✅ Local Smart Turn Analyzer V3 loaded")
-logger.info("Loading Silero VAD model...")
-
-from pipecat.audio.vad.silero import SileroVADAnalyzer
-
-logger.info("✅ Silero VAD model loaded")
-
 from pipecat.audio.vad.vad_analyzer import VADParams
-from pipecat.frames.frames import Frame, LLMMessagesAppendFrame, LLMRunFrame, TranscriptionFrame
+from pipecat.frames.frames import (
+    Frame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    InterimTranscriptionFrame,
+    LLMMessagesAppendFrame,
+    LLMRunFrame,
+    LLMTextFrame,
+    MetricsFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.metrics.metrics import TTFBMetricsData
+from pipecat.observers.base_observer import BaseObserver, FramePushed
 
 logger.info("Loading pipeline components...")
 
@@ -33,9 +43,6 @@ from pipecat.processors.aggregators.llm_response_universal import LLMContextAggr
 from pipecat.processors.frameworks.rtvi import RTVIConfig, RTVIObserver, RTVIProcessor
 from pipecat.runner.types import RunnerArguments, WebSocketRunnerArguments
 from pipecat.serializers.protobuf import ProtobufFrameSerializer
-from pipecat.services.deepgram.stt import DeepgramSTTService
-from pipecat.services.groq.llm import GroqLLMService
-from pipecat.services.cartesia.tts import CartesiaTTSService
 from pipecat.transports.base_transport import BaseTransport
 from pipecat.transports.websocket.fastapi import (
     FastAPIWebsocketParams,
@@ -43,9 +50,17 @@ from pipecat.transports.websocket.fastapi import (
 )
 
 from pipecat.processors.frameworks.rtvi import RTVIServerMessageFrame
-from deepgram import LiveOptions
 from pipecat.adapters.schemas.function_schema import FunctionSchema
-from app.services.rag import RAGService
+from app.metrics import (
+    KB_PREFETCH_LOOKUPS,
+    KB_PREFETCH_SAVED_SECONDS,
+    VOICE_SERVICE_TTFB_SECONDS,
+    VOICE_SESSIONS,
+    VOICE_TURN_STAGE_SECONDS,
+)
+from app.models.rag import RetrievalResult
+from app.services.rag import RAGService, normalize_query
+from app.services.registry import ServiceRegistry
 from app.config import settings
 from datetime import datetime
 
@@ -66,12 +81,258 @@ class TextCaptureProcessor(FrameProcessor):
         await self.push_frame(frame, direction)
 
 
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from how i if in is it me my "
+    "of on or please so tell that the this to was what when where which who why will "
+    "with would you your".split()
+)
+
+
+def _content_words(text: str) -> frozenset[str]:
+    return frozenset(w for w in re.findall(r"[a-z0-9]+", normalize_query(text)) if w not in _STOPWORDS)
+
+
+def _query_similarity(query: frozenset[str], transcript: frozenset[str]) -> float:
+    """How well a transcript's retrieval can stand in for `query`.
+
+    The LLM usually rephrases the caller's words into a shorter query, so
+    containment of the query in the transcript counts as much as Jaccard.
+    """
+    if not query or not transcript:
+        return 0.0
+    shared = len(query & transcript)
+    return max(shared / len(query), shared / len(query | transcript))
+
+
+class _Prefetch:
+    def __init__(self, text: str, task: asyncio.Task):
+        self.text = text
+        self.words = _content_words(text)
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+
+class KnowledgePrefetchProcessor(FrameProcessor):
+    """Starts knowledge-base retrieval from user transcriptions before the LLM asks for it.
+
+    Sits after STT. Interim and final transcripts start a retrieval in the
+    background; `lookup` hands a finished (or in-flight) result to the tool
+    handler when the LLM's query is close enough to what the caller said.
+    Superseded prefetches are cancelled, as is everything in flight when the
+    caller starts speaking again.
+    """
+
+    def __init__(self, rag_service: RAGService, equipment_id: str, tenant_id: str, k: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.rag_service = rag_service
+        self.equipment_id = equipment_id
+        self.tenant_id = tenant_id
+        self.k = k
+        self._prefetches: "OrderedDict[str, _Prefetch]" = OrderedDict()
+        self._current: Optional[_Prefetch] = None
+        self.stats = {"started": 0, "cancelled": 0, "hits": 0, "misses": 0, "saved_ms": 0.0}
+        self._labels = {"equipment_id": equipment_id, "tenant_id": tenant_id}
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, UserStartedSpeakingFrame):
+            self._cancel_in_flight()
+        elif isinstance(frame, TranscriptionFrame):
+            self._prefetch(frame.text, final=True)
+        elif isinstance(frame, InterimTranscriptionFrame):
+            self._prefetch(frame.text, final=False)
+        await self.push_frame(frame, direction)
+
+    def _prefetch(self, text: str, final: bool) -> None:
+        key = normalize_query(text or "")
+        words = _content_words(key)
+        if not key or key in self._prefetches or len(words) < settings.KB_PREFETCH_MIN_WORDS:
+            return
+
+        current = self._current
+        if current is not None and not current.task.done():
+            if not final and len(words - current.words) < settings.KB_PREFETCH_MIN_NEW_WORDS:
+                return
+            # Superseded by a longer or final transcript
+            current.task.cancel()
+            self._prefetches.pop(normalize_query(current.text), None)
+            self.stats["cancelled"] += 1
+
+        prefetch = _Prefetch(text, self.create_task(self._retrieve(text), name="kb-prefetch"))
+        self._prefetches[key] = prefetch
+        self._current = prefetch
+        self.stats["started"] += 1
+        while len(self._prefetches) > max(1, settings.KB_PREFETCH_CACHE_SIZE):
+            _, evicted = self._prefetches.popitem(last=False)
+            if not evicted.task.done():
+                evicted.task.cancel()
+                self.stats["cancelled"] += 1
+
+    async def _retrieve(self, text: str) -> Optional[RetrievalResult]:
+        started = time.perf_counter()
+        try:
+            result = await self.rag_service.retrieve(
+                query=text,
+                k=self.k,
+                equipment_id=self.equipment_id,
+                tenant_id=self.tenant_id,
+            )
+        except Exception as e:
+            logger.warning(f"Knowledge prefetch failed: {e}")
+            return None
+        prefetch = self._prefetches.get(normalize_query(text))
+        if prefetch is not None:
+            prefetch.duration_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    @staticmethod
+    def _failed(prefetch: _Prefetch) -> bool:
+        task = prefetch.task
+        return task.done() and (task.cancelled() or task.result() is None)
+
+    def _cancel_in_flight(self) -> None:
+        for key, prefetch in list(self._prefetches.items()):
+            if not prefetch.task.done():
+                prefetch.task.cancel()
+                del self._prefetches[key]
+                self.stats["cancelled"] += 1
+
+    async def lookup(self, query: str) -> Optional[RetrievalResult]:
+        """Prefetched retrieval close enough to `query`, waiting for it if still running; None on a miss"""
+        words = _content_words(query)
+        best: Optional[_Prefetch] = None
+        best_score = settings.KB_PREFETCH_MATCH_THRESHOLD
+        # Newest first so a later, fuller transcript wins ties
+        for prefetch in reversed(self._prefetches.values()):
+            if self._failed(prefetch):
+                continue
+            score = _query_similarity(words, prefetch.words)
+            if score > best_score or (best is None and score >= best_score):
+                best, best_score = prefetch, score
+
+        if best is None:
+            self._miss()
+            return None
+
+        waited_from = time.perf_counter()
+        await asyncio.wait({best.task})
+        if self._failed(best):
+            self._miss()
+            return None
+
+        # Time the tool call did not have to spend on retrieval
+        retrieval_ms = best.duration_ms or (time.perf_counter() - best.started_at) * 1000
+        saved_ms = max(0.0, retrieval_ms - (time.perf_counter() - waited_from) * 1000)
+        self.stats["hits"] += 1
+        self.stats["saved_ms"] += saved_ms
+        KB_PREFETCH_LOOKUPS.labels(result="hit", **self._labels).inc()
+        KB_PREFETCH_SAVED_SECONDS.labels(**self._labels).observe(saved_ms / 1000)
+        logger.debug(f"Knowledge prefetch hit (score={best_score:.2f}, saved={saved_ms:.0f}ms): '{best.text[:50]}'")
+        return best.task.result()
+
+    def _miss(self) -> None:
+        self.stats["misses"] += 1
+        KB_PREFETCH_LOOKUPS.labels(result="miss", **self._labels).inc()
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 1),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    async def cleanup(self):
+        await super().cleanup()
+        for prefetch in self._prefetches.values():
+            if not prefetch.task.done():
+                await self.cancel_task(prefetch.task)
+        self._prefetches.clear()
+
+
+class TurnLatencyObserver(BaseObserver):
+    """Records where each user turn's response time goes.
+
+    A turn starts when the user stops speaking and ends at the first TTS
+    audio. Stages, in seconds:
+    - stt: stop to the final transcript (0 if it arrived first)
+    - llm_first_token: final transcript to the first LLM token
+    - tool: each knowledge-base call
+    - tts_first_audio: first LLM token to the first TTS audio
+    - total: stop to the first TTS audio
+    Pipecat TTFB metrics for each service are exported as well.
+    """
+
+    def __init__(self, stt: FrameProcessor, llm: FrameProcessor, tts: FrameProcessor, equipment_id: str, tenant_id: str, **kwargs):
+        super().__init__(**kwargs)
+        self._stt, self._llm, self._tts = stt, llm, tts
+        self._labels = {"equipment_id": equipment_id, "tenant_id": tenant_id}
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._stopped_at: Optional[int] = None
+        self._final_at: Optional[int] = None
+        self._first_token_at: Optional[int] = None
+        self._tool_started: Dict[str, int] = {}
+
+    def _first_sighting(self, frame: Frame) -> bool:
+        # Observers see a frame once per hop; only the first counts
+        if frame.id in self._seen:
+            return False
+        self._seen[frame.id] = None
+        if len(self._seen) > 256:
+            self._seen.popitem(last=False)
+        return True
+
+    def _observe(self, stage: str, start_ns: int, end_ns: int) -> None:
+        VOICE_TURN_STAGE_SECONDS.labels(stage=stage, **self._labels).observe(max(0, end_ns - start_ns) / 1e9)
+
+    async def on_push_frame(self, data: FramePushed):
+        frame, ts = data.frame, data.timestamp
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if self._first_sighting(frame):
+                self._stopped_at = self._final_at = self._first_token_at = None
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            if self._first_sighting(frame):
+                self._stopped_at, self._first_token_at = ts, None
+                if self._final_at is not None:
+                    # Deepgram finalized before the turn detector fired
+                    self._observe("stt", ts, ts)
+                    self._final_at = ts
+        elif isinstance(frame, TranscriptionFrame):
+            if data.source is self._stt and self._first_sighting(frame):
+                if self._stopped_at is not None and self._final_at is None:
+                    self._observe("stt", self._stopped_at, ts)
+                self._final_at = ts
+        elif isinstance(frame, LLMTextFrame):
+            if data.source is self._llm and self._stopped_at is not None and self._first_token_at is None:
+                self._first_token_at = ts
+                self._observe("llm_first_token", self._final_at or self._stopped_at, ts)
+        elif isinstance(frame, FunctionCallInProgressFrame):
+            self._tool_started.setdefault(frame.tool_call_id, ts)
+        elif isinstance(frame, FunctionCallResultFrame):
+            started = self._tool_started.pop(frame.tool_call_id, None)
+            if started is not None:
+                self._observe("tool", started, ts)
+        elif isinstance(frame, TTSAudioRawFrame):
+            if data.source is self._tts and self._stopped_at is not None:
+                self._observe("tts_first_audio", self._first_token_at or self._stopped_at, ts)
+                self._observe("total", self._stopped_at, ts)
+                self._stopped_at = self._final_at = self._first_token_at = None
+        elif isinstance(frame, MetricsFrame):
+            if self._first_sighting(frame):
+                for metric in frame.data:
+                    if isinstance(metric, TTFBMetricsData) and metric.value:
+                        service = re.sub(r"#\d+$", "", metric.processor)
+                        VOICE_SERVICE_TTFB_SECONDS.labels(service=service, **self._labels).observe(metric.value)
+
+
 logger.info("✅ All components loaded successfully!")
 
 load_dotenv(override=True)
 
 
-async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
+async def run_bot(transport: BaseTransport, runner_args: RunnerArguments, services: ServiceRegistry):
     logger.info(f"Starting bot")
     body: Dict[str, Any] = runner_args.body
     equipment_id: str = body.get("equipment_id", "")
@@ -79,34 +340,47 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
     session_id: str = body.get("session_id", "")
     user_id: str = body.get("user_id", settings.USER_ID)
 
-    live_options = LiveOptions(
-        diarize=True
-    )
-    stt = DeepgramSTTService(
-        api_key=os.getenv("DEEPGRAM_API_KEY"),
-        live_options=live_options,
-    )
+    stt = services.voice_services.stt()
 
     rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
+    rag_service = services.rag_service
+    prefetch = KnowledgePrefetchProcessor(
+        rag_service,
+        equipment_id=equipment_id,
+        tenant_id=tenant_id,
+    ) if settings.KB_PREFETCH_ENABLED else None
 
     async def search_knowledge_base(params: FunctionCallParams):
         try:
-            query = params.arguments.get("query", "")
-            rag_service = RAGService()
-            retrieval_result = await rag_service.retrieve(
-                query=query, 
-                k=5, 
-                equipment_id=equipment_id, 
-                tenant_id=tenant_id
-            )
+            queries = [params.arguments.get("query", "")] + list(params.arguments.get("queries") or [])
+            queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+
+            retrieval_results: List[Optional[RetrievalResult]] = [
+                await prefetch.lookup(query) if prefetch else None
+                for query in queries
+            ]
+            missing = [index for index, result in enumerate(retrieval_results) if result is None]
+            if missing:
+                fetched = await rag_service.retrieve_many(
+                    [queries[index] for index in missing],
+                    equipment_id=equipment_id,
+                    tenant_id=tenant_id,
+                )
+                for index, result in zip(missing, fetched):
+                    retrieval_results[index] = result
+
+            # One list across queries, without repeating chunks several queries found
+            chunks = {}
+            for retrieval_result in retrieval_results:
+                for chunk, meta in zip(retrieval_result.data, retrieval_result.metadata.chunks):
+                    chunks.setdefault(meta.chunk_id, (chunk, meta))
 
             clean_data = [
                 {
                     "id": meta.chunk_id,
                     "content": chunk.text,
                 }
-                for chunk, meta in zip(retrieval_result.data,
-                                    retrieval_result.metadata.chunks)
+                for chunk, meta in chunks.values()
             ]
 
             await params.result_callback({"results": clean_data})
@@ -121,10 +395,7 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
                                 "text": chunk.text,
                                 "metadata": meta.model_dump()
                             }
-                            for chunk, meta in zip(
-                                retrieval_result.data,
-                                retrieval_result.metadata.chunks
-                            )
+                            for chunk, meta in chunks.values()
                         ]
                     }
                 )
@@ -138,15 +409,18 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
     search_tool = FunctionSchema(
         name="search_knowledge_base",
         description="Search the knowledge base for relevant information",
-        properties={"query": {"type": "string"}},
-        required=["query"]
+        properties={
+            "query": {"type": "string"},
+            "queries": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Several independent searches to run in this one call",
+            },
+        },
+        required=[]
     )
 
-    llm = GroqLLMService(
-        api_key=os.getenv("GROQ_API_KEY"),
-        model=settings.GROQ_MODEL,
-        base_url=settings.GROQ_BASE_URL,
-    )
+    llm = services.voice_services.llm()
 
     llm.register_function(
         "search_knowledge_base",
@@ -171,6 +445,7 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
 
                 Knowledge base rules:
                 - When the customer asks a question or seeks information, call the `search_knowledge_base` tool.
+                - If you need several searches, pass them all in `queries` in a single call.
                 - Use ONLY facts returned from the knowledge base to answer questions.
                 - If the knowledge base lacks the answer, briefly suggest that the agent apologize and ask for clarification.
                 - NEVER invent or guess information.
@@ -188,16 +463,14 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
     context = LLMContext(messages, tools=ToolsSchema(standard_tools=[search_tool]))
     context_aggregator = LLMContextAggregatorPair(context)
 
-    tts = CartesiaTTSService(
-        api_key=os.getenv("CARTESIA_API_KEY"),
-        voice_id="71a7ad14-091c-4e8e-a314-022ece01c121",  # British Reading Lady
-    )
+    tts = services.voice_services.tts()
 
     pipeline = Pipeline([
         transport.input(),
         rtvi,  # RTVI processor
         TextCaptureProcessor(),
         stt,
+        *([prefetch] if prefetch else []),  # Knowledge-base retrieval from transcripts
         context_aggregator.user(),  # User responses
         llm,  # LLM
         tts, # TTS
@@ -207,6 +480,7 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
 
     observers = [
         RTVIObserver(rtvi),
+        TurnLatencyObserver(stt, llm, tts, equipment_id=equipment_id, tenant_id=tenant_id),
     ]
 
     task = PipelineTask(
@@ -234,38 +508,46 @@ async def run_bot(transport: BaseTransport, runner_args: RunnerArguments):
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport, client):
         logger.info(f"Client disconnected")
+        if prefetch:
+            logger.info(f"Knowledge prefetch stats: {prefetch.summary()}")
         await task.cancel()
 
     runner = PipelineRunner(handle_sigint=runner_args.handle_sigint)
 
-
-
+    sessions_gauge = VOICE_SESSIONS.labels(equipment_id=equipment_id, tenant_id=tenant_id)
+    sessions_gauge.inc()
     try:
         await runner.run(task)
     except Exception as e:
         logger.error(f"Error in bot: {e}")
         raise e
+    finally:
+        sessions_gauge.dec()
 
 
-async def bot(runner_args: WebSocketRunnerArguments):
+async def bot(runner_args: WebSocketRunnerArguments, services: ServiceRegistry | None = None):
+    # Standalone runs (`python -m app.bot`) have no app lifespan to build the registry
+    services = services or ServiceRegistry()
+    # No-op once the lifespan warm-up has finished
+    await services.voice_models.wait_ready()
     transport = FastAPIWebsocketTransport(
         websocket=runner_args.websocket,
         params=FastAPIWebsocketParams(
             audio_in_enabled=True,
             audio_out_enabled=True,
             add_wav_header=False,
-            vad_analyzer=SileroVADAnalyzer(params=VADParams(
+            vad_analyzer=services.voice_models.vad_analyzer(params=VADParams(
                 stop_secs=0.5,
                 start_secs=0.1,
                 min_volume=0.5
             )),
             serializer=ProtobufFrameSerializer(),
-            turn_analyzer=LocalSmartTurnAnalyzerV3(),
+            turn_analyzer=services.voice_models.turn_analyzer(),
         ),
     )
 
     try:
-        await run_bot(transport, runner_args)
+        await run_bot(transport, runner_args, services)
     except Exception as e:
         logger.error(f"Error in bot: {e}")
         raise e
@@ -15,10 +15,76 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str = "models/text-embedding-004"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 250
+    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 3
+    EMBEDDING_RETRY_BACKOFF_SECS: float = 0.5
+    EMBEDDING_HTTP_MAX_CONNECTIONS: int = 20
+    EMBEDDING_HTTP_KEEPALIVE_SECS: float = 60
+    EMBEDDING_HTTP_TIMEOUT_SECS: float = 30
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_CACHE_TTL_SECS: float = 3600
+    KB_PREFETCH_ENABLED: bool = True
+    KB_PREFETCH_MIN_WORDS: int = 3  # content words an interim transcript needs before it is prefetched
+    KB_PREFETCH_MIN_NEW_WORDS: int = 2  # new content words before an interim supersedes the running prefetch
+    KB_PREFETCH_MATCH_THRESHOLD: float = 0.6
+    KB_PREFETCH_CACHE_SIZE: int = 8
     VECTOR_INDEX_NAME: str = "vector_index"
+    VECTOR_INDEX_DIMENSIONS: int = 768  # used when the vector index has to be created
+    INDEX_MANAGEMENT_ENABLED: bool = True  # create / verify indexes at startup (app/services/indexes.py)
+    INDEX_FAIL_FAST: bool = True  # refuse to start if a hot query would collection-scan or the vector index is unusable
+    VECTOR_STORE_BACKEND: str = "atlas"  # "atlas" or "numpy" (in-process, no Atlas needed)
+    NUMPY_VECTOR_MAX_PARTITIONS: int = 256  # least recently searched equipment are evicted past either limit
+    NUMPY_VECTOR_MAX_CHUNKS: int = 200_000
     DOCUMENT_CHUNKS_COLLECTION: str = "document_chunks"
+    LEXICAL_INDEX_ENABLED: bool = True  # BM25 over chunk text: exact code lookups and fusion with vector results
+    LEXICAL_INDEX_REFRESH_SECS: float = 300  # reload partitions to pick up other processes' ingestion; 0 never
+    LEXICAL_INDEX_MAX_PARTITIONS: int = 256  # least recently searched equipment are evicted past either limit
+    LEXICAL_INDEX_MAX_CHUNKS: int = 200_000
+    RETRIEVAL_RRF_K: int = 60
+    RETRIEVAL_CONCURRENCY: int = 8  # concurrent vector searches in RAGService.retrieve_many
+    RETRIEVAL_DEFAULT_K: int = 5
+    RETRIEVAL_NUM_CANDIDATES_MULTIPLIER: int = 5  # numCandidates = k * this, unless tuned
+    RETRIEVAL_TUNING_ENABLED: bool = True  # use per corpus-size settings from `python -m scripts.tune_retrieval`
+    RETRIEVAL_TUNING_COLLECTION: str = "retrieval_tuning"
+    RETRIEVAL_TUNING_REFRESH_SECS: float = 300
+    LIST_PAGE_SIZE: int = 100  # default page size of equipment / document listings
+    LIST_MAX_PAGE_SIZE: int = 1000
+    EQUIPMENT_CACHE_SIZE: int = 1024
+    EQUIPMENT_CACHE_TTL_SECS: float = 60  # bounds staleness of equipment changed by another process
+    EXPORT_BATCH_SIZE: int = 500  # rows per Mongo batch and per streamed chunk in exports
+    EMBEDDING_STORE_COLLECTION: str = "embedding_store"
+    EMBEDDING_STORAGE_FORMAT: str = "array"  # "array", "float32" or "int8"; see app/services/vector_codec.py
     TENANT_ID: str = "mvp_tenant"
 
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MAX_UPLOAD_SIZE_BYTES: int = 200 * 1024 * 1024
+    INGESTION_WORKERS: int = 2
+    INGESTION_LEASE_SECS: float = 120  # a claimed job whose lease lapses is picked up by another worker
+    INGESTION_LEASE_RENEW_SECS: float = 30
+    PDF_EXTRACTION_WORKERS: int = 2  # 0 extracts PDFs serially in-process
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    PDF_PAGES_PER_TASK: int = 8
+    PDF_PAGE_TIMEOUT_SECS: float = 30
+
+    TRACING_ENABLED: bool = True
+    TRACING_SLOW_SPAN_MS: float = 2000
+    TRACING_OTEL_ENABLED: bool = False  # needs opentelemetry-api (and an SDK/exporter) installed
+
+    MAX_CONCURRENT_SESSIONS: int = 50
+    SESSION_QUEUE_SIZE: int = 10
+    SESSION_QUEUE_TIMEOUT_SECS: float = 5
+    SESSION_RETRY_AFTER_SECS: float = 5
+    OVERFLOW_BACKEND_URL: str = ""  # base URL of another pool to send callers to when this process is full
+
+    VOICE_INFERENCE_BATCHING: bool = True  # batch VAD / smart-turn ONNX calls across sessions
+    VOICE_INFERENCE_MAX_BATCH: int = 64
+    VOICE_INFERENCE_MAX_WAIT_MS: float = 4
+    VOICE_MODELS_LOAD_ATTEMPTS: int = 3  # after the last failure /ready reports "failed" until restart
+    VOICE_MODELS_RETRY_BACKOFF_SECS: float = 2  # doubled after each failed attempt
+
     USER_ID: str = "mvp_user"
 
     class Config:
@@ -0,0 +1,133 @@
+"""Prometheus metrics, scraped from GET /metrics"""
+from typing import Any, Callable, Dict, Iterable, Mapping
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from app.services.admission import SessionAdmission
+
+# Voice turns run from a few hundred ms to several seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0)
+
+VOICE_TURN_STAGE_SECONDS = Histogram(
+    "voice_turn_stage_seconds",
+    "Per-turn voice latency by stage: stt, llm_first_token, tool, tts_first_audio, total",
+    ["stage", "equipment_id", "tenant_id"],
+    buckets=LATENCY_BUCKETS,
+)
+
+VOICE_SERVICE_TTFB_SECONDS = Histogram(
+    "voice_service_ttfb_seconds",
+    "Time to first byte reported by pipecat services (STT, LLM, TTS)",
+    ["service", "equipment_id", "tenant_id"],
+    buckets=LATENCY_BUCKETS,
+)
+
+SPAN_SECONDS = Histogram(
+    "span_duration_seconds",
+    "Duration of traced spans (see app/tracing.py)",
+    ["span"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+EQUIPMENT_CACHE_LOOKUPS = Counter(
+    "equipment_cache_lookups",
+    "Equipment lookups by result: hit, miss (queried Mongo) or coalesced (joined an in-flight query)",
+    ["result"],
+)
+
+KB_PREFETCH_LOOKUPS = Counter(
+    "kb_prefetch_lookups",
+    "Knowledge-base tool calls by result: hit (served by a transcript prefetch) or miss",
+    ["result", "equipment_id", "tenant_id"],
+)
+
+KB_PREFETCH_SAVED_SECONDS = Histogram(
+    "kb_prefetch_saved_seconds",
+    "Retrieval time a prefetch hit saved the knowledge-base tool call",
+    ["equipment_id", "tenant_id"],
+    buckets=LATENCY_BUCKETS,
+)
+
+VOICE_SESSIONS = Gauge(
+    "voice_sessions",
+    "Voice pipelines currently running",
+    ["equipment_id", "tenant_id"],
+)
+
+
+class AdmissionCollector(Collector):
+    """Reads the session admission counters at scrape time"""
+
+    def __init__(self, admission: SessionAdmission):
+        self.admission = admission
+
+    def collect(self) -> Iterable[Metric]:
+        admission = self.admission
+        yield GaugeMetricFamily("voice_sessions_active", "Voice sessions holding a slot", value=admission.active)
+        yield GaugeMetricFamily("voice_sessions_queued", "Voice sessions waiting for a slot", value=admission.queued)
+        yield GaugeMetricFamily("voice_sessions_max", "Voice session slots per process", value=admission.max_sessions)
+        yield CounterMetricFamily("voice_sessions_admitted", "Voice sessions admitted", value=admission.admitted_total)
+        yield CounterMetricFamily("voice_sessions_rejected", "Voice sessions rejected at capacity", value=admission.rejected_total)
+        yield CounterMetricFamily("voice_sessions_redirected", "Connects sent to the overflow pool", value=admission.redirected_total)
+
+
+_admission_collector: AdmissionCollector | None = None
+
+
+def register_admission(admission: SessionAdmission) -> None:
+    """Export `admission` counters; replaces a previously registered one"""
+    global _admission_collector
+    unregister_admission()
+    _admission_collector = AdmissionCollector(admission)
+    REGISTRY.register(_admission_collector)
+
+
+def unregister_admission() -> None:
+    global _admission_collector
+    if _admission_collector is not None:
+        REGISTRY.unregister(_admission_collector)
+        _admission_collector = None
+
+
+class CacheCollector(Collector):
+    """Reads in-process cache counters (`TTLCache.stats()` shape) at scrape time, labelled by cache name"""
+
+    def __init__(self, caches: Mapping[str, Callable[[], Dict[str, Any]]]):
+        self.caches = dict(caches)
+
+    def collect(self) -> Iterable[Metric]:
+        hits = CounterMetricFamily("cache_hits", "Cache lookups served from the cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that missed or found an expired entry", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries held, including expired ones not yet evicted", labels=["cache"])
+        maxsize = GaugeMetricFamily("cache_max_entries", "Entries held before the least recently used is evicted", labels=["cache"])
+        for name, stats in self.caches.items():
+            values = stats()
+            hits.add_metric([name], values["hits"])
+            misses.add_metric([name], values["misses"])
+            size.add_metric([name], values["size"])
+            maxsize.add_metric([name], values["maxsize"])
+        yield from (hits, misses, size, maxsize)
+
+
+_cache_collector: CacheCollector | None = None
+
+
+def register_caches(caches: Mapping[str, Callable[[], Dict[str, Any]]]) -> None:
+    """Export each cache's `stats()` under its name; replaces previously registered caches"""
+    global _cache_collector
+    unregister_caches()
+    _cache_collector = CacheCollector(caches)
+    REGISTRY.register(_cache_collector)
+
+
+def unregister_caches() -> None:
+    global _cache_collector
+    if _cache_collector is not None:
+        REGISTRY.unregister(_cache_collector)
+        _cache_collector = None
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
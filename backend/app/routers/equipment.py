@@ -1,24 +1,35 @@
+import asyncio
+import hashlib
 import os
-import tempfile
-import uuid
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, status, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, File, Form, Query, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.database import get_database
 from app.models.equipment import Equipment
 from app.models.document import Document
 from app.config import settings
-from app.services.text_extraction import TextExtractionService
-from app.services.embeddings import EmbeddingService
+from app.services.ingestion import serialize_job
+from app.services.listing import (
+    DOCUMENT_LIST_FIELDS,
+    EQUIPMENT_LIST_FIELDS,
+    keyset_page,
+    stream_json_array,
+    stream_json_page,
+    to_json,
+)
+from app.services.registry import ServiceRegistry, get_services
+from app.tracing import span
 
 
 router = APIRouter()
 
 @router.post("/", response_model = Equipment, status_code =status.HTTP_201_CREATED)
-async def create_equipment(equipment: Equipment):
+async def create_equipment(equipment: Equipment, services: ServiceRegistry = Depends(get_services)):
     """create a new equipment"""
     db = await get_database()
 
@@ -34,30 +45,55 @@ async def create_equipment(equipment: Equipment):
 
     # Insert into database
     result = await db.equipment.insert_one(equipment_dict)
+    services.equipment_cache.invalidate(str(result.inserted_id))
     # create response with _id as string
     response_dict = equipment.model_dump(exclude={"id"}, exclude_none=True)
     response_dict["_id"] = str(result.inserted_id)
     return Equipment(**response_dict)
 
 @router.get("/", response_model=List[Equipment], status_code=status.HTTP_200_OK)
-async def get_equipment():
-    """Get all equipment"""
+async def get_equipment(
+    limit: Optional[int] = Query(None, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    tenant_id: Optional[str] = None,
+):
+    """List equipment in creation order.
+
+    Without `limit` or `after` the whole list is streamed, as existing clients
+    expect; otherwise one page is returned and X-Next-Cursor is set when more follow.
+    """
     db =await get_database()
-    equipment_list = await db.equipment.find({}).to_list(length=None)
-    # Convert ObjectId to sting for _id field
-    result = []
-    for item in equipment_list:
-        item_dict = dict(item)
-        if '_id' in item_dict and isinstance(item_dict['_id'], ObjectId):
-            item_dict['_id'] = str(item_dict['_id'])
-        result.append(Equipment(**item_dict))
-    return result
+    query = {"tenant_id": tenant_id} if tenant_id else {}
+    if limit is None and after is None:
+        return StreamingResponse(
+            stream_json_array(db.equipment, query, EQUIPMENT_LIST_FIELDS, settings.EXPORT_BATCH_SIZE),
+            media_type="application/json",
+        )
+
+    equipment_list, next_cursor = await keyset_page(
+        db.equipment, query, EQUIPMENT_LIST_FIELDS, limit or settings.LIST_PAGE_SIZE, after
+    )
+    # Rows are already in the Equipment shape; skip per-row model validation
+    return Response(
+        content="[" + ",".join(to_json(item) for item in equipment_list) + "]",
+        media_type="application/json",
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None,
+    )
+
+@router.get("/export", response_model=List[Equipment], status_code=status.HTTP_200_OK)
+async def export_equipment(tenant_id: Optional[str] = None):
+    """Stream all equipment as one JSON array"""
+    db = await get_database()
+    query = {"tenant_id": tenant_id} if tenant_id else {}
+    return StreamingResponse(
+        stream_json_array(db.equipment, query, EQUIPMENT_LIST_FIELDS, settings.EXPORT_BATCH_SIZE),
+        media_type="application/json",
+    )
 
 @router.get("/{equipment_id}", response_model=Equipment, status_code=status.HTTP_200_OK)
-async def get_one_equipment(equipment_id: str):
+async def get_one_equipment(equipment_id: str, services: ServiceRegistry = Depends(get_services)):
     """Get an equipment by ID"""
-    db =await get_database()
-    equipment = await db.equipment.find_one({"_id": ObjectId(equipment_id)})
+    equipment = await services.equipment_cache.get(equipment_id)
     if not equipment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Equipment not found.")
     equipment_dict = dict(equipment)
@@ -65,235 +101,321 @@ async def get_one_equipment(equipment_id: str):
         equipment_dict['_id'] = str(equipment_dict['_id'])
     return Equipment(**equipment_dict)
 
-@router.post("/{equipment_id}/documents", status_code=status.HTTP_201_CREATED)
+@router.post("/{equipment_id}/documents", status_code=status.HTTP_202_ACCEPTED)
 async def upload_equipment_documents(
     equipment_id: str,
     files: List[UploadFile] = File(...),
     description: Optional[str] = Form(None),
+    services: ServiceRegistry = Depends(get_services),
 ):
+    """Store uploaded files and queue them for background ingestion"""
     db = await get_database()
 
-    equipment = await db.equipment.find_one({"_id": ObjectId(equipment_id)})
+    equipment = await services.equipment_cache.get(equipment_id)
     if not equipment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Equipment not found"
         )
     
-    text_extractor = TextExtractionService()
-    embedding_service = EmbeddingService()
+    text_extractor = services.text_extractor
+    ingestion_service = services.ingestion_service
     tenant_id = settings.TENANT_ID
 
-    created_docs = []
-
+    # Starlette has spooled the whole body before this runs, so the size limit only
+    # bounds what gets stored; cap request bodies at the proxy to bound what is received.
+    # Any file over the limit rejects the request before anything is stored or queued.
     for file in files:
-        try:
-            data = await file.read()
-            size = len(data)
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE_BYTES:
+            raise _too_large(file)
+
+    stored = []
+    try:
+        for file in files:
             original_name = file.filename or "upload.bin"
             content_type = file.content_type or "application/octet-stream"
 
-            logger.info(f"Processing file: {original_name} ({size} bytes)")
-
             if not text_extractor.is_supported(content_type, original_name):
                 logger.warning(f"Unsupported file format: {content_type}")
                 continue
 
-            temp_file_path = None
-
+            # The client's name is kept in file_name only; the key gets a sanitized copy
+            storage_key = ingestion_service.storage_key(tenant_id, equipment_id, original_name)
             try:
-                _, ext = os.path.splitext(original_name)
-                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                    tmp.write(data)
-                    temp_file_path = tmp.name 
-
-                try:
-                    extracted_text = text_extractor.extract_text(temp_file_path, content_type)
-                except ValueError as e:
-                    # Unsupported format
-                    logger.warning(f"Unsupported file format: {original_name} - {str(e)}")
-                    continue
-                except FileNotFoundError as e:
-                    logger.error(f"File not found: {original_name} - {str(e)}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Text extraction failed: {original_name} - {str(e)}")
-                    continue                      
-
-                logger.info(
-                    "Text extracted from document",
-                    file_name=original_name,
-                    text_length=len(extracted_text or ""),
-                )
-
-                if not extracted_text or not extracted_text.strip():
-                    logger.warning(f"EMPTY_DOCUMENT: No text content extracted from {original_name}")
-                    continue
-
-                chunks = embedding_service.split_text(extracted_text)
-                logger.info(
-                    "Document text split into chunks",
-                    file_name=original_name,
-                    chunk_count=len(chunks),
-                )
-
-                if not chunks:
-                    raise ValueError("NO_CHUNKS: Text splitting resulted in no chunks")
-                
-
-                storage_key = f"{tenant_id}/equipment/{equipment_id}/{uuid.uuid4().hex}-{original_name}"
-                now = datetime.utcnow()
-
-                doc_dict = {
-                    "equipment_id": ObjectId(equipment_id),
-                    "tenant_id": tenant_id,
-                    "file_name": original_name,
-                    "content_type": content_type,
-                    "size": size,
-                    "storage_key": storage_key,
-                    "uploaded_by": settings.USER_ID,
-                    "description": description,
-                    "document_type": "knowledge",
-                    "embedding_status": "processing",
-                    "created_at": now,
-                    "updated_at": now,
-                }
+                with span("upload.store"):
+                    size, content_hash = await _store_upload(file, ingestion_service.storage_path(storage_key))
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Error storing file {original_name}: {e}", exc_info=True)
+                continue
+            logger.info(f"Stored file: {original_name} ({size} bytes)")
+            stored.append((original_name, content_type, storage_key, size, content_hash))
+    except BaseException:
+        for _, _, storage_key, _, _ in stored:
+            ingestion_service.remove_stored(storage_key)
+        raise
 
-                doc_result = await db.documents_metadata.insert_one(doc_dict)
-                document_id = doc_result.inserted_id
-                logger.info("Document inserted with processing status", document_id=str(document_id))
-
-                chunk_documents = []
-
-                for index, chunk_text in enumerate(chunks):
-
-                    try:
-                        embedding_vector = embedding_service.embed_text(chunk_text)
-
-                        chunk_doc = {
-                            "document_id": document_id,
-                            "equipment_id": ObjectId(equipment_id),
-                            "tenant_id": tenant_id,
-                            "file_name": original_name,
-                            "chunk_id": str(uuid.uuid4()),
-                            "chunk_index": index,
-                            "text": chunk_text,
-                            "embedding": embedding_vector,
-                            "is_disabled": False,
-                        }
-
-                        chunk_documents.append(chunk_doc)
-
-                        if (index + 1) % 10 == 0 or index == len(chunks) - 1:
-                            logger.debug(
-                                "Chunk embedding progress",
-                                document_id=str(document_id),
-                                chunks_embedded=index + 1,
-                                total_chunks=len(chunks),
-                            )
-
-                    except Exception as e:
-                        # If embedding fails for a specific chunk, log but continue
-                        logger.warning(
-                            "Failed to embed chunk",
-                            document_id=str(document_id),
-                            chunk_index=index,
-                            error=str(e),
-                        )
-                        continue
-
-                if not chunk_documents:
-                    # Update document status to failed
-                    await db.documents_metadata.update_one(
-                        {"_id": document_id},
-                        {
-                            "$set": {
-                                "embedding_status": "failed",
-                                "updated_at": datetime.utcnow()
-                            }
-                        }
-                    )
-                    raise Exception("EMBEDDING_FAILED: Failed to generate embeddings for all chunks")
-                
-                await db[settings.DOCUMENT_CHUNKS_COLLECTION].insert_many(chunk_documents)
-                logger.info(
-                    "Chunks inserted into database",
-                    document_id=str(document_id),
-                    chunks_inserted=len(chunk_documents),
-                )
-
-                await db.documents_metadata.update_one(
-                    {"_id": document_id},
-                    {
-                        "$set": {
-                            "embedding_status": "completed",
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
-
-                logger.info(
-                    "Document embedding completed",
-                    document_id=str(document_id),
-                    chunks_created=len(chunk_documents),
-                    total_chunks=len(chunks),
-                )
-
-                doc_dict["_id"] = str(document_id)
-                doc_dict["equipment_id"] = str(doc_dict["equipment_id"])
-                # Convert datetime to ISO format string
-                if isinstance(doc_dict.get("created_at"), datetime):
-                    doc_dict["created_at"] = doc_dict["created_at"].isoformat()
-                if isinstance(doc_dict.get("updated_at"), datetime):
-                    doc_dict["updated_at"] = doc_dict["updated_at"].isoformat()
-                created_docs.append(doc_dict)
-
-                logger.success(f"Successfully processed {original_name}")
-
-            finally:
-                # Clean up temp file
-                if temp_file_path and os.path.exists(temp_file_path):
-                    try:
-                        os.remove(temp_file_path)
-                    except Exception as e:
-                        logger.warning(f"Failed to delete temp file: {e}")
+    created_docs = []
 
+    for original_name, content_type, storage_key, size, content_hash in stored:
+        now = datetime.utcnow()
+        doc_dict = {
+            "equipment_id": ObjectId(equipment_id),
+            "tenant_id": tenant_id,
+            "file_name": original_name,
+            "content_type": content_type,
+            "size": size,
+            "storage_key": storage_key,
+            "content_hash": content_hash,
+            "uploaded_by": settings.USER_ID,
+            "description": description,
+            "document_type": "knowledge",
+            "embedding_status": "pending",
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            with span("upload.find_duplicate"):
+                duplicate = await ingestion_service.find_duplicate(content_hash)
+            with span("upload.insert_metadata"):
+                doc_result = await db.documents_metadata.insert_one(doc_dict)
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}", exc_info=True)
+            # Nothing references the stored copy yet
+            logger.error(f"Error recording file {original_name}: {e}", exc_info=True)
+            ingestion_service.remove_stored(storage_key)
             continue
 
-    return {"documents": created_docs, "count": len(created_docs)}
+        document_id = doc_result.inserted_id
+        await ingestion_service.submit(document_id, tenant_id)
+
+        doc_dict["_id"] = str(document_id)
+        doc_dict["job_id"] = str(document_id)
+        doc_dict["duplicate_of"] = str(duplicate["_id"]) if duplicate else None
+        doc_dict["equipment_id"] = str(doc_dict["equipment_id"])
+        # Convert datetime to ISO format string
+        if isinstance(doc_dict.get("created_at"), datetime):
+            doc_dict["created_at"] = doc_dict["created_at"].isoformat()
+        if isinstance(doc_dict.get("updated_at"), datetime):
+            doc_dict["updated_at"] = doc_dict["updated_at"].isoformat()
+        created_docs.append(doc_dict)
+
+    return {
+        "documents": created_docs,
+        "count": len(created_docs),
+        # Duplicates reuse the existing chunks and embeddings without any embedding calls
+        "duplicates": sum(1 for doc in created_docs if doc["duplicate_of"]),
+    }
+
+
+@router.put("/{equipment_id}/documents/{document_id}", status_code=status.HTTP_202_ACCEPTED)
+async def replace_equipment_document(
+    equipment_id: str,
+    document_id: str,
+    file: UploadFile = File(...),
+    description: Optional[str] = Form(None),
+    services: ServiceRegistry = Depends(get_services),
+):
+    """Replace a document with a new version; only added or changed chunks are re-embedded"""
+    db = await get_database()
+
+    try:
+        document = await db.documents_metadata.find_one({
+            "_id": ObjectId(document_id),
+            "equipment_id": ObjectId(equipment_id),
+            "is_disabled": {"$ne": True},
+        })
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid document_id format")
+
+    if not document:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+    if document.get("embedding_status") in ("pending", "processing"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document is still being ingested; retry when its job has finished",
+        )
+
+    original_name = file.filename or document["file_name"]
+    content_type = file.content_type or "application/octet-stream"
+    ingestion_service = services.ingestion_service
+    if not services.text_extractor.is_supported(content_type, original_name):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file format: {content_type}",
+        )
+
+    tenant_id = document["tenant_id"]
+    storage_key = ingestion_service.storage_key(tenant_id, str(document["equipment_id"]), original_name)
+    with span("upload.store"):
+        size, content_hash = await _store_upload(file, ingestion_service.storage_path(storage_key))
+
+    updates = {
+        "file_name": original_name,
+        "content_type": content_type,
+        "size": size,
+        "storage_key": storage_key,
+        "content_hash": content_hash,
+        # Last version whose chunks were committed; the worker deletes it once this one completes
+        "previous_storage_key": document.get("previous_storage_key") or document["storage_key"],
+        "embedding_status": "pending",
+        "embedding_error": None,
+        "chunks_total": 0,
+        "chunks_embedded": 0,
+        "updated_at": datetime.utcnow(),
+    }
+    if description is not None:
+        updates["description"] = description
+
+    # Status check and transition in one write, so two replaces (or a replace and a
+    # running job) cannot both move the document to pending
+    previous = await db.documents_metadata.find_one_and_update(
+        {
+            "_id": document["_id"],
+            "is_disabled": {"$ne": True},
+            "embedding_status": {"$nin": ["pending", "processing"]},
+        },
+        {"$set": updates},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous is None:
+        ingestion_service.remove_stored(storage_key)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document is still being ingested; retry when its job has finished",
+        )
+    await ingestion_service.submit(document["_id"], tenant_id)
+
+    if previous.get("previous_storage_key"):
+        # The version being replaced never completed, so nothing refers to its file
+        ingestion_service.remove_stored(previous["storage_key"])
+
+    previous.update(updates)
+    return serialize_job(previous)
+
+
+def _too_large(file: UploadFile) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"{file.filename} exceeds the {settings.MAX_UPLOAD_SIZE_BYTES} byte upload limit",
+    )
+
+
+async def _store_upload(file: UploadFile, path: str) -> tuple[int, str]:
+    """Copy an upload to `path` in UPLOAD_CHUNK_SIZE pieces, enforcing MAX_UPLOAD_SIZE_BYTES as it goes.
+
+    Returns the size and SHA-256 of the content. The file is removed again if the copy fails.
+    """
+    max_size = settings.MAX_UPLOAD_SIZE_BYTES
+    if file.size is not None and file.size > max_size:
+        raise _too_large(file)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = 0
+    digest = hashlib.sha256()
+    out = await asyncio.to_thread(open, path, "wb")
+    try:
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise _too_large(file)
+            digest.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        out.close()
+        os.remove(path)
+        raise
+    out.close()
+    return size, digest.hexdigest()
+
+
+@router.get("/{equipment_id}/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_ingestion_job(equipment_id: str, job_id: str):
+    """Get the status and progress of a document ingestion job"""
+    db = await get_database()
+
+    try:
+        document = await db.documents_metadata.find_one({
+            "_id": ObjectId(job_id),
+            "equipment_id": ObjectId(equipment_id),
+        })
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid job_id format")
+
+    if not document:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    return serialize_job(document)
+
+async def _documents_query(services: ServiceRegistry, equipment_id: str, tenant_id: Optional[str]) -> dict:
+    if not ObjectId.is_valid(equipment_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid equipment_id format")
 
-@router.get("/{equipment_id}/documents", status_code=status.HTTP_200_OK)
-async def list_equipment_documents(equipment_id: str):
-    """List all documents for an equipment"""
-    db =await get_database()
-    
     # Verify equipment exists
-    equipment = await db.equipment.find_one({"_id": ObjectId(equipment_id)})
+    equipment = await services.equipment_cache.get(equipment_id)
     if not equipment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Equipment not found"
         )
-    
-    documents = await db.documents_metadata.find({
+
+    query = {
         "equipment_id": ObjectId(equipment_id),
         "is_disabled": {"$ne": True}
-    }).to_list(length=1000)
-    
-    # Convert ObjectId and datetime fields to strings for JSON serialization
-    serialized_documents = []
-    for doc in documents:
-        doc_dict = dict(doc)
-        if '_id' in doc_dict and isinstance(doc_dict['_id'], ObjectId):
-            doc_dict['_id'] = str(doc_dict['_id'])
-        if 'equipment_id' in doc_dict and isinstance(doc_dict['equipment_id'], ObjectId):
-            doc_dict['equipment_id'] = str(doc_dict['equipment_id'])
-        if 'created_at' in doc_dict and isinstance(doc_dict['created_at'], datetime):
-            doc_dict['created_at'] = doc_dict['created_at'].isoformat()
-        if 'updated_at' in doc_dict and isinstance(doc_dict['updated_at'], datetime):
-            doc_dict['updated_at'] = doc_dict['updated_at'].isoformat()
-        serialized_documents.append(doc_dict)
-    
-    return {"documents": serialized_documents, "count": len(serialized_documents)}
\ No newline at end of file
+    }
+    if tenant_id:
+        query["tenant_id"] = tenant_id
+    return query
+
+@router.get("/{equipment_id}/documents", status_code=status.HTTP_200_OK)
+async def list_equipment_documents(
+    equipment_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    tenant_id: Optional[str] = None,
+    services: ServiceRegistry = Depends(get_services),
+):
+    """List an equipment's documents in upload order.
+
+    Without `limit` or `after` every document is streamed as a single page, as
+    existing clients expect; otherwise one page is returned with next_cursor set
+    when more follow.
+    """
+    db =await get_database()
+    query = await _documents_query(services, equipment_id, tenant_id)
+    if limit is None and after is None:
+        return StreamingResponse(
+            stream_json_page(
+                db.documents_metadata, query, DOCUMENT_LIST_FIELDS, settings.EXPORT_BATCH_SIZE, "documents"
+            ),
+            media_type="application/json",
+        )
+
+    documents, next_cursor = await keyset_page(
+        db.documents_metadata, query, DOCUMENT_LIST_FIELDS, limit or settings.LIST_PAGE_SIZE, after
+    )
+
+    return Response(
+        content=(
+            '{"documents":[' + ",".join(to_json(doc) for doc in documents) + "],"
+            f'"count":{len(documents)},"next_cursor":{to_json(next_cursor)}}}'
+        ),
+        media_type="application/json",
+    )
+
+@router.get("/{equipment_id}/documents/export", status_code=status.HTTP_200_OK)
+async def export_equipment_documents(
+    equipment_id: str,
+    tenant_id: Optional[str] = None,
+    services: ServiceRegistry = Depends(get_services),
+):
+    """Stream all of an equipment's documents as one JSON array"""
+    db = await get_database()
+    query = await _documents_query(services, equipment_id, tenant_id)
+    return StreamingResponse(
+        stream_json_array(db.documents_metadata, query, DOCUMENT_LIST_FIELDS, settings.EXPORT_BATCH_SIZE),
+        media_type="application/json",
+    )
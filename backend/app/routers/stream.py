@@ -1,20 +1,35 @@
 import uuid
 from typing import Dict, Any
-from fastapi import APIRouter, WebSocket, Request, WebSocketDisconnect, HTTPException, status
+from fastapi import APIRouter, Depends, WebSocket, Request, WebSocketDisconnect, HTTPException, status
 from loguru import logger
-from bson import ObjectId
 
 from app.bot import bot
 from pipecat.runner.types import WebSocketRunnerArguments
 
-from app.database import get_database
 from app.config import settings
+from app.services.admission import SessionLimitExceeded
+from app.services.registry import ServiceRegistry, get_services
 
 router = APIRouter()
 
 
+def _overflow_ws_url(equipment_id: str) -> str:
+    base = settings.OVERFLOW_BACKEND_URL.rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/api/v1/stream/ws/{equipment_id}"
+
+
+@router.get("/capacity")
+async def session_capacity(services: ServiceRegistry = Depends(get_services)) -> Dict[str, Any]:
+    """Live voice session counters for load balancers and autoscaling"""
+    return services.admission.stats()
+
+
 @router.post("/connect")
-async def bot_connect(request: Request) -> Dict[str, Any]:
+async def bot_connect(request: Request, services: ServiceRegistry = Depends(get_services)) -> Dict[str, Any]:
     logger.info(f"Received connect request from {request.client.host if request.client else 'unknown'}")
 
     try:
@@ -40,11 +55,24 @@ async def bot_connect(request: Request) -> Dict[str, Any]:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="equipment_id is required"
         )
-    
-    db = await get_database()
+
+    admission = services.admission
+    if admission.full:
+        if settings.OVERFLOW_BACKEND_URL:
+            ws_url = _overflow_ws_url(equipment_id)
+            admission.reject(redirected=True)
+            logger.warning(f"Voice session capacity reached, sending caller to overflow: {ws_url}")
+            return {"ws_url": ws_url, "overflow": True}
+        admission.reject()
+        logger.warning(f"Voice session capacity reached, rejecting connect: {admission.stats()}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Voice session capacity reached, retry shortly",
+            headers={"Retry-After": str(admission.retry_after())},
+        )
 
     try:
-        equipment = await db.equipment.find_one({"_id": ObjectId(equipment_id)})
+        equipment = await services.equipment_cache.get(equipment_id)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -86,38 +114,46 @@ async def bot_connect(request: Request) -> Dict[str, Any]:
     
     
 @router.websocket("/ws/{equipment_id}")
-async def websocket_endpoint(websocket: WebSocket, equipment_id: str):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    equipment_id: str,
+    services: ServiceRegistry = Depends(get_services),
+):
     await websocket.accept()
 
     logger.info(f"WebSocket connection accepted for equipment: {equipment_id}")
 
     try:
-        db = await get_database()
-        equipment = await db.equipment.find_one({"_id": ObjectId(equipment_id)})
-
-        if not equipment:
-            logger.error(f"Equipment {equipment_id} not found")
-            await websocket.close(code=4004, reason="Equipment not found")
-            return
-        
-        body = {
-            "equipment_id": equipment_id,
-            "tenant_id": settings.TENANT_ID,
-            "session_id": str(uuid.uuid4()),
-            "user_id": settings.USER_ID,
-        }
-
-        await bot(WebSocketRunnerArguments(
-            websocket=websocket,
-            body=body
-        ))
-
-    except WebSocketDisconnect:
-        logger.info("WebSocket disconnected")
-    except Exception as e:
-        logger.error(f"Error in stream handler: {e}")
-        try:
-            await websocket.close(code=1011, reason=str(e))
-        except:
-            pass
-
+        async with services.admission.session():
+            try:
+                equipment = await services.equipment_cache.get(equipment_id)
+
+                if not equipment:
+                    logger.error(f"Equipment {equipment_id} not found")
+                    await websocket.close(code=4004, reason="Equipment not found")
+                    return
+
+                body = {
+                    "equipment_id": equipment_id,
+                    "tenant_id": settings.TENANT_ID,
+                    "session_id": str(uuid.uuid4()),
+                    "user_id": settings.USER_ID,
+                }
+
+                await bot(WebSocketRunnerArguments(
+                    websocket=websocket,
+                    body=body
+                ), services)
+
+            except WebSocketDisconnect:
+                logger.info("WebSocket disconnected")
+            except Exception as e:
+                logger.error(f"Error in stream handler: {e}")
+                try:
+                    await websocket.close(code=1011, reason=str(e))
+                except:
+                    pass
+    except SessionLimitExceeded as e:
+        logger.warning(f"Rejecting voice session for equipment {equipment_id}: {e}")
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason=str(e))
@@ -0,0 +1,98 @@
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from app.config import settings
+
+
+class SessionLimitExceeded(Exception):
+    """No voice session slot became free (wait queue full or wait timed out)"""
+
+
+class SessionAdmission:
+    """Caps concurrent voice sessions per process, with a short FIFO wait queue.
+
+    At most `max_sessions` pipelines run at once. Up to `queue_size` more
+    callers wait up to `queue_timeout` seconds for a slot; everyone else is
+    rejected straight away.
+    """
+
+    def __init__(
+            self,
+            max_sessions: int | None = None,
+            queue_size: int | None = None,
+            queue_timeout: float | None = None,
+    ):
+        self.max_sessions = max(1, max_sessions or settings.MAX_CONCURRENT_SESSIONS)
+        self.queue_size = max(0, settings.SESSION_QUEUE_SIZE if queue_size is None else queue_size)
+        self.queue_timeout = settings.SESSION_QUEUE_TIMEOUT_SECS if queue_timeout is None else queue_timeout
+        # asyncio.Semaphore wakes waiters in FIFO order
+        self._slots = asyncio.Semaphore(self.max_sessions)
+        self.active = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.timed_out_total = 0
+        self.redirected_total = 0
+
+    @property
+    def full(self) -> bool:
+        """True when a new caller would be rejected without waiting"""
+        return self.active >= self.max_sessions and self.queued >= self.queue_size
+
+    def retry_after(self) -> int:
+        """Seconds a rejected caller should wait before trying again"""
+        return max(1, math.ceil(settings.SESSION_RETRY_AFTER_SECS))
+
+    def reject(self, redirected: bool = False) -> None:
+        """Count a caller turned away before reaching the wait queue (e.g. by /connect)"""
+        if redirected:
+            self.redirected_total += 1
+        else:
+            self.rejected_total += 1
+
+    async def acquire(self) -> None:
+        if self._slots.locked():
+            if self.queued >= self.queue_size:
+                self.rejected_total += 1
+                raise SessionLimitExceeded("Voice session capacity reached")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_total += 1
+                self.timed_out_total += 1
+                raise SessionLimitExceeded("Timed out waiting for a voice session slot")
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        self.admitted_total += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_sessions": self.max_sessions,
+            "queue_size": self.queue_size,
+            "utilization": round(self.active / self.max_sessions, 3),
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "timed_out_total": self.timed_out_total,
+            "redirected_total": self.redirected_total,
+            "accepting": not self.full,
+        }
@@ -0,0 +1,141 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class WeightedLRUCache:
+    """LRU cache bounded by entry count and by the summed weight of its entries.
+
+    Used for in-process index partitions, weighted by chunk count, so memory
+    stays bounded however many equipment get queried. The entry just set is
+    always kept, even if it alone is over `max_weight`.
+    """
+
+    def __init__(self, maxsize: int, max_weight: float):
+        self.maxsize = max(1, maxsize)
+        self.max_weight = max_weight
+        self.weight = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like `get`, without counting a lookup or refreshing recency"""
+        entry = self._data.get(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any, weight: float) -> None:
+        self.invalidate(key)
+        self._data[key] = (weight, value)
+        self.weight += weight
+        self._evict(keep=key)
+
+    def reweigh(self, key: Hashable, weight: float) -> None:
+        """Update the weight of an entry that grew in place, without changing its recency"""
+        entry = self._data.get(key)
+        if entry is None:
+            return
+        self.weight += weight - entry[0]
+        self._data[key] = (weight, entry[1])
+        self._evict(keep=key)
+
+    def invalidate(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[0]
+
+    def _evict(self, keep: Hashable) -> None:
+        while len(self._data) > self.maxsize or self.weight > self.max_weight:
+            victim = next((key for key in self._data if key != keep), None)
+            if victim is None:
+                return
+            self.invalidate(victim)
+            self.evictions += 1
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Entries, least recently used first; does not count as use"""
+        return [(key, value) for key, (_, value) in self._data.items()]
+
+    def values(self) -> List[Any]:
+        return [value for _, value in self._data.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "evictions": self.evictions,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
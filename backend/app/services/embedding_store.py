@@ -0,0 +1,54 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from pymongo import UpdateOne
+
+from app.database import get_database
+from app.config import settings
+from app.services.vector_codec import decode_embedding, encode_embedding
+
+
+def chunking_key() -> str:
+    """Identifies the settings that determine how a file becomes chunks and vectors"""
+    return f"{settings.EMBEDDING_MODEL}:{settings.CHUNK_SIZE}:{settings.CHUNK_OVERLAP}"
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk; the same text embedded by the same model gets the same vector"""
+    return hashlib.sha256(f"{settings.EMBEDDING_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Content-addressed chunk embeddings in Mongo (chunk_hash -> vector)"""
+
+    def __init__(self, collection_name: str | None = None):
+        self.collection_name = collection_name or settings.EMBEDDING_STORE_COLLECTION
+
+    async def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        if not hashes:
+            return {}
+        db = await get_database()
+        cursor = db[self.collection_name].find(
+            {"_id": {"$in": list(set(hashes))}},
+            {"embedding": 1, "embedding_scale": 1},
+        )
+        return {doc["_id"]: decode_embedding(doc) async for doc in cursor}
+
+    async def put_many(self, embeddings: Dict[str, List[float] | np.ndarray]) -> None:
+        if not embeddings:
+            return
+        db = await get_database()
+        now = datetime.utcnow()
+        await db[self.collection_name].bulk_write(
+            [
+                UpdateOne(
+                    {"_id": hash_},
+                    {"$setOnInsert": {**encode_embedding(vector), "model": settings.EMBEDDING_MODEL, "created_at": now}},
+                    upsert=True,
+                )
+                for hash_, vector in embeddings.items()
+            ],
+            ordered=False,
+        )
@@ -1,14 +1,30 @@
-from typing import List
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+import httpx
+from google.genai import Client, types
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from loguru import logger
 from app.config import settings
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
         self.embeddings = GoogleGenerativeAIEmbeddings(
             model=settings.EMBEDDING_MODEL,
             google_api_key=settings.GOOGLE_API_KEY
         )
+        self.http_client = http_client
+        if http_client is not None:
+            # Send async requests through the caller's pooled client so keep-alive
+            # connections outlive this service; the caller owns and closes it
+            self.embeddings.client = Client(
+                api_key=settings.GOOGLE_API_KEY,
+                http_options=types.HttpOptions(
+                    httpx_async_client=http_client,
+                    # The sync client (embed_text / embed_texts) gets the same timeout
+                    client_args={"timeout": http_client.timeout},
+                ),
+            )
 
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.CHUNK_SIZE,
@@ -17,6 +33,18 @@ class EmbeddingService:
             is_separator_regex=False,
         )     
 
+    def check_http_client(self) -> None:
+        """Fail if async requests would not go through the pooled client passed in.
+
+        The SDK only reports the transport it chose on a private attribute, so this
+        is checked once at startup (google-genai is pinned) rather than trusted.
+        """
+        if self.http_client is None:
+            return
+        api_client = getattr(self.embeddings.client, "_api_client", None)
+        if getattr(api_client, "_async_httpx_client", None) is not self.http_client:
+            raise RuntimeError("The embedding client is not using the pooled HTTP client")
+
     def split_text(self, text:str)->List[str]:
         if not text or not text.strip():
             return []
@@ -43,4 +71,93 @@ class EmbeddingService:
         embeddings = self.embeddings.embed_documents(valid_texts)
         return embeddings
 
-    
\ No newline at end of file
+    async def aembed_text(self, text: str) -> List[float]:
+        """Async embed_text; the request runs on the client's async transport."""
+        if not text or not text.strip():
+            raise ValueError("Cannot embed empty text")
+
+        embedding = await self.embeddings.aembed_query(text)
+        return embedding
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Async embed_texts; the request runs on the client's async transport."""
+        if not texts:
+            return []
+
+        # Filter out empty texts
+        valid_texts = [t for t in texts if t and t.strip()]
+        if not valid_texts:
+            return []
+
+        embeddings = await self.embeddings.aembed_documents(valid_texts)
+        return embeddings
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several search queries in one request, in input order (query task type, unlike aembed_texts)."""
+        if not texts:
+            return []
+        if any(not t or not t.strip() for t in texts):
+            raise ValueError("Cannot embed empty text")
+
+        embeddings = await self.embeddings.aembed_documents(texts, task_type="RETRIEVAL_QUERY")
+        return embeddings
+
+    async def embed_chunks(
+            self,
+            texts: List[str],
+            on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> List[Optional[List[float]]]:
+        """Embed chunks in batches with bounded concurrency.
+
+        Returns one entry per input text, in input order. An entry is None when
+        the text is empty or its batch still failed after all retries.
+        `on_progress` is awaited with the running count of embedded chunks.
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        indexed = [(i, t) for i, t in enumerate(texts) if t and t.strip()]
+        if not indexed:
+            return vectors
+
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        batches = [indexed[i:i + batch_size] for i in range(0, len(indexed), batch_size)]
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+        embedded = 0
+
+        async def run_batch(batch: List[Tuple[int, str]], attempt: int):
+            nonlocal embedded
+            async with semaphore:
+                try:
+                    result = await self.aembed_texts([t for _, t in batch])
+                    if len(result) != len(batch):
+                        raise ValueError(f"Expected {len(batch)} embeddings, got {len(result)}")
+                    for (index, _), vector in zip(batch, result):
+                        vectors[index] = vector
+                    embedded += len(batch)
+                    if on_progress is not None:
+                        await on_progress(embedded)
+                    return
+                except Exception as e:
+                    if attempt >= settings.EMBEDDING_MAX_RETRIES:
+                        logger.warning(
+                            "Embedding batch failed after retries",
+                            first_chunk_index=batch[0][0],
+                            batch_size=len(batch),
+                            error=str(e),
+                        )
+                        return
+                    logger.debug(f"Embedding batch failed (attempt {attempt + 1}), retrying: {e}")
+
+            # Retry only the failed batch, split in half so one bad text
+            # cannot sink the rest of its batch
+            await asyncio.sleep(settings.EMBEDDING_RETRY_BACKOFF_SECS * (2 ** attempt))
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await asyncio.gather(
+                    run_batch(batch[:middle], attempt + 1),
+                    run_batch(batch[middle:], attempt + 1),
+                )
+            else:
+                await run_batch(batch, attempt + 1)
+
+        await asyncio.gather(*(run_batch(batch, 0) for batch in batches))
+        return vectors
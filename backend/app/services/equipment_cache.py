@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+from app.config import settings
+from app.database import get_database
+from app.metrics import EQUIPMENT_CACHE_LOOKUPS
+from app.services.cache import TTLCache
+
+
+class EquipmentCache:
+    """Read-through cache of `equipment` documents by `_id`.
+
+    Concurrent misses for one id share a single `find_one`. Missing equipment
+    is not cached, so a record created by another process is found at once;
+    records changed by another process can be served stale for up to
+    EQUIPMENT_CACHE_TTL_SECS.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=settings.EQUIPMENT_CACHE_SIZE, ttl=settings.EQUIPMENT_CACHE_TTL_SECS)
+        self._pending: Dict[ObjectId, asyncio.Future] = {}
+
+    async def get(self, equipment_id: str) -> Optional[Dict[str, Any]]:
+        """The equipment document, or None if it does not exist; raises InvalidId for a malformed id"""
+        key = ObjectId(equipment_id)
+        equipment = self._cache.get(key)
+        if equipment is not None:
+            EQUIPMENT_CACHE_LOOKUPS.labels("hit").inc()
+            return dict(equipment)
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            EQUIPMENT_CACHE_LOOKUPS.labels("coalesced").inc()
+        else:
+            EQUIPMENT_CACHE_LOOKUPS.labels("miss").inc()
+            pending = self._pending[key] = asyncio.ensure_future(self._load(key))
+            pending.add_done_callback(lambda task: self._finished(key, task))
+
+        # Shielded so a caller that goes away does not cancel the lookup others wait on
+        equipment = await asyncio.shield(pending)
+        return dict(equipment) if equipment is not None else None
+
+    async def _load(self, key: ObjectId) -> Optional[Dict[str, Any]]:
+        db = await get_database()
+        equipment = await db.equipment.find_one({"_id": key})
+        # Skip the store if the id was invalidated while the query ran
+        if equipment is not None and self._pending.get(key) is asyncio.current_task():
+            self._cache.set(key, equipment)
+        return equipment
+
+    def _finished(self, key: ObjectId, task: asyncio.Future) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+
+    def invalidate(self, equipment_id: str) -> None:
+        key = ObjectId(equipment_id)
+        self._cache.invalidate(key)
+        self._pending.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters; coalesced lookups count as misses here, EQUIPMENT_CACHE_LOOKUPS tells them apart"""
+        return self._cache.stats()
@@ -0,0 +1,169 @@
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import OperationFailure
+
+from app.config import settings
+
+# Fields `retrieve` filters `$vectorSearch` on; each must be a filter field of the vector index
+VECTOR_FILTER_FIELDS = ("equipment_id", "tenant_id", "is_disabled")
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, int]]
+    name: str
+
+
+class HotQuery(NamedTuple):
+    """A query shape the app runs on a hot path; values only need the right types for planning"""
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+class IndexVerificationError(RuntimeError):
+    pass
+
+
+def index_specs() -> List[IndexSpec]:
+    chunks = settings.DOCUMENT_CHUNKS_COLLECTION
+    return [
+        IndexSpec("equipment", [("tenant_id", 1), ("name", 1)], "tenant_name"),
+        IndexSpec("equipment", [("tenant_id", 1), ("_id", 1)], "tenant_listing"),
+        IndexSpec("documents_metadata", [("equipment_id", 1), ("is_disabled", 1), ("_id", 1)], "equipment_documents"),
+        IndexSpec("documents_metadata", [("content_hash", 1)], "content_hash"),
+        IndexSpec("documents_metadata", [("embedding_status", 1)], "embedding_status"),
+        IndexSpec(chunks, [("document_id", 1), ("is_disabled", 1)], "document_chunks"),
+        IndexSpec(chunks, [("equipment_id", 1), ("tenant_id", 1), ("is_disabled", 1)], "equipment_chunks"),
+    ]
+
+
+def hot_queries() -> List[HotQuery]:
+    oid = ObjectId()
+    active = {"$ne": True}
+    chunks = settings.DOCUMENT_CHUNKS_COLLECTION
+    return [
+        HotQuery("equipment by name", "equipment", {"name": "", "tenant_id": ""}),
+        HotQuery("equipment listing", "equipment", {"tenant_id": ""}, [("_id", 1)]),
+        HotQuery("equipment documents", "documents_metadata", {"equipment_id": oid, "is_disabled": active}, [("_id", 1)]),
+        HotQuery(
+            "duplicate upload",
+            "documents_metadata",
+            {"content_hash": "", "chunking_key": "", "embedding_status": "completed", "is_disabled": active},
+        ),
+        HotQuery("claimable ingestion", "documents_metadata", {"$or": [
+            {"embedding_status": "pending"},
+            {"embedding_status": "processing", "lease_until": {"$lt": datetime.utcnow()}},
+            {"embedding_status": "processing", "lease_until": None},
+        ]}),
+        HotQuery("document chunks", chunks, {"document_id": oid, "is_disabled": active}),
+        HotQuery("equipment chunks", chunks, {"equipment_id": oid, "tenant_id": "", "is_disabled": active}),
+    ]
+
+
+def vector_index_definition(filter_fields: Tuple[str, ...] = VECTOR_FILTER_FIELDS) -> Dict[str, Any]:
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": settings.VECTOR_INDEX_DIMENSIONS,
+                "similarity": "cosine",
+            },
+            *({"type": "filter", "path": field} for field in filter_fields),
+        ]
+    }
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Stages of a winning plan, outermost first, e.g. ["FETCH", "IXSCAN equipment_documents"]"""
+    stage = plan.get("stage", "?")
+    stages = [f"{stage} {plan['indexName']}" if plan.get("indexName") else stage]
+    children = plan.get("inputStages") or ([plan["inputStage"]] if plan.get("inputStage") else [])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+class IndexManager:
+    """Creates the B-tree indexes hot queries rely on, checks the Atlas vector
+    index has the filter fields `retrieve` uses, and checks each hot query's plan.
+
+    Run once at startup (main.py lifespan). With INDEX_FAIL_FAST, a hot query
+    planned as a collection scan or an unusable vector index stops startup.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.problems: List[str] = []
+
+    async def ensure_indexes(self) -> None:
+        for spec in index_specs():
+            try:
+                await self.db[spec.collection].create_index(spec.keys, name=spec.name)
+            except OperationFailure as e:
+                # Same keys under another name (created by hand) is fine; anything else is not
+                if e.code in (85, 86):  # IndexOptionsConflict, IndexKeySpecsConflict
+                    logger.warning(f"Index {spec.collection}.{spec.name} exists with different options: {e}")
+                else:
+                    self.problems.append(f"could not create index {spec.collection}.{spec.name}: {e}")
+        logger.info(f"Ensured {len(index_specs())} indexes")
+
+    async def ensure_vector_index(self) -> None:
+        collection = self.db[settings.DOCUMENT_CHUNKS_COLLECTION]
+        name = settings.VECTOR_INDEX_NAME
+        try:
+            existing = await collection.list_search_indexes(name).to_list(length=None)
+        except OperationFailure as e:
+            self.problems.append(f"could not list search indexes (is this an Atlas cluster?): {e}")
+            return
+
+        if not existing:
+            await collection.create_search_index({
+                "name": name,
+                "type": "vectorSearch",
+                "definition": vector_index_definition(),
+            })
+            logger.warning(f"Created vector search index {name}; searches return nothing until Atlas finishes building it")
+            return
+
+        definition = existing[0].get("latestDefinition") or {}
+        fields = definition.get("fields", [])
+        filters = {field.get("path") for field in fields if field.get("type") == "filter"}
+        missing = [field for field in VECTOR_FILTER_FIELDS if field not in filters]
+        if not missing:
+            logger.info(f"Vector search index {name} has filter fields {sorted(filters)}")
+            return
+
+        # Add the missing filter fields; Atlas keeps serving the old definition while it rebuilds
+        await collection.update_search_index(name, {**definition, "fields": fields + [
+            {"type": "filter", "path": field} for field in missing
+        ]})
+        logger.warning(f"Vector search index {name} was missing filter fields {missing}; updated, rebuild in progress")
+
+    async def verify_query_plans(self) -> None:
+        for query in hot_queries():
+            cursor = self.db[query.collection].find(query.filter)
+            if query.sort:
+                cursor = cursor.sort(query.sort)
+            explain = await cursor.explain()
+            plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            stages = _plan_stages(plan.get("queryPlan", plan))
+            logger.info(f"Query plan for {query.name}: {' <- '.join(stages)}")
+            if "COLLSCAN" in stages:
+                self.problems.append(f"{query.name} ({query.collection}) is planned as a collection scan")
+
+    async def run(self) -> None:
+        await self.ensure_indexes()
+        if settings.VECTOR_STORE_BACKEND == "atlas":
+            await self.ensure_vector_index()
+        await self.verify_query_plans()
+
+        for problem in self.problems:
+            logger.error(f"Index check: {problem}")
+        if self.problems and settings.INDEX_FAIL_FAST:
+            raise IndexVerificationError(f"{len(self.problems)} index problem(s): " + "; ".join(self.problems))
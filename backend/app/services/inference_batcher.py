@@ -0,0 +1,200 @@
+"""Cross-session batching of small ONNX inferences.
+
+Voice sessions call `session.run()` for every VAD window and every
+smart-turn check, each from its own analyzer thread. `InferenceBatcher`
+queues those calls, and a dedicated thread runs everything that arrives
+within a short window as one batched call. Then it splits the outputs
+back per caller.
+
+A batch is flushed when one of these happens:
+- every attached session has a call waiting
+- `max_batch` calls are queued
+- `max_wait_ms` has passed since the oldest call
+
+With a single attached session, calls run immediately.
+"""
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+
+@dataclass
+class _Call:
+    output_names: Optional[List[str]]
+    feed: Dict[str, np.ndarray]
+    size: int
+    enqueued: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class BatchedSession:
+    """Drop-in for an onnxruntime `InferenceSession` whose `run` goes through an InferenceBatcher"""
+
+    def __init__(self, batcher: "InferenceBatcher"):
+        self._batcher = batcher
+
+    def run(self, output_names: Optional[List[str]], input_feed: Dict[str, Any], run_options: Any = None) -> List[np.ndarray]:
+        return self._batcher.run(output_names, input_feed)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._batcher.session, name)
+
+
+class InferenceBatcher:
+    """Batches `run` calls on one ONNX session across sessions, on a dedicated thread.
+
+    `input_axes` gives the batch axis of each input (None for inputs that must
+    be identical across a batch, like Silero's sample rate). `output_axes`
+    gives the batch axis of each output, by position.
+    """
+
+    def __init__(
+            self,
+            session: Any,
+            input_axes: Dict[str, Optional[int]],
+            output_axes: Sequence[int],
+            max_batch: int = 64,
+            max_wait_ms: float = 4.0,
+            name: str = "onnx",
+    ):
+        self.session = session
+        self.input_axes = input_axes
+        self.output_axes = list(output_axes)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self.stats = {"calls": 0, "batches": 0, "largest_batch": 0, "fallbacks": 0}
+        self._clients = 0
+        self._clients_lock = threading.Lock()
+        self._queue: "queue.Queue[_Call | None]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=f"inference-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def session_proxy(self) -> BatchedSession:
+        """A per-session handle; the batcher waits for at most one call per live handle"""
+        proxy = BatchedSession(self)
+        with self._clients_lock:
+            self._clients += 1
+        weakref.finalize(proxy, self._detach)
+        return proxy
+
+    def _detach(self) -> None:
+        with self._clients_lock:
+            self._clients -= 1
+
+    def run(self, output_names: Optional[List[str]], feed: Dict[str, Any]) -> List[np.ndarray]:
+        if self._closed:
+            return self.session.run(output_names, feed)
+        feed = {name: np.asarray(value) for name, value in feed.items()}
+        call = _Call(output_names=output_names, feed=feed, size=self._batch_size(feed))
+        self._queue.put(call)
+        return call.future.result()
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _batch_size(self, feed: Dict[str, np.ndarray]) -> int:
+        for name, axis in self.input_axes.items():
+            if axis is not None and name in feed:
+                return feed[name].shape[axis]
+        return 1
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            calls = [first]
+            deadline = first.enqueued + self.max_wait
+            stopping = False
+            while len(calls) < min(self.max_batch, max(self._clients, 1)):
+                remaining = deadline - time.monotonic()
+                try:
+                    call = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if call is None:
+                    stopping = True
+                    break
+                calls.append(call)
+
+            for group in self._group(calls):
+                self._run_group(group)
+            if stopping:
+                break
+
+        # Serve anything still queued after close() without batching
+        while True:
+            try:
+                call = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if call is not None:
+                self._run_group([call])
+
+    def _group_key(self, call: _Call) -> tuple:
+        key = [tuple(call.output_names or ())]
+        for name in sorted(call.feed):
+            value = call.feed[name]
+            axis = self.input_axes.get(name)
+            if axis is None:
+                key.append((name, value.dtype.str, value.shape, value.tobytes()))
+            else:
+                shape = value.shape[:axis] + value.shape[axis + 1:]
+                key.append((name, value.dtype.str, shape))
+        return tuple(key)
+
+    def _group(self, calls: List[_Call]) -> List[List[_Call]]:
+        groups: Dict[tuple, List[_Call]] = {}
+        for call in calls:
+            groups.setdefault(self._group_key(call), []).append(call)
+        return list(groups.values())
+
+    def _run_group(self, calls: List[_Call]) -> None:
+        first = calls[0]
+        if len(calls) == 1:
+            try:
+                first.future.set_result(self.session.run(first.output_names, first.feed))
+            except Exception as e:
+                first.future.set_exception(e)
+            self._record(1)
+            return
+
+        try:
+            feed = {
+                name: value if self.input_axes.get(name) is None
+                else np.concatenate([call.feed[name] for call in calls], axis=self.input_axes[name])
+                for name, value in first.feed.items()
+            }
+            outputs = self.session.run(first.output_names, feed)
+            offsets = np.cumsum([call.size for call in calls])[:-1]
+            split = [
+                np.split(output, offsets, axis=self.output_axes[index])
+                for index, output in enumerate(outputs)
+            ]
+        except Exception as e:
+            # Run one by one so a bad input only fails its own caller
+            logger.warning(f"Batched {self.name} inference failed, running {len(calls)} calls individually: {e}")
+            self.stats["fallbacks"] += 1
+            for call in calls:
+                self._run_group([call])
+            return
+
+        for position, call in enumerate(calls):
+            call.future.set_result([parts[position] for parts in split])
+        self._record(len(calls))
+
+    def _record(self, size: int) -> None:
+        self.stats["calls"] += size
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], size)
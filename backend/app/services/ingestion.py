@@ -0,0 +1,525 @@
+import asyncio
+import os
+import re
+import socket
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Sequence
+
+from bson import ObjectId
+from loguru import logger
+from pymongo import ReturnDocument, UpdateOne
+
+from app.database import get_database
+from app.config import settings
+from app.services.embeddings import EmbeddingService
+from app.services.embedding_store import EmbeddingStore, chunk_hash, chunking_key
+from app.services.rag import RAGService
+from app.services.text_extraction import TextExtractionService
+from app.services.vector_codec import decode_embedding, encode_embedding
+from app.tracing import span
+
+Vector = Sequence[float]
+
+# Characters a client file name may keep in a storage key; anything else becomes "_"
+_UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class IngestionError(Exception):
+    """Ingestion failure with a machine-readable code stored on the document"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LeaseLost(Exception):
+    """Another worker took over the job after this worker's lease lapsed"""
+
+
+class TenantFairQueue:
+    """FIFO per tenant, served round-robin so one tenant's bulk upload can't starve the others"""
+
+    def __init__(self):
+        self._queues: Dict[str, Deque[Any]] = {}
+        self._tenants: Deque[str] = deque()
+        self._condition = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def put(self, tenant_id: str, item: Any) -> None:
+        async with self._condition:
+            if tenant_id not in self._queues:
+                self._queues[tenant_id] = deque()
+                self._tenants.append(tenant_id)
+            self._queues[tenant_id].append(item)
+            self._condition.notify()
+
+    async def get(self) -> Any:
+        async with self._condition:
+            while not self._tenants:
+                await self._condition.wait()
+            tenant_id = self._tenants.popleft()
+            queue = self._queues[tenant_id]
+            item = queue.popleft()
+            if queue:
+                self._tenants.append(tenant_id)
+            else:
+                del self._queues[tenant_id]
+            return item
+
+
+class IngestionService:
+    """Runs document extraction, chunking and embedding on a bounded pool of background workers.
+
+    Job ids are `documents_metadata` ids; progress lives on that document
+    (`embedding_status`, `chunks_embedded`, `chunks_total`), so it survives
+    restarts and unfinished jobs are re-queued by `resume_pending`.
+
+    Any number of processes may queue the same job; a worker runs it only after
+    claiming it on the document (`worker_id`, `lease_until`). The lease is renewed
+    while the job runs, and a job whose lease lapses (its process died) is claimed
+    again by the next `resume_pending` sweep.
+    """
+
+    def __init__(
+            self,
+            embedding_service: EmbeddingService | None = None,
+            text_extractor: TextExtractionService | None = None,
+            rag_service: RAGService | None = None,
+            workers: int | None = None,
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.text_extractor = text_extractor or TextExtractionService()
+        self.rag_service = rag_service or RAGService(embedding_service=self.embedding_service)
+        self.workers = max(1, workers or settings.INGESTION_WORKERS)
+        self.queue = TenantFairQueue()
+        self._tasks: List[asyncio.Task] = []
+        self._queued: set[str] = set()
+        self.embedding_store = EmbeddingStore()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def storage_key(tenant_id: str, equipment_id: str, file_name: str) -> str:
+        """Key for a new upload; the client's file name only contributes a sanitized base name"""
+        base_name = os.path.basename(file_name.replace("\\", "/"))
+        safe_name = _UNSAFE_NAME_CHARS.sub("_", base_name).strip("._")[:100] or "upload"
+        return f"{tenant_id}/equipment/{equipment_id}/{uuid.uuid4().hex}-{safe_name}"
+
+    @staticmethod
+    def storage_path(storage_key: str) -> str:
+        """Absolute path for `storage_key`; raises ValueError if it would resolve outside UPLOAD_DIR"""
+        root = os.path.realpath(settings.UPLOAD_DIR)
+        path = os.path.realpath(os.path.join(root, storage_key))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Storage key resolves outside the upload directory: {storage_key!r}")
+        return path
+
+    def remove_stored(self, storage_key: str) -> None:
+        try:
+            path = self.storage_path(storage_key)
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.warning(f"Failed to delete stored file {storage_key}: {e}")
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweep(), name="ingestion-sweep"))
+        logger.info(f"Ingestion workers started: {self.workers}", worker_id=self.worker_id)
+        await self.resume_pending()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, document_id: ObjectId, tenant_id: str) -> None:
+        job_id = str(document_id)
+        if job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        await self.queue.put(tenant_id, job_id)
+        logger.info("Ingestion job queued", job_id=job_id, tenant_id=tenant_id, queued=len(self.queue))
+
+    @staticmethod
+    def claimable(now: datetime) -> Dict[str, Any]:
+        """Jobs nobody holds: pending, or processing under a lapsed (or pre-lease) claim"""
+        return {"$or": [
+            {"embedding_status": "pending"},
+            {"embedding_status": "processing", "lease_until": {"$lt": now}},
+            {"embedding_status": "processing", "lease_until": None},
+        ]}
+
+    async def resume_pending(self) -> int:
+        """Queue unclaimed jobs: new ones, and those whose worker stopped renewing its lease"""
+        db = await get_database()
+        documents = await db.documents_metadata.find(
+            self.claimable(datetime.utcnow()),
+            {"_id": 1, "tenant_id": 1},
+        ).to_list(length=None)
+        for doc in documents:
+            await self.submit(doc["_id"], doc.get("tenant_id") or settings.TENANT_ID)
+        if documents:
+            logger.info(f"Resumed {len(documents)} unfinished ingestion jobs")
+        return len(documents)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(settings.INGESTION_LEASE_SECS)
+            try:
+                await self.resume_pending()
+            except Exception as e:
+                logger.warning(f"Ingestion sweep failed: {e}")
+
+    async def _claim(self, document_id: ObjectId) -> Dict[str, Any] | None:
+        """Take the job for this worker; None if another worker holds it or it is finished"""
+        db = await get_database()
+        now = datetime.utcnow()
+        return await db.documents_metadata.find_one_and_update(
+            {"_id": document_id, **self.claimable(now)},
+            {"$set": {
+                "embedding_status": "processing",
+                "worker_id": self.worker_id,
+                "lease_until": now + timedelta(seconds=settings.INGESTION_LEASE_SECS),
+                "updated_at": now,
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _renew_lease(self, document_id: ObjectId) -> None:
+        db = await get_database()
+        while True:
+            await asyncio.sleep(settings.INGESTION_LEASE_RENEW_SECS)
+            try:
+                result = await db.documents_metadata.update_one(
+                    {"_id": document_id, "worker_id": self.worker_id, "embedding_status": "processing"},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=settings.INGESTION_LEASE_SECS)}},
+                )
+            except Exception as e:
+                # Keep trying; the lease only lapses if renewals fail for INGESTION_LEASE_SECS
+                logger.warning(f"Could not renew ingestion lease: {e}", job_id=str(document_id))
+                continue
+            if not result.matched_count:
+                # The next status write raises LeaseLost and stops the job
+                return
+
+    async def _worker(self, worker_index: int) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self.process_document(ObjectId(job_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_index} failed on job {job_id}: {e}", exc_info=True)
+            finally:
+                self._queued.discard(job_id)
+
+    async def _set_status(self, document_id: ObjectId, status: str, **fields: Any) -> None:
+        """Write job state, as long as this worker still holds the job; finished jobs drop the lease"""
+        db = await get_database()
+        fields.update({"embedding_status": status, "updated_at": datetime.utcnow()})
+        if status != "processing":
+            fields["lease_until"] = None
+        result = await db.documents_metadata.update_one(
+            {"_id": document_id, "worker_id": self.worker_id},
+            {"$set": fields},
+        )
+        if not result.matched_count:
+            raise LeaseLost(f"Job {document_id} is no longer held by {self.worker_id}")
+
+    async def process_document(self, document_id: ObjectId) -> None:
+        document = await self._claim(document_id)
+        if not document:
+            logger.debug("Ingestion job already claimed or finished", job_id=str(document_id))
+            return
+
+        renewal = asyncio.create_task(self._renew_lease(document_id))
+        try:
+            with span("ingest.document", document_id=str(document_id)):
+                await self._ingest(document)
+        except LeaseLost as e:
+            logger.warning(f"Stopped ingestion job: {e}", document_id=str(document_id))
+        except IngestionError as e:
+            logger.warning(f"{e.code}: {e}", document_id=str(document_id))
+            await self._set_status(document_id, "failed", embedding_error={"code": e.code, "message": str(e)})
+        except Exception as e:
+            logger.error(f"Error processing document {document_id}: {e}", exc_info=True)
+            await self._set_status(document_id, "failed", embedding_error={"code": "INGESTION_FAILED", "message": str(e)})
+        finally:
+            renewal.cancel()
+
+    async def find_duplicate(self, content_hash: str | None, exclude_id: ObjectId | None = None) -> Dict[str, Any] | None:
+        """A completed document with the same file content and chunking settings, if any"""
+        if not content_hash:
+            return None
+        db = await get_database()
+        query: Dict[str, Any] = {
+            "content_hash": content_hash,
+            "chunking_key": chunking_key(),
+            "embedding_status": "completed",
+            "is_disabled": {"$ne": True},
+        }
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        return await db.documents_metadata.find_one(query)
+
+    async def _active_chunks(self, document_id: ObjectId) -> List[Dict[str, Any]]:
+        db = await get_database()
+        chunks = await db[settings.DOCUMENT_CHUNKS_COLLECTION].find(
+            {"document_id": document_id, "is_disabled": {"$ne": True}}
+        ).to_list(length=None)
+        return sorted(chunks, key=lambda chunk: chunk.get("chunk_index", 0))
+
+    @staticmethod
+    def _chunk_doc(document: Dict[str, Any], index: int, text: str, embedding: Vector, hash_: str) -> Dict[str, Any]:
+        return {
+            "document_id": document["_id"],
+            "equipment_id": document["equipment_id"],
+            "tenant_id": document["tenant_id"],
+            "file_name": document.get("file_name", ""),
+            "chunk_id": str(uuid.uuid4()),
+            "chunk_index": index,
+            "chunk_hash": hash_,
+            "text": text,
+            **encode_embedding(embedding),
+            "is_disabled": False,
+        }
+
+    async def _embed_with_reuse(
+            self,
+            document_id: ObjectId,
+            chunks: List[str],
+            known: Dict[str, Vector],
+    ) -> tuple[List[Vector | None], List[str], int]:
+        """Vectors for `chunks`, taken from `known` or the embedding store where possible.
+
+        Returns (vectors, chunk hashes, number of chunks that needed no embedding call).
+        """
+        hashes = [chunk_hash(chunk) for chunk in chunks]
+        stored = await self.embedding_store.get_many([hash_ for hash_ in hashes if hash_ not in known])
+        vectors: List[Vector | None] = [
+            known[hash_] if hash_ in known else stored.get(hash_) for hash_ in hashes
+        ]
+        reused = sum(vector is not None for vector in vectors)
+
+        # Embed each distinct missing text once, even if it repeats in the document
+        missing: Dict[str, List[int]] = {}
+        for index, (hash_, vector) in enumerate(zip(hashes, vectors)):
+            if vector is None:
+                missing.setdefault(hash_, []).append(index)
+
+        await self._set_status(document_id, "processing", chunks_embedded=reused, chunks_reused=reused)
+
+        async def report_progress(chunks_embedded: int) -> None:
+            await self._set_status(document_id, "processing", chunks_embedded=reused + chunks_embedded)
+
+        missing_hashes = list(missing)
+        new_vectors = await self.embedding_service.embed_chunks(
+            [chunks[missing[hash_][0]] for hash_ in missing_hashes],
+            on_progress=report_progress,
+        )
+
+        fresh = {}
+        for hash_, vector in zip(missing_hashes, new_vectors):
+            if vector is None:
+                continue
+            fresh[hash_] = vector
+            for index in missing[hash_]:
+                vectors[index] = vector
+        await self.embedding_store.put_many(fresh)
+
+        return vectors, hashes, reused
+
+    async def _apply_chunks(
+            self,
+            document: Dict[str, Any],
+            chunks: List[str],
+            vectors: List[Vector | None],
+            hashes: List[str],
+            existing: List[Dict[str, Any]],
+    ) -> Dict[str, int]:
+        """Diff the new chunk list against the document's active chunks and write only the difference.
+
+        Unchanged chunks keep their ids and vectors (re-numbered if they moved),
+        new ones are inserted and chunks no longer present are disabled.
+        """
+        db = await get_database()
+        chunks_collection = db[settings.DOCUMENT_CHUNKS_COLLECTION]
+        file_name = document.get("file_name", "")
+
+        by_hash: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk in existing:
+            by_hash.setdefault(chunk.get("chunk_hash") or chunk_hash(chunk["text"]), []).append(chunk)
+
+        inserted: List[Dict[str, Any]] = []
+        moved: List[Dict[str, Any]] = []
+        kept = 0
+        for index, (text, vector, hash_) in enumerate(zip(chunks, vectors, hashes)):
+            matches = by_hash.get(hash_)
+            if matches:
+                chunk = matches.pop(0)
+                kept += 1
+                if (chunk.get("chunk_index"), chunk.get("file_name"), chunk.get("chunk_hash")) != (index, file_name, hash_):
+                    chunk.update(chunk_index=index, file_name=file_name, chunk_hash=hash_)
+                    moved.append(chunk)
+            elif vector is not None:
+                inserted.append(self._chunk_doc(document, index, text, vector, hash_))
+            # else: embedding failed, already logged by the embedding service
+
+        removed_ids = [chunk["_id"] for matches in by_hash.values() for chunk in matches]
+
+        if moved:
+            await chunks_collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": chunk["_id"]},
+                        {"$set": {"chunk_index": chunk["chunk_index"], "file_name": file_name, "chunk_hash": chunk["chunk_hash"]}},
+                    )
+                    for chunk in moved
+                ],
+                ordered=False,
+            )
+        if removed_ids:
+            await chunks_collection.update_many(
+                {"_id": {"$in": removed_ids}},
+                {"$set": {"is_disabled": True}},
+            )
+        if inserted:
+            with span("ingest.insert_many", chunks=len(inserted)):
+                await chunks_collection.insert_many(inserted)
+
+        with span("ingest.index"):
+            await self.rag_service.disable_chunks(removed_ids + [chunk["_id"] for chunk in moved])
+            await self.rag_service.index_chunks(inserted + moved)
+
+        stats = {"chunks_kept": kept, "chunks_added": len(inserted), "chunks_disabled": len(removed_ids)}
+        logger.info("Chunks written to database", document_id=str(document["_id"]), **stats)
+        return stats
+
+    async def _ingest(self, document: Dict[str, Any]) -> None:
+        document_id = document["_id"]
+        original_name = document.get("file_name", "")
+        file_path = self.storage_path(document["storage_key"])
+
+        await self._set_status(document_id, "processing", embedding_error=None)
+
+        # Chunks from a previous version (replace) or an interrupted run (resume)
+        existing = await self._active_chunks(document_id)
+        known = {chunk.get("chunk_hash") or chunk_hash(chunk["text"]): decode_embedding(chunk) for chunk in existing}
+
+        duplicate = await self.find_duplicate(document.get("content_hash"), exclude_id=document_id)
+        source_chunks = await self._active_chunks(duplicate["_id"]) if duplicate else []
+
+        if source_chunks:
+            # Identical file already ingested: take its chunks and vectors as-is
+            chunks = [chunk["text"] for chunk in source_chunks]
+            known.update(
+                (chunk.get("chunk_hash") or chunk_hash(chunk["text"]), decode_embedding(chunk))
+                for chunk in source_chunks
+            )
+        else:
+            duplicate = None
+
+            try:
+                with span("ingest.extract", content_type=document.get("content_type", "")):
+                    extracted_text = await asyncio.to_thread(
+                        self.text_extractor.extract_text, file_path, document.get("content_type", "")
+                    )
+            except ValueError as e:
+                raise IngestionError("UNSUPPORTED_FORMAT", str(e))
+            except FileNotFoundError as e:
+                raise IngestionError("FILE_NOT_FOUND", str(e))
+            except Exception as e:
+                raise IngestionError("EXTRACTION_FAILED", str(e))
+
+            logger.info(
+                "Text extracted from document",
+                file_name=original_name,
+                text_length=len(extracted_text or ""),
+            )
+
+            if not extracted_text or not extracted_text.strip():
+                raise IngestionError("EMPTY_DOCUMENT", f"No text content extracted from {original_name}")
+
+            with span("ingest.split"):
+                chunks = self.embedding_service.split_text(extracted_text)
+            logger.info(
+                "Document text split into chunks",
+                file_name=original_name,
+                chunk_count=len(chunks),
+            )
+
+            if not chunks:
+                raise IngestionError("NO_CHUNKS", "Text splitting resulted in no chunks")
+
+        await self._set_status(document_id, "processing", chunks_total=len(chunks), chunks_embedded=0)
+
+        with span("ingest.embed", chunks=len(chunks)):
+            vectors, hashes, reused = await self._embed_with_reuse(document_id, chunks, known)
+        chunks_embedded = sum(vector is not None for vector in vectors)
+
+        if not chunks_embedded:
+            raise IngestionError("EMBEDDING_FAILED", "Failed to generate embeddings for all chunks")
+
+        with span("ingest.write"):
+            stats = await self._apply_chunks(document, chunks, vectors, hashes, existing)
+
+        await self._set_status(
+            document_id,
+            "completed",
+            previous_storage_key=None,
+            chunking_key=chunking_key(),
+            duplicate_of=duplicate["_id"] if duplicate else None,
+            chunks_embedded=chunks_embedded,
+            chunks_reused=reused,
+            **stats,
+        )
+
+        if document.get("previous_storage_key"):
+            # The replaced version's chunks are gone, so its file can go too
+            self.remove_stored(document["previous_storage_key"])
+
+        logger.success(
+            "Document embedding completed",
+            document_id=str(document_id),
+            chunks_embedded=chunks_embedded,
+            chunks_reused=reused,
+            total_chunks=len(chunks),
+            **stats,
+        )
+
+
+def serialize_job(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Job-status view of a `documents_metadata` document"""
+    return {
+        "job_id": str(document["_id"]),
+        "document_id": str(document["_id"]),
+        "equipment_id": str(document.get("equipment_id", "")),
+        "file_name": document.get("file_name"),
+        "status": document.get("embedding_status"),
+        "progress": {
+            "chunks_embedded": document.get("chunks_embedded", 0),
+            "chunks_total": document.get("chunks_total", 0),
+        },
+        "reuse": {
+            "duplicate_of": str(document["duplicate_of"]) if document.get("duplicate_of") else None,
+            "chunks_reused": document.get("chunks_reused", 0),
+            "chunks_kept": document.get("chunks_kept", 0),
+            "chunks_added": document.get("chunks_added", 0),
+            "chunks_disabled": document.get("chunks_disabled", 0),
+        },
+        "error": document.get("embedding_error"),
+        "created_at": document["created_at"].isoformat() if isinstance(document.get("created_at"), datetime) else None,
+        "updated_at": document["updated_at"].isoformat() if isinstance(document.get("updated_at"), datetime) else None,
+    }
+
@@ -0,0 +1,334 @@
+import asyncio
+import math
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from loguru import logger
+
+from app.config import settings
+from app.database import get_database
+from app.services.cache import WeightedLRUCache
+from app.services.vector_store import RESULT_FIELDS
+
+# Words joined by -, _, / or . stay one token ("pn-12345", "v2.1"); the parts are indexed too
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_/.][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[-_/.]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or should "
+    "that the there this to was what when where which who why will with you your".split()
+)
+
+_UNITS = (
+    "mm|cm|m|km|in|ft|v|kv|mv|a|ma|mah|ah|w|kw|va|kva|hz|khz|mhz|ghz|g|kg|mg|lb|lbs|oz|"
+    "psi|bar|pa|kpa|mpa|nm|rpm|c|f|s|ms|h|hr|hrs|min|l|ml|db|kb|mb|gb|tb|pcs"
+)
+# Alphanumeric tokens that are not identifiers: "10mm", "3.5v", "10x20", "2x4in", "1st"
+_MEASUREMENT = re.compile(
+    rf"\d+(?:\.\d+)?(?:x\d+(?:\.\d+)?)*(?:{_UNITS})"
+    r"|\d+(?:\.\d+)?(?:x\d+(?:\.\d+)?)+"
+    r"|\d+(?:st|nd|rd|th)"
+)
+_MIN_CODE_LENGTH = 4
+_MIN_NUMERIC_CODE_LENGTH = 6
+
+_Key = Tuple[Optional[str], str]
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased index terms; compound identifiers also yield their parts and a joined form"""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        parts = _SEPARATORS.split(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in _STOPWORDS)
+            terms.append("".join(parts))
+    return terms
+
+
+def _is_measurement(term: str) -> bool:
+    return _MEASUREMENT.fullmatch(term) is not None
+
+
+def is_code(term: str) -> bool:
+    """Part numbers, error codes and model strings ("e204", "pn-88231", "xk-9931").
+
+    Letters and digits must appear together, either in parts joined by a separator
+    or in one run of at least _MIN_CODE_LENGTH characters. Measurements ("10mm",
+    "24v"), ordinals ("1st") and plain numbers such as years are not codes; only
+    digit runs long enough to be a part number are.
+    """
+    if term.isdigit():
+        return len(term) >= _MIN_NUMERIC_CODE_LENGTH
+    if _is_measurement(term):
+        return False
+    parts = _SEPARATORS.split(term)
+    if len(parts) > 1:
+        rest = "".join(part for part in parts if not _is_measurement(part))
+        return any(c.isalpha() for c in rest) and any(c.isdigit() for c in rest)
+    return len(term) >= _MIN_CODE_LENGTH and any(c.isdigit() for c in term) and any(c.isalpha() for c in term)
+
+
+def code_terms(query: str) -> Set[str]:
+    return {term for term in _TOKEN.findall(query.lower()) if is_code(term)}
+
+
+# (row, term frequencies, length) for one chunk, computed off the event loop
+_Prepared = Tuple[Dict[str, Any], Dict[str, int], int]
+
+
+def _prepare(chunks: Iterable[Dict[str, Any]]) -> List[_Prepared]:
+    prepared = []
+    for chunk in chunks:
+        terms = tokenize(chunk.get("text") or "")
+        frequencies: Dict[str, int] = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        prepared.append(({field: chunk.get(field) for field in RESULT_FIELDS}, frequencies, len(terms)))
+    return prepared
+
+
+class _LexicalPartition:
+    """Inverted index (term -> {position: term frequency}) over one tenant/equipment slice.
+
+    Disabled chunks are only marked dead; their postings go away on the next
+    reload, so disabling stays O(1) per chunk.
+    """
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.positions: Dict[Any, List[int]] = {}
+        self.dead: Set[int] = set()
+        self.live = 0
+        self.total_length = 0
+        self.loaded_at = time.monotonic()
+
+    def apply(self, prepared: Iterable[_Prepared]) -> None:
+        for row, frequencies, length in prepared:
+            if row.get("_id") in self.positions:
+                # Already loaded from Mongo when a reload replays this add
+                continue
+            position = len(self.rows)
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, {})[position] = frequency
+            self.rows.append(row)
+            self.lengths.append(length)
+            self.positions.setdefault(row.get("_id"), []).append(position)
+            self.live += 1
+            self.total_length += length
+
+    def disable(self, chunk_ids: Iterable[Any]) -> None:
+        for chunk_id in chunk_ids:
+            for position in self.positions.pop(chunk_id, []):
+                self.dead.add(position)
+                self.live -= 1
+                self.total_length -= self.lengths[position]
+
+    def score(self, terms: Iterable[str], candidates: Optional[Set[int]] = None) -> Dict[int, float]:
+        """BM25 score per position for `terms`, optionally only over `candidates`"""
+        scores: Dict[int, float] = {}
+        if not self.live:
+            return scores
+        average_length = self.total_length / self.live or 1.0
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            # Document frequency counts dead rows until the next reload; close enough for ranking
+            idf = math.log(1 + (self.live - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings.items():
+                if position in self.dead or (candidates is not None and position not in candidates):
+                    continue
+                norm = _K1 * (1 - _B + _B * self.lengths[position] / average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (_K1 + 1) / (frequency + norm)
+        return scores
+
+    def containing_all(self, terms: Set[str]) -> Set[int]:
+        postings = [self.postings.get(term) for term in terms]
+        if not postings or any(not p for p in postings):
+            return set()
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for other in postings[1:]:
+            matches.intersection_update(other)
+        return matches - self.dead
+
+
+def _build(chunks: List[Dict[str, Any]]) -> _LexicalPartition:
+    partition = _LexicalPartition()
+    partition.apply(_prepare(chunks))
+    return partition
+
+
+class LexicalIndex:
+    """BM25 index over `document_chunks` text, one partition per tenant/equipment.
+
+    Partitions are loaded from Mongo on first use and kept current through
+    `add_chunks` / `disable_chunks` by this process's ingestion. After
+    LEXICAL_INDEX_REFRESH_SECS a partition is reloaded in the background, to
+    pick up writes from other processes, while searches keep using the old
+    one. Tokenizing and building run in a thread, and concurrent loads of one
+    partition share a single task. Past LEXICAL_INDEX_MAX_PARTITIONS or
+    LEXICAL_INDEX_MAX_CHUNKS the least recently searched partitions are evicted.
+    """
+
+    def __init__(self):
+        self._partitions = WeightedLRUCache(
+            maxsize=settings.LEXICAL_INDEX_MAX_PARTITIONS,
+            max_weight=settings.LEXICAL_INDEX_MAX_CHUNKS,
+        )
+        self._loads: Dict[_Key, asyncio.Task] = {}
+        # Adds / disables seen while a load runs, replayed onto the new partition
+        self._replay: Dict[_Key, List[Tuple[str, Any]]] = {}
+        # Keys whose in-flight load is a background refresh rather than a search
+        self._refreshing: Set[_Key] = set()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._partitions.stats()
+
+    def _stale(self, partition: _LexicalPartition) -> bool:
+        refresh = settings.LEXICAL_INDEX_REFRESH_SECS
+        return bool(refresh) and time.monotonic() - partition.loaded_at > refresh
+
+    async def _partition(self, tenant_id: Optional[str], equipment_id: str) -> _LexicalPartition:
+        key = (tenant_id, equipment_id)
+        partition = self._partitions.get(key)
+        if partition is not None:
+            if self._stale(partition) and key not in self._loads:
+                self._start_load(key, refresh=True)
+            return partition
+
+        # A search now wants this key, so an in-flight refresh of it must cache its result
+        self._refreshing.discard(key)
+        load = self._loads.get(key) or self._start_load(key)
+        # Shielded so a cancelled search does not cancel the load others wait on
+        return await asyncio.shield(load)
+
+    def _start_load(self, key: _Key, refresh: bool = False) -> asyncio.Task:
+        self._replay[key] = []
+        if refresh:
+            self._refreshing.add(key)
+        task = asyncio.ensure_future(self._load(key))
+        self._loads[key] = task
+        task.add_done_callback(lambda done: self._load_finished(key, done))
+        return task
+
+    def _load_finished(self, key: _Key, task: asyncio.Task) -> None:
+        self._loads.pop(key, None)
+        self._replay.pop(key, None)
+        self._refreshing.discard(key)
+        if task.cancelled() or task.exception() is None:
+            return
+        stale = self._partitions.peek(key)
+        if stale is not None:
+            # Keep serving the old partition; retry after another refresh interval
+            stale.loaded_at = time.monotonic()
+            logger.warning(f"Lexical index refresh failed for {key}: {task.exception()}")
+
+    async def _load(self, key: _Key) -> _LexicalPartition:
+        tenant_id, equipment_id = key
+        query: Dict[str, Any] = {"equipment_id": ObjectId(equipment_id), "is_disabled": {"$ne": True}}
+        if tenant_id:
+            query["tenant_id"] = tenant_id
+        db = await get_database()
+        if db is None:
+            raise ConnectionError("Database collection is not available. Connection failed.")
+        chunks = await db[settings.DOCUMENT_CHUNKS_COLLECTION].find(
+            query, {field: 1 for field in RESULT_FIELDS}
+        ).to_list(length=None)
+
+        partition = await asyncio.to_thread(_build, chunks)
+        for operation, payload in self._replay.get(key, []):
+            if operation == "add":
+                partition.apply(payload)
+            else:
+                partition.disable(payload)
+        if key in self._refreshing and key not in self._partitions:
+            # Evicted while the background refresh ran and not searched since
+            return partition
+        self._partitions.set(key, partition, len(partition.rows))
+        logger.info(
+            "Loaded lexical index partition",
+            tenant_id=tenant_id,
+            equipment_id=equipment_id,
+            chunks=partition.live,
+            terms=len(partition.postings),
+        )
+        return partition
+
+    @staticmethod
+    def _results(partition: _LexicalPartition, scores: Dict[int, float], k: int) -> List[Dict[str, Any]]:
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{**partition.rows[position], "score": score} for position, score in ranked]
+
+    async def search(
+            self,
+            query: str,
+            k: int,
+            equipment_id: str,
+            tenant_id: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Top `k` chunks by BM25, with the raw BM25 score in `score`"""
+        partition = await self._partition(tenant_id, equipment_id)
+        return self._results(partition, partition.score(tokenize(query)), k)
+
+    async def search_codes(
+            self,
+            query: str,
+            k: int,
+            equipment_id: str,
+            tenant_id: str | None = None,
+    ) -> List[Dict[str, Any]] | None:
+        """Chunks containing every code-like term in `query`, ranked by BM25.
+
+        None when the query has no code-like terms or no chunk contains all of them.
+        """
+        codes = code_terms(query)
+        if not codes:
+            return None
+        partition = await self._partition(tenant_id, equipment_id)
+        candidates = partition.containing_all(codes)
+        if not candidates:
+            return None
+        return self._results(partition, partition.score(tokenize(query), candidates), k)
+
+    @staticmethod
+    def _matching(key: _Key, prepared: List[_Prepared]) -> List[_Prepared]:
+        tenant_id, equipment_id = key
+        return [
+            item for item in prepared
+            if (tenant_id is None or item[0].get("tenant_id") == tenant_id)
+            and str(item[0].get("equipment_id")) == equipment_id
+        ]
+
+    async def add_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        chunks = [chunk for chunk in chunks if not chunk.get("is_disabled")]
+        if not chunks or not (self._partitions or self._loads):
+            return
+        prepared = await asyncio.to_thread(_prepare, chunks)
+        for key, partition in self._partitions.items():
+            matching = self._matching(key, prepared)
+            if matching:
+                partition.apply(matching)
+                self._partitions.reweigh(key, len(partition.rows))
+        for key, replay in self._replay.items():
+            matching = self._matching(key, prepared)
+            if matching:
+                replay.append(("add", matching))
+
+    async def disable_chunks(self, chunk_ids: List[Any]) -> None:
+        for partition in self._partitions.values():
+            partition.disable(chunk_ids)
+        for replay in self._replay.values():
+            replay.append(("disable", list(chunk_ids)))
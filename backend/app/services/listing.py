@@ -0,0 +1,116 @@
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+# Fields the UI shows, so listings never ship embeddings or storage internals
+EQUIPMENT_LIST_FIELDS = ("name", "description", "tenant_id", "is_active", "created_at", "updated_at")
+DOCUMENT_LIST_FIELDS = (
+    "equipment_id",
+    "tenant_id",
+    "file_name",
+    "content_type",
+    "size",
+    "description",
+    "document_type",
+    "embedding_status",
+    "embedding_error",
+    "chunks_total",
+    "chunks_embedded",
+    "created_at",
+    "updated_at",
+)
+
+
+def projection(fields: Tuple[str, ...]) -> Dict[str, int]:
+    return {field: 1 for field in fields}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(document: Mapping[str, Any]) -> str:
+    """Mongo document as JSON, ObjectIds and datetimes as strings"""
+    return json.dumps(document, default=_default)
+
+
+def parse_cursor(after: Optional[str]) -> Optional[ObjectId]:
+    if after is None:
+        return None
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return ObjectId(after)
+
+
+async def keyset_page(
+        collection,
+        query: Dict[str, Any],
+        fields: Tuple[str, ...],
+        limit: int,
+        after: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page in `_id` order after the `after` cursor, and the cursor for the next page (None on the last)"""
+    cursor_id = parse_cursor(after)
+    if cursor_id is not None:
+        query = {**query, "_id": {"$gt": cursor_id}}
+
+    # One extra row tells whether another page follows without a count query
+    documents = await collection.find(query, projection(fields)).sort("_id", 1).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = str(documents[limit - 1]["_id"]) if len(documents) > limit else None
+    return documents[:limit], next_cursor
+
+
+async def _row_batches(
+        collection,
+        query: Dict[str, Any],
+        fields: Tuple[str, ...],
+        batch_size: int,
+) -> AsyncIterator[List[str]]:
+    rows: List[str] = []
+    async for document in collection.find(query, projection(fields), batch_size=batch_size).sort("_id", 1):
+        rows.append(to_json(document))
+        if len(rows) >= batch_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+async def stream_json_array(
+        collection,
+        query: Dict[str, Any],
+        fields: Tuple[str, ...],
+        batch_size: int,
+) -> AsyncIterator[bytes]:
+    """Every matching document as one JSON array, encoded `batch_size` rows at a time"""
+    yield b"["
+    separator = ""
+    async for rows in _row_batches(collection, query, fields, batch_size):
+        yield (separator + ",".join(rows)).encode("utf-8")
+        separator = ","
+    yield b"]"
+
+
+async def stream_json_page(
+        collection,
+        query: Dict[str, Any],
+        fields: Tuple[str, ...],
+        batch_size: int,
+        key: str,
+) -> AsyncIterator[bytes]:
+    """Every matching document as one last page: {key: [...], "count": n, "next_cursor": null}"""
+    yield f'{{"{key}":['.encode("utf-8")
+    separator = ""
+    count = 0
+    async for rows in _row_batches(collection, query, fields, batch_size):
+        yield (separator + ",".join(rows)).encode("utf-8")
+        separator = ","
+        count += len(rows)
+    yield f'],"count":{count},"next_cursor":null}}'.encode("utf-8")
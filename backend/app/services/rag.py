@@ -1,146 +1,303 @@
 import asyncio
-from typing import Any, Optional
+import re
+from typing import Any, List, Optional
 from bson import ObjectId
 from loguru import logger
 from pydantic import BaseModel, Field
 
-from app.database import get_database
 from app.services.embeddings import EmbeddingService
+from app.tracing import span
+from app.services.cache import TTLCache
+from app.services.lexical_index import LexicalIndex, code_terms
+from app.services.retrieval_tuning import RetrievalTuning
+from app.services.vector_store import VectorStore, get_vector_store
 from app.config import settings
 from app.models.rag import ChunkContent, ChunkMetadata, RetrievalMetadata, RetrievalResult
 
-embeddings_service = EmbeddingService()
-  
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (case, whitespace, trailing punctuation)"""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().lower()
+
+
+def lexical_relevance(bm25: float) -> float:
+    """Squash a BM25 score into the 0-1 range of the `score` field"""
+    return bm25 / (bm25 + 1.0)
+
+
+def reciprocal_rank_fusion(*rankings: List[dict[str, Any]], k: int) -> List[dict[str, Any]]:
+    """Merge ranked result lists by sum of 1 / (RRF_K + rank).
+
+    A chunk keeps the row (and score) from the first list it appears in.
+    """
+    fused: dict[Any, float] = {}
+    rows: dict[Any, dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            key = row.get("_id") or row.get("chunk_id")
+            fused[key] = fused.get(key, 0.0) + 1.0 / (settings.RETRIEVAL_RRF_K + rank + 1)
+            rows.setdefault(key, row)
+    ordered = sorted(fused, key=fused.get, reverse=True)[:k]
+    return [rows[key] for key in ordered]
+
 
 class RAGService:
-    def __init__(self, index_name: str= None):
+    """Query embedding, vector retrieval and the lexical (BM25) index.
+
+    Build one per process (see app/services/registry.py); the query embedding
+    cache lives on the instance.
+    """
+
+    def __init__(
+            self,
+            index_name: str= None,
+            vector_store: VectorStore | None = None,
+            embedding_service: EmbeddingService | None = None,
+            lexical_index: LexicalIndex | None = None,
+            retrieval_tuning: RetrievalTuning | None = None,
+    ):
         self.index_name = index_name or settings.VECTOR_INDEX_NAME
-        logger.info(f"RAGService initialized with index: {self.index_name}")
+        self.vector_store = vector_store or get_vector_store(self.index_name)
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.lexical_index = lexical_index or LexicalIndex()
+        self.retrieval_tuning = retrieval_tuning or RetrievalTuning()
+        self.query_cache = TTLCache(
+            maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL_SECS,
+        )
+        logger.info(f"RAGService initialized with index: {self.index_name} ({type(self.vector_store).__name__})")
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, serving repeated questions from the in-process cache"""
+        if not settings.QUERY_EMBEDDING_CACHE_ENABLED:
+            return await self.embedding_service.aembed_text(query)
+
+        key = (settings.EMBEDDING_MODEL, normalize_query(query))
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            logger.debug("Query embedding served from cache")
+            return cached
+
+        embedding = await self.embedding_service.aembed_text(query)
+        self.query_cache.set(key, embedding)
+        return embedding
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries in input order; cache misses go out in one batched request"""
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        missing: dict[Any, List[int]] = {}
+        for index, query in enumerate(queries):
+            key = (settings.EMBEDDING_MODEL, normalize_query(query))
+            cached = self.query_cache.get(key) if settings.QUERY_EMBEDDING_CACHE_ENABLED else None
+            if cached is not None:
+                embeddings[index] = cached
+            else:
+                missing.setdefault(key, []).append(index)
+
+        if missing:
+            texts = [queries[indexes[0]] for indexes in missing.values()]
+            vectors = await self.embedding_service.aembed_queries(texts)
+            for (key, indexes), vector in zip(missing.items(), vectors):
+                if settings.QUERY_EMBEDDING_CACHE_ENABLED:
+                    self.query_cache.set(key, vector)
+                for index in indexes:
+                    embeddings[index] = vector
+        return embeddings
+
+    def cache_stats(self) -> dict[str, Any]:
+        return self.query_cache.stats()
+
+    async def index_chunks(self, chunks: list[dict[str, Any]]) -> None:
+        """Make freshly inserted chunks searchable by in-process indexes"""
+        await self.vector_store.add_chunks(chunks)
+        await self.lexical_index.add_chunks(chunks)
+
+    async def disable_chunks(self, chunk_ids: list[Any]) -> None:
+        """Drop chunks (by `_id`) that were disabled in Mongo from in-process indexes"""
+        await self.vector_store.disable_chunks(chunk_ids)
+        await self.lexical_index.disable_chunks(chunk_ids)
 
     async def retrieve(
             self,
             query: str,
-            k: int = 5,
+            k: int | None = None,
             equipment_id: str | None = None,
             tenant_id: str | None = None,
             extra_filters: dict[str, Any] | None = None,
+            query_embedding: List[float] | None = None,
+            code_hits: List[dict[str, Any]] | None = None,
     ) -> RetrievalResult:
-        db = await get_database()
-        collection = db[settings.DOCUMENT_CHUNKS_COLLECTION]
+        with span("rag.retrieve", k=k, equipment_id=equipment_id):
+            try:
+                k, num_candidates = await self.retrieval_tuning.parameters(k, equipment_id, tenant_id)
+                logger.info(f"Starting retrieval for query: '{query[:50]}...' with (k={k}, num_candidates={num_candidates})")
 
-        try:
-            logger.info(f"Starting retrieval for query: '{query[:50]}...' with (k={k})")
+                filters = {}
 
-            if collection is None:
-                raise ConnectionError("Database collection is not available. Connection failed.")
-            try:
-                logger.debug("Generating query embedding...")
-                query_embedding = embeddings_service.embed_text(query)
-                logger.debug("Query embedding generated successfully")
-            except Exception as e:
-                logger.error(f"Failed to generate query embedding: {e}")
-                raise
-            
-            filters = {}
+                filters["is_disabled"] = {"$ne": True}
 
-            filters["is_disabled"] = {"$ne": True}
+                lexical = settings.LEXICAL_INDEX_ENABLED and not extra_filters
+                if equipment_id:
+                    try:
+                        filters["equipment_id"] = ObjectId(equipment_id)
+                        logger.debug(f"Added equipment_id filter: {equipment_id}")
+                    except Exception as e:
+                        logger.warning(f"Invalid equipment_id provided: {equipment_id}.skipping filter. Error: {e}")
+                        lexical = False
+                else:
+                    # Lexical partitions are per equipment
+                    lexical = False
 
-            if equipment_id:
-                try:
-                    filters["equipment_id"] = ObjectId(equipment_id)
-                    logger.debug(f"Added equipment_id filter: {equipment_id}")
-                except Exception as e:
-                    logger.warning(f"Invalid equipment_id provided: {equipment_id}.skipping filter. Error: {e}")
-
-            if tenant_id:
-                filters["tenant_id"] = tenant_id
-                logger.debug(f"Added tenant_id filter: {tenant_id}")
-
-            if extra_filters:
-                filters.update(extra_filters)
-                logger.debug(f"Added extra filters: {extra_filters}")
-
-            vector_query = {
-                "$vectorSearch": {
-                    "index": self.index_name,
-                    "path": "embedding",
-                    "queryVector": query_embedding,
-                    "numCandidates": k * 5,
-                    "limit": k,
-                }
-            }
-
-            if filters:
-                vector_query["$vectorSearch"]["filter"] = filters
-                logger.debug(f"Applied filters to vector search: {filters}")
-
-            pipeline=[
-                vector_query,
-                {
-                    "$project": {
-                        "_id": 1,
-                        "chunk_id": 1,
-                        "document_id": 1,
-                        "file_name": 1,
-                        "text": 1,
-                        "chunk_index": 1,
-                        "equipment_id": 1,
-                        "tenant_id": 1,
-                        "score": {"$meta": "vectorSearchScore"},
-                    }
-                }
-            ]
+                if tenant_id:
+                    filters["tenant_id"] = tenant_id
+                    logger.debug(f"Added tenant_id filter: {tenant_id}")
 
-            try:
-                logger.debug("Executing aggregation pipeline for vector search...")
-                cursor = collection.aggregate(pipeline)
-                results = await cursor.to_list(length=k)
-                logger.info(f"Retrieved {len(results)} chunks from vector search")
-            except Exception as e:
-                logger.error(f"Failed to execute vector search aggregation: {e}")
-                raise
+                if extra_filters:
+                    filters.update(extra_filters)
+                    logger.debug(f"Added extra filters: {extra_filters}")
 
-            chunk_data=[]
-            chunk_metadata=[]
+                results = None
+                if lexical:
+                    # Part numbers and error codes: answer from the inverted index, no embedding call
+                    if not code_hits:
+                        with span("rag.lexical_codes"):
+                            code_hits = await self.lexical_index.search_codes(query, k, equipment_id, tenant_id)
+                    if code_hits:
+                        results = [{**hit, "score": lexical_relevance(hit["score"])} for hit in code_hits]
+                        logger.info(f"Retrieved {len(results)} chunks from the lexical index (code match)")
 
-            try:
-                for res in results:
-                    chunk_data.append(ChunkContent(
-                        text=res.get("text", ""),
-                        file_name=res.get("file_name", ""),
-                        score=res.get("score")
-                    ))
-
-                    chunk_metadata.append(ChunkMetadata(
-                        chunk_id=str(res.get("chunk_id","")),
-                        document_id=str(res.get("document_id","")),
-                        equipment_id=str(res.get("equipment_id","")),
-                        tenant_id=res.get("tenant_id"),
-                        chunk_index=res.get("chunk_index", 0),
-                        score=res.get("score", 0.0),
-                        file_name=res.get("file_name", "")
-                    ))
+                if results is None:
+                    if query_embedding is None:
+                        try:
+                            logger.debug("Generating query embedding...")
+                            with span("rag.embed_query"):
+                                query_embedding = await self.embed_query(query)
+                            logger.debug("Query embedding generated successfully")
+                        except Exception as e:
+                            logger.error(f"Failed to generate query embedding: {e}")
+                            raise
+
+                    try:
+                        with span("rag.vector_search", k=k):
+                            results = await self.vector_store.search(
+                                query_embedding,
+                                k=k,
+                                num_candidates=num_candidates,
+                                filters=filters,
+                            )
+                        logger.info(f"Retrieved {len(results)} chunks from vector search")
+                    except Exception as e:
+                        logger.error(f"Failed to execute vector search: {e}")
+                        raise
+
+                    if lexical:
+                        with span("rag.lexical"):
+                            lexical_hits = await self.lexical_index.search(query, k, equipment_id, tenant_id)
+                        if lexical_hits:
+                            results = reciprocal_rank_fusion(
+                                results,
+                                [{**hit, "score": lexical_relevance(hit["score"])} for hit in lexical_hits],
+                                k=k,
+                            )
+
+                chunk_data=[]
+                chunk_metadata=[]
+
+                try:
+                    with span("rag.build_models", results=len(results)):
+                        for res in results:
+                            chunk_data.append(ChunkContent(
+                                text=res.get("text", ""),
+                                file_name=res.get("file_name", ""),
+                                score=res.get("score")
+                            ))
+
+                            chunk_metadata.append(ChunkMetadata(
+                                chunk_id=str(res.get("chunk_id","")),
+                                document_id=str(res.get("document_id","")),
+                                equipment_id=str(res.get("equipment_id","")),
+                                tenant_id=res.get("tenant_id"),
+                                chunk_index=res.get("chunk_index", 0),
+                                score=res.get("score", 0.0),
+                                file_name=res.get("file_name", "")
+                            ))
                     logger.success(f"Successfully processed {len(chunk_data)} chunks")
 
+                except Exception as e:
+                    logger.error(f"Error processing retrieved chunks: {e}")
+                    raise
+
+                result = RetrievalResult(
+                    data=chunk_data,
+                    metadata=RetrievalMetadata(
+                        query=query,
+                        k=k,
+                        chunks_retrieved=len(chunk_data),
+                        equipment_id=equipment_id,
+                        tenant_id=tenant_id,
+                        chunks=chunk_metadata
+                    )
+                )
+
+                return result
+        
             except Exception as e:
-                logger.error(f"Error processing retrieved chunks: {e}")
+                logger.error(f"Error during retrieval operation: {e}")
                 raise
 
-            result = RetrievalResult(
-                data=chunk_data,
-                metadata=RetrievalMetadata(
-                    query=query,
-                    k=k,
-                    chunks_retrieved=len(chunk_data),
-                    equipment_id=equipment_id,
-                    tenant_id=tenant_id,
-                    chunks=chunk_metadata
-                )
+    async def retrieve_many(
+            self,
+            queries: List[str],
+            k: int | None = None,
+            equipment_id: str | None = None,
+            tenant_id: str | None = None,
+            extra_filters: dict[str, Any] | None = None,
+    ) -> List[RetrievalResult]:
+        """`retrieve` for several queries, results in input order.
+
+        Queries the lexical index answers by code match go first; the rest get
+        their embeddings from one batched request. The searches then run
+        concurrently, at most RETRIEVAL_CONCURRENCY at a time.
+        """
+        if not queries:
+            return []
+
+        with span("rag.retrieve_many", queries=len(queries), k=k):
+            code_hits: List[List[dict[str, Any]] | None] = [None] * len(queries)
+            lexical = (
+                settings.LEXICAL_INDEX_ENABLED
+                and not extra_filters
+                and equipment_id is not None
+                and ObjectId.is_valid(equipment_id)
             )
+            if lexical and any(code_terms(query) for query in queries):
+                tuned_k, _ = await self.retrieval_tuning.parameters(k, equipment_id, tenant_id)
+                with span("rag.lexical_codes", queries=len(queries)):
+                    code_hits = list(await asyncio.gather(*(
+                        self.lexical_index.search_codes(query, tuned_k, equipment_id, tenant_id)
+                        for query in queries
+                    )))
 
-            return result
-        
-        except Exception as e:
-            logger.error(f"Error during retrieval operation: {e}")
-            raise
+            embeddings: List[List[float] | None] = [None] * len(queries)
+            to_embed = [index for index, hits in enumerate(code_hits) if not hits]
+            if to_embed:
+                with span("rag.embed_queries", queries=len(to_embed)):
+                    vectors = await self.embed_queries([queries[index] for index in to_embed])
+                for index, vector in zip(to_embed, vectors):
+                    embeddings[index] = vector
+
+            semaphore = asyncio.Semaphore(max(1, settings.RETRIEVAL_CONCURRENCY))
+
+            async def run(index: int) -> RetrievalResult:
+                async with semaphore:
+                    return await self.retrieve(
+                        queries[index],
+                        k=k,
+                        equipment_id=equipment_id,
+                        tenant_id=tenant_id,
+                        extra_filters=extra_filters,
+                        query_embedding=embeddings[index],
+                        code_hits=code_hits[index],
+                    )
 
+            return list(await asyncio.gather(*(run(index) for index in range(len(queries)))))
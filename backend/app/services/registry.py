@@ -0,0 +1,81 @@
+import httpx
+from fastapi import HTTPException, status
+from loguru import logger
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.services.admission import SessionAdmission
+from app.services.embeddings import EmbeddingService
+from app.services.equipment_cache import EquipmentCache
+from app.services.ingestion import IngestionService
+from app.services.lexical_index import LexicalIndex
+from app.services.rag import RAGService
+from app.services.retrieval_tuning import RetrievalTuning
+from app.services.text_extraction import TextExtractionService
+from app.services.vector_store import get_vector_store
+from app.services.voice_models import VoiceModels
+from app.services.voice_services import VoiceServiceFactory
+
+
+class ServiceRegistry:
+    """Process-wide services, built once in the app lifespan and shared by every request and bot session.
+
+    Owns the pooled HTTP client behind the embedding client, so keep-alive
+    connections to the embedding API are reused across calls.
+    """
+
+    def __init__(self):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=settings.EMBEDDING_HTTP_KEEPALIVE_SECS,
+            ),
+            timeout=settings.EMBEDDING_HTTP_TIMEOUT_SECS,
+        )
+        self.embedding_service = EmbeddingService(http_client=self.http_client)
+        self.embedding_service.check_http_client()
+        self.text_extractor = TextExtractionService()
+        self.vector_store = get_vector_store()
+        self.lexical_index = LexicalIndex()
+        self.rag_service = RAGService(
+            vector_store=self.vector_store,
+            embedding_service=self.embedding_service,
+            lexical_index=self.lexical_index,
+            retrieval_tuning=RetrievalTuning(),
+        )
+        self.ingestion_service = IngestionService(
+            embedding_service=self.embedding_service,
+            text_extractor=self.text_extractor,
+            rag_service=self.rag_service,
+        )
+        self.voice_models = VoiceModels()
+        self.voice_services = VoiceServiceFactory()
+        self.admission = SessionAdmission()
+        self.equipment_cache = EquipmentCache()
+
+    async def start(self) -> None:
+        self.voice_models.start()
+        await self.ingestion_service.start()
+        logger.info("Service registry started")
+
+    @property
+    def ready(self) -> bool:
+        return self.voice_models.ready
+
+    async def close(self) -> None:
+        await self.ingestion_service.stop()
+        self.voice_models.close()
+        await self.http_client.aclose()
+        logger.info("Service registry closed")
+
+
+def get_services(connection: HTTPConnection) -> ServiceRegistry:
+    """FastAPI dependency for the registry on `app.state` (works for HTTP and WebSocket routes)"""
+    services = getattr(connection.app.state, "services", None)
+    if services is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Services are not initialized",
+        )
+    return services
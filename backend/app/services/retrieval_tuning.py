@@ -0,0 +1,97 @@
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+from loguru import logger
+
+from app.config import settings
+from app.database import get_database
+from app.services.cache import TTLCache
+
+
+def size_bucket(chunks: int) -> int:
+    """Corpus-size bucket a chunk count falls in: the next power of ten, at least 100"""
+    return 10 ** max(2, math.ceil(math.log10(max(chunks, 1))))
+
+
+def default_num_candidates(k: int) -> int:
+    return k * settings.RETRIEVAL_NUM_CANDIDATES_MULTIPLIER
+
+
+class RetrievalTuning:
+    """k / numCandidates for a search, from the table `scripts.tune_retrieval` writes.
+
+    Each RETRIEVAL_TUNING_COLLECTION document holds, for one corpus-size
+    bucket and one k, the smallest numCandidates that met the target recall;
+    buckets tuned on labelled queries mark one document `recommended` (the
+    smallest such k). Elsewhere `k=None` keeps RETRIEVAL_DEFAULT_K, with its
+    tuned numCandidates when there is one. Without a table the defaults apply
+    and no corpus sizes are looked up.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._recommended: Dict[int, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._sizes = TTLCache(maxsize=4096, ttl=settings.RETRIEVAL_TUNING_REFRESH_SECS)
+
+    async def _load(self) -> None:
+        refresh = settings.RETRIEVAL_TUNING_REFRESH_SECS
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < refresh:
+            return
+        # Set first so a failing load is retried after the refresh interval, not per query
+        self._loaded_at = time.monotonic()
+
+        db = await get_database()
+        if db is None:
+            return
+        try:
+            documents = await db[settings.RETRIEVAL_TUNING_COLLECTION].find({}, {"_id": 0}).to_list(length=None)
+        except Exception as e:
+            logger.warning(f"Could not load retrieval tuning, using defaults: {e}")
+            return
+
+        self._entries = {(doc["bucket"], doc["k"]): doc for doc in documents}
+        self._recommended = {doc["bucket"]: doc for doc in documents if doc.get("recommended")}
+        if documents:
+            logger.info(f"Loaded retrieval tuning for buckets {sorted(self._recommended)}")
+
+    async def corpus_size(self, equipment_id: str, tenant_id: str | None = None) -> int:
+        """Active chunks for an equipment, cached for RETRIEVAL_TUNING_REFRESH_SECS"""
+        key = (tenant_id, equipment_id)
+        size = self._sizes.get(key)
+        if size is None:
+            query: Dict[str, Any] = {"equipment_id": ObjectId(equipment_id), "is_disabled": {"$ne": True}}
+            if tenant_id:
+                query["tenant_id"] = tenant_id
+            db = await get_database()
+            size = await db[settings.DOCUMENT_CHUNKS_COLLECTION].count_documents(query)
+            self._sizes.set(key, size)
+        return size
+
+    async def parameters(
+            self,
+            k: int | None,
+            equipment_id: str | None,
+            tenant_id: str | None = None,
+    ) -> Tuple[int, int]:
+        """(k, num_candidates) for a search; `k=None` means the tuned k for the corpus"""
+        default_k = k or settings.RETRIEVAL_DEFAULT_K
+        if settings.RETRIEVAL_TUNING_ENABLED:
+            await self._load()
+        if not self._entries or not equipment_id or not ObjectId.is_valid(equipment_id):
+            return default_k, default_num_candidates(default_k)
+
+        try:
+            bucket = size_bucket(await self.corpus_size(equipment_id, tenant_id))
+        except Exception as e:
+            logger.warning(f"Could not size corpus for {equipment_id}, using default retrieval settings: {e}")
+            return default_k, default_num_candidates(default_k)
+
+        entry = self._recommended.get(bucket) if k is None else None
+        entry = entry or self._entries.get((bucket, default_k))
+        if entry is None:
+            return default_k, default_num_candidates(default_k)
+        return entry["k"], entry["num_candidates"]
+
@@ -1,6 +1,77 @@
+import multiprocessing
 import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, List, Optional, Tuple, Union
+from loguru import logger
 from pypdf import PdfReader
 from docx import Document as DocxDocument
+from app.config import settings
+
+
+class PageTimeoutError(Exception):
+    pass
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeoutError()
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int, page_timeout: float) -> List[str]:
+    """Extract pages [start, end) in a worker process; a page that exceeds `page_timeout` yields ''"""
+    reader = PdfReader(file_path)
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout)
+    texts = []
+    try:
+        for page_number in range(start, end):
+            signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            try:
+                texts.append(reader.pages[page_number].extract_text() or "")
+            except PageTimeoutError:
+                texts.append("")
+                logger.warning(f"PDF page {page_number} of {file_path} timed out after {page_timeout}s; skipped")
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        signal.signal(signal.SIGALRM, previous_handler)
+    return texts
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+# Ingestion workers extract from several threads at once
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next `_get_pdf_pool` builds a new one (once, however many threads saw it break)"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 class TextExtractionService:
 
@@ -10,45 +81,71 @@ class TextExtractionService:
         'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ['docx'],
     }
 
-    def extract_text(self, file_path: str, content_type: str) -> str:
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+    def extract_text(self, source: Union[str, BinaryIO], content_type: str, file_name: Optional[str] = None) -> str:
+        """Extract text from a file path or a binary file-like object.
+
+        File-like objects (e.g. an upload's spooled file) are read in place
+        without copying them to disk; `file_name` supplies their extension.
+        """
+        if isinstance(source, str):
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"File not found: {source}")
+            file_name = source
+        else:
+            file_name = file_name or getattr(source, "name", None) or ""
         
-        extension = self._get_extension(file_path)
+        extension = self._get_extension(file_name)
         
         # Plain text files (.txt, .md)
         if content_type == 'text/plain' or extension in ['txt', 'md']:
-            return self._extract_text_file(file_path)
+            return self._extract_text_file(source)
         
         # PDF files
         elif content_type == 'application/pdf' or extension == 'pdf':
-            return self._extract_pdf(file_path)
+            return self._extract_pdf(source)
         
         # Word documents (.docx)
         elif 'wordprocessingml' in content_type or extension == 'docx':
-            return self._extract_docx(file_path)
+            return self._extract_docx(source)
         
         else: 
             raise ValueError(
                 f"Unsupported file format: {content_type} (extension: {extension}). "
                 f"Supported formats: .txt, .md, .pdf, .docx"
             )
-    def _extract_text_file(self, file_path: str) -> str:
+    def _extract_text_file(self, source: Union[str, BinaryIO]) -> str:
         """Extract text from plain text files"""
+        if not isinstance(source, str):
+            data = source.read()
+            try:
+                return data.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                return data.decode('latin-1').strip()
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open(source, 'r', encoding='utf-8') as f:
                 text = f.read()
             return text.strip()
         except UnicodeDecodeError:
             # Try with different encoding
-            with open(file_path, 'r', encoding='latin-1') as f:
+            with open(source, 'r', encoding='latin-1') as f:
                 text = f.read()
             return text.strip()
         
-    def _extract_pdf(self, file_path: str) -> str:
+    def _extract_pdf(self, source: Union[str, BinaryIO]) -> str:
         """Extract text from PDF files using pypdf"""
         try:
-            reader = PdfReader(file_path)
+            reader = PdfReader(source)
+            page_count = len(reader.pages)
+
+            # Worker processes reopen the file, so only paths can be split across them
+            if (
+                isinstance(source, str)
+                and settings.PDF_EXTRACTION_WORKERS > 0
+                and page_count >= settings.PDF_PARALLEL_MIN_PAGES
+            ):
+                return self._extract_pdf_parallel(source, page_count)
+
             text_parts = []
             
             for page in reader.pages:
@@ -60,11 +157,64 @@ class TextExtractionService:
             return full_text.strip()
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
+
+    def _extract_pdf_parallel(self, file_path: str, page_count: int) -> str:
+        """Extract page ranges in the process pool and reassemble them in page order.
+
+        A worker that dies (crash, OOM kill) breaks the whole pool; it is then
+        rebuilt and the document retried once before giving up.
+        """
+        pages_per_task = max(1, settings.PDF_PAGES_PER_TASK)
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+
+        for attempt in range(2):
+            pool = _get_pdf_pool()
+            try:
+                return self._extract_pdf_ranges(pool, file_path, ranges)
+            except BrokenProcessPool as e:
+                _discard_pdf_pool(pool)
+                if attempt:
+                    raise Exception(f"PDF worker pool broke twice while extracting {file_path}: {e}")
+                logger.warning(f"PDF worker pool broke while extracting {file_path}; retrying in a new pool: {e}")
+
+    def _extract_pdf_ranges(self, pool: ProcessPoolExecutor, file_path: str, ranges: List[Tuple[int, int]]) -> str:
+        pages_per_task = max(1, settings.PDF_PAGES_PER_TASK)
+        page_timeout = settings.PDF_PAGE_TIMEOUT_SECS
+        futures = [
+            pool.submit(_extract_pdf_pages, file_path, start, end, page_timeout)
+            for start, end in ranges
+        ]
+
+        # Backstop in case a worker ignores its per-page alarm: the whole
+        # document gets the time its ranges need when run `workers` at a time
+        rounds = -(-len(ranges) // max(1, settings.PDF_EXTRACTION_WORKERS))
+        deadline = time.monotonic() + rounds * pages_per_task * page_timeout + 5
+
+        text_parts = []
+        try:
+            for (start, end), future in zip(ranges, futures):
+                try:
+                    pages = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    future.cancel()
+                    logger.warning(f"PDF pages {start}-{end - 1} of {file_path} timed out; skipped")
+                    continue
+                text_parts.extend(text for text in pages if text)
+        except BrokenProcessPool:
+            for future in futures:
+                future.cancel()
+            raise
+
+        full_text = '\n\n'.join(text_parts)
+        return full_text.strip()
         
-    def _extract_docx(self, file_path: str) -> str:
+    def _extract_docx(self, source: Union[str, BinaryIO]) -> str:
         """Extract text from Word documents (.docx)"""
         try:
-            doc = DocxDocument(file_path)
+            doc = DocxDocument(source)
             text_parts = []
             
             # Extract text from paragraphs
@@ -0,0 +1,59 @@
+"""Storage encodings for chunk embeddings.
+
+EMBEDDING_STORAGE_FORMAT selects how vectors are written:
+- "array":   BSON array of doubles (the original layout)
+- "float32": packed float32 BSON vector (binary subtype 9)
+- "int8":    int8 BSON vector plus a per-vector `embedding_scale`
+
+Readers accept every format, so collections can be migrated in place.
+"""
+from typing import Any, Dict, Mapping, Sequence
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
+
+from app.config import settings
+
+STORAGE_FORMATS = ("array", "float32", "int8")
+
+
+def _pack(values: np.ndarray, dtype: BinaryVectorDtype) -> Binary:
+    # Same layout as Binary.from_vector (dtype byte, padding byte, data) without the Python-list round trip
+    return Binary(dtype.value + b"\x00" + values.tobytes(), VECTOR_SUBTYPE)
+
+
+def encode_embedding(vector: Sequence[float], storage_format: str | None = None) -> Dict[str, Any]:
+    """Fields to store on a document for `vector`"""
+    storage_format = storage_format or settings.EMBEDDING_STORAGE_FORMAT
+    if storage_format == "array":
+        return {"embedding": [float(x) for x in vector]}
+
+    values = np.asarray(vector, dtype=np.float32)
+    if storage_format == "float32":
+        return {"embedding": _pack(values.astype("<f4"), BinaryVectorDtype.FLOAT32)}
+    if storage_format == "int8":
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return {"embedding": _pack(quantized, BinaryVectorDtype.INT8), "embedding_scale": scale}
+    raise ValueError(f"Unknown EMBEDDING_STORAGE_FORMAT: {storage_format}")
+
+
+def decode_embedding(document: Mapping[str, Any]) -> np.ndarray:
+    """float32 vector from a document's `embedding` (+ `embedding_scale`) in any storage format"""
+    value = document["embedding"]
+    if isinstance(value, Binary) and value.subtype == VECTOR_SUBTYPE:
+        dtype = bytes(value[:1])
+        if dtype == BinaryVectorDtype.FLOAT32.value:
+            return np.frombuffer(value, dtype="<f4", offset=2).astype(np.float32)
+        if dtype == BinaryVectorDtype.INT8.value:
+            vector = np.frombuffer(value, dtype=np.int8, offset=2).astype(np.float32)
+            scale = document.get("embedding_scale")
+            return vector * scale if scale else vector
+        raise ValueError(f"Unsupported BSON vector dtype: {dtype.hex()}")
+    return np.asarray(value, dtype=np.float32)
+
+
+def encode_query_vector(vector: Sequence[float]) -> Any:
+    """`queryVector` for `$vectorSearch`, matching the stored vector type"""
+    return encode_embedding(vector)["embedding"]
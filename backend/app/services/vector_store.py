@@ -0,0 +1,324 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from loguru import logger
+
+from app.database import get_database
+from app.config import settings
+from app.services.cache import WeightedLRUCache
+from app.services.vector_codec import decode_embedding, encode_query_vector
+from app.tracing import span
+
+# Fields returned for every search hit, mirroring the Atlas `$project` stage
+RESULT_FIELDS = (
+    "_id",
+    "chunk_id",
+    "document_id",
+    "file_name",
+    "text",
+    "chunk_index",
+    "equipment_id",
+    "tenant_id",
+)
+
+
+class VectorStore(ABC):
+    """Nearest-neighbour search over the `document_chunks` embeddings"""
+
+    @abstractmethod
+    async def search(
+            self,
+            query_vector: List[float],
+            k: int,
+            num_candidates: int,
+            filters: Dict[str, Any] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Return up to k chunk dicts (RESULT_FIELDS plus `score`), best first"""
+
+    async def add_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """Called after chunks are inserted into Mongo; backends that index in-process update here"""
+
+    async def disable_chunks(self, chunk_ids: List[Any]) -> None:
+        """Called after chunks (by `_id`) are disabled in Mongo"""
+
+
+class AtlasVectorStore(VectorStore):
+    """MongoDB Atlas `$vectorSearch` backend"""
+
+    def __init__(self, index_name: str | None = None):
+        self.index_name = index_name or settings.VECTOR_INDEX_NAME
+
+    async def search(
+            self,
+            query_vector: List[float],
+            k: int,
+            num_candidates: int,
+            filters: Dict[str, Any] | None = None,
+    ) -> List[Dict[str, Any]]:
+        db = await get_database()
+        if db is None:
+            raise ConnectionError("Database collection is not available. Connection failed.")
+        collection = db[settings.DOCUMENT_CHUNKS_COLLECTION]
+
+        vector_query = {
+            "$vectorSearch": {
+                "index": self.index_name,
+                "path": "embedding",
+                "queryVector": encode_query_vector(query_vector),
+                "numCandidates": num_candidates,
+                "limit": k,
+            }
+        }
+
+        if filters:
+            vector_query["$vectorSearch"]["filter"] = filters
+            logger.debug(f"Applied filters to vector search: {filters}")
+
+        projection = {field: 1 for field in RESULT_FIELDS}
+        projection["score"] = {"$meta": "vectorSearchScore"}
+        pipeline = [vector_query, {"$project": projection}]
+
+        logger.debug("Executing aggregation pipeline for vector search...")
+        results = aiter(collection.aggregate(pipeline))
+        # The aggregate command runs $vectorSearch and returns the first batch
+        with span("atlas.vector_search", k=k, num_candidates=num_candidates):
+            first = await anext(results, None)
+        if first is None:
+            return []
+        # The rest of the buffered batch, plus getMore round trips past it
+        with span("atlas.cursor_drain", k=k):
+            return [first] + [document async for document in results]
+
+
+class _Partition:
+    """Embeddings of one tenant/equipment slice as a contiguous, L2-normalized float32 matrix"""
+
+    def __init__(self, dimensions: int, capacity: int = 0):
+        self.matrix = np.zeros((max(capacity, 16), dimensions), dtype=np.float32)
+        self.disabled = np.zeros(self.matrix.shape[0], dtype=bool)
+        self.rows: List[Dict[str, Any]] = []
+        self.positions: Dict[Any, List[int]] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def append(self, vectors: np.ndarray, rows: List[Dict[str, Any]]) -> None:
+        needed = self.size + len(rows)
+        if needed > self.matrix.shape[0]:
+            # Grow geometrically so incremental inserts stay amortized O(1)
+            capacity = max(needed, self.matrix.shape[0] * 2)
+            matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            matrix[:self.size] = self.matrix[:self.size]
+            disabled = np.zeros(capacity, dtype=bool)
+            disabled[:self.size] = self.disabled[:self.size]
+            self.matrix, self.disabled = matrix, disabled
+
+        start = self.size
+        self.matrix[start:needed] = vectors
+        self.disabled[start:needed] = [bool(row.get("is_disabled")) for row in rows]
+        for offset, row in enumerate(rows):
+            self.positions.setdefault(row.get("_id"), []).append(start + offset)
+        self.rows.extend(rows)
+
+    def disable(self, chunk_ids: List[Any]) -> None:
+        for chunk_id in chunk_ids:
+            for position in self.positions.pop(chunk_id, []):
+                self.disabled[position] = True
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process exact search backend.
+
+    Chunks are loaded from Mongo the first time a tenant/equipment pair is
+    queried and kept up to date through `add_chunks`. Scores use the same
+    (1 + cosine) / 2 scale as an Atlas cosine index. Past NUMPY_VECTOR_MAX_PARTITIONS
+    or NUMPY_VECTOR_MAX_CHUNKS the least recently searched partitions are evicted.
+    """
+
+    def __init__(self):
+        self._partitions = WeightedLRUCache(
+            maxsize=settings.NUMPY_VECTOR_MAX_PARTITIONS,
+            max_weight=settings.NUMPY_VECTOR_MAX_CHUNKS,
+        )
+        self._locks: Dict[Tuple[Optional[str], Optional[str]], asyncio.Lock] = {}
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _row(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in chunk.items() if key not in ("embedding", "embedding_scale")}
+
+    def _to_partition_rows(self, chunks: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        vectors = np.stack([decode_embedding(chunk) for chunk in chunks])
+        return self._normalize(vectors), [self._row(chunk) for chunk in chunks]
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._partitions.stats()
+
+    async def _load_partition(self, key: Tuple[Optional[str], Optional[str]]) -> _Partition | None:
+        partition = self._partitions.get(key)
+        if partition is not None:
+            return partition
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            partition = self._partitions.peek(key)
+            if partition is not None:
+                return partition
+
+            tenant_id, equipment_id = key
+            query: Dict[str, Any] = {}
+            if tenant_id:
+                query["tenant_id"] = tenant_id
+            if equipment_id:
+                query["equipment_id"] = ObjectId(equipment_id)
+
+            db = await get_database()
+            if db is None:
+                raise ConnectionError("Database collection is not available. Connection failed.")
+            chunks = await db[settings.DOCUMENT_CHUNKS_COLLECTION].find(query).to_list(length=None)
+            chunks = [chunk for chunk in chunks if chunk.get("embedding")]
+            if not chunks:
+                return None
+
+            vectors, rows = self._to_partition_rows(chunks)
+            partition = _Partition(vectors.shape[1], capacity=len(rows))
+            partition.append(vectors, rows)
+            self._partitions.set(key, partition, partition.size)
+            logger.info(
+                "Loaded in-process vector partition",
+                tenant_id=tenant_id,
+                equipment_id=equipment_id,
+                chunks=partition.size,
+            )
+            return partition
+
+    @staticmethod
+    def _matches(value: Any, condition: Any) -> bool:
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    if value == operand:
+                        return False
+                elif operator == "$eq":
+                    if value != operand:
+                        return False
+                elif operator == "$in":
+                    if value not in operand:
+                        return False
+                elif operator == "$nin":
+                    if value in operand:
+                        return False
+                else:
+                    raise ValueError(f"Unsupported filter operator for numpy vector store: {operator}")
+            return True
+        return value == condition
+
+    def _filter_mask(self, partition: _Partition, filters: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(partition.size, dtype=bool)
+        for field, condition in filters.items():
+            if field in ("tenant_id", "equipment_id"):
+                # Already applied by partition selection
+                continue
+            if field == "is_disabled":
+                disabled = partition.disabled[:partition.size]
+                mask &= np.where(
+                    disabled,
+                    self._matches(True, condition),
+                    self._matches(False, condition),
+                )
+                continue
+            mask &= np.fromiter(
+                (self._matches(row.get(field), condition) for row in partition.rows),
+                dtype=bool,
+                count=partition.size,
+            )
+        return mask
+
+    async def search(
+            self,
+            query_vector: List[float],
+            k: int,
+            num_candidates: int,
+            filters: Dict[str, Any] | None = None,
+    ) -> List[Dict[str, Any]]:
+        filters = filters or {}
+        equipment_id = filters.get("equipment_id")
+        key = (filters.get("tenant_id"), str(equipment_id) if equipment_id else None)
+
+        partition = await self._load_partition(key)
+        if partition is None or k <= 0:
+            return []
+
+        with span("numpy.score", rows=partition.size):
+            query = self._normalize(np.asarray([query_vector], dtype=np.float32))[0]
+            scores = partition.matrix[:partition.size] @ query
+            mask = self._filter_mask(partition, filters)
+            scores = np.where(mask, scores, -np.inf)
+
+            eligible = int(mask.sum())
+            if eligible == 0:
+                return []
+
+            top = min(k, eligible)
+            if top < partition.size:
+                candidates = np.argpartition(-scores, top - 1)[:top]
+            else:
+                candidates = np.arange(partition.size)
+            ordered = candidates[np.argsort(-scores[candidates])][:top]
+
+        with span("numpy.materialize"):
+            results = []
+            for index in ordered:
+                row = partition.rows[index]
+                result = {field: row.get(field) for field in RESULT_FIELDS}
+                result["score"] = float((1.0 + scores[index]) / 2.0)
+                results.append(result)
+        return results
+
+    async def add_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        chunks = [chunk for chunk in chunks if chunk.get("embedding")]
+        if not chunks or not self._partitions:
+            return
+
+        for key, partition in self._partitions.items():
+            tenant_id, equipment_id = key
+            matching = [
+                chunk for chunk in chunks
+                if (tenant_id is None or chunk.get("tenant_id") == tenant_id)
+                and (equipment_id is None or str(chunk.get("equipment_id")) == equipment_id)
+            ]
+            if matching:
+                vectors, rows = self._to_partition_rows(matching)
+                partition.append(vectors, rows)
+                self._partitions.reweigh(key, partition.size)
+
+    async def disable_chunks(self, chunk_ids: List[Any]) -> None:
+        for partition in self._partitions.values():
+            partition.disable(chunk_ids)
+
+
+_vector_stores: Dict[Tuple[str, str], VectorStore] = {}
+
+
+def get_vector_store(index_name: str | None = None) -> VectorStore:
+    """Return the process-wide store for VECTOR_STORE_BACKEND ("atlas" or "numpy")"""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    index_name = index_name or settings.VECTOR_INDEX_NAME
+    key = (backend, index_name)
+    if key not in _vector_stores:
+        if backend == "atlas":
+            _vector_stores[key] = AtlasVectorStore(index_name)
+        elif backend == "numpy":
+            _vector_stores[key] = NumpyVectorStore()
+        else:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}")
+    return _vector_stores[key]
@@ -0,0 +1,172 @@
+import asyncio
+import copy
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+from loguru import logger
+from pipecat.audio.turn.smart_turn.base_smart_turn import BaseSmartTurn
+from pipecat.audio.turn.smart_turn.local_smart_turn_v3 import LocalSmartTurnAnalyzerV3
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+from app.config import settings
+from app.services.inference_batcher import InferenceBatcher
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero VAD over an already loaded ONNX session.
+
+    Only the recurrent state (`_state`, `_context`) is per session; the
+    inference session is shared, and onnxruntime allows concurrent `run` calls.
+    """
+
+    def __init__(
+            self,
+            model: SileroOnnxModel,
+            *,
+            batcher: InferenceBatcher | None = None,
+            sample_rate: Optional[int] = None,
+            params: Optional[VADParams] = None,
+    ):
+        VADAnalyzer.__init__(self, sample_rate=sample_rate, params=params)
+        self._model = copy.copy(model)
+        self._model.reset_states()
+        if batcher is not None:
+            self._model.session = batcher.session_proxy()
+        self._last_reset_time = 0
+
+
+class SharedSmartTurnAnalyzer(LocalSmartTurnAnalyzerV3):
+    """Smart-turn v3 over an already loaded ONNX session and feature extractor.
+
+    Audio buffers and speech/silence tracking stay per session (BaseSmartTurn).
+    """
+
+    def __init__(self, template: LocalSmartTurnAnalyzerV3, batcher: InferenceBatcher | None = None, **kwargs):
+        BaseSmartTurn.__init__(self, **kwargs)
+        self._feature_extractor = template._feature_extractor
+        self._session = batcher.session_proxy() if batcher is not None else template._session
+
+
+class VoiceModels:
+    """VAD and smart-turn models, loaded once per process and shared by every voice session"""
+
+    def __init__(self):
+        self._vad: SileroVADAnalyzer | None = None
+        self._turn: LocalSmartTurnAnalyzerV3 | None = None
+        self._warmup: asyncio.Task | None = None
+        self.load_secs: float | None = None
+        self.attempts = 0
+        self.error: str | None = None
+        self.vad_batcher: InferenceBatcher | None = None
+        self.turn_batcher: InferenceBatcher | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._vad is not None and self._turn is not None
+
+    @property
+    def failed(self) -> bool:
+        """Every load attempt failed; `error` says why"""
+        return self._warmup is not None and self._warmup.done() and not self.ready
+
+    def load(self) -> None:
+        """Load the ONNX sessions and run one inference each so the first call is not slow (blocking)"""
+        if self.ready:
+            return
+        started = time.perf_counter()
+        vad = SileroVADAnalyzer(sample_rate=16000)
+        vad._model(np.zeros(512, dtype=np.float32), 16000)
+        vad._model.reset_states()
+
+        turn = LocalSmartTurnAnalyzerV3()
+        turn._predict_endpoint(np.zeros(16000, dtype=np.float32))
+
+        if settings.VOICE_INFERENCE_BATCHING:
+            # Silero: audio (B, samples) and recurrent state (2, B, 128); sample rate shared
+            self.vad_batcher = InferenceBatcher(
+                vad._model.session,
+                input_axes={"input": 0, "state": 1, "sr": None},
+                output_axes=[0, 1],
+                max_batch=settings.VOICE_INFERENCE_MAX_BATCH,
+                max_wait_ms=settings.VOICE_INFERENCE_MAX_WAIT_MS,
+                name="silero-vad",
+            )
+            self.turn_batcher = InferenceBatcher(
+                turn._session,
+                input_axes={"input_features": 0},
+                output_axes=[0],
+                max_batch=settings.VOICE_INFERENCE_MAX_BATCH,
+                max_wait_ms=settings.VOICE_INFERENCE_MAX_WAIT_MS,
+                name="smart-turn",
+            )
+
+        self._vad, self._turn = vad, turn
+        self.load_secs = time.perf_counter() - started
+        logger.info(f"Voice models loaded in {self.load_secs:.1f}s")
+
+    def start(self) -> asyncio.Task:
+        """Warm up in a worker thread without blocking startup; see `ready`, `failed` and `wait_ready`"""
+        if self._warmup is None:
+            self._warmup = asyncio.create_task(self._load_with_retries(), name="voice-models-warmup")
+            # The failure is reported by `failed` / `error`; don't also log it as an unretrieved exception
+            self._warmup.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._warmup
+
+    async def _load_with_retries(self) -> None:
+        attempts = max(1, settings.VOICE_MODELS_LOAD_ATTEMPTS)
+        for attempt in range(1, attempts + 1):
+            self.attempts = attempt
+            try:
+                await asyncio.to_thread(self.load)
+                self.error = None
+                return
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                if attempt == attempts:
+                    logger.opt(exception=e).error(f"Voice models failed to load after {attempts} attempts: {self.error}")
+                    raise
+                delay = settings.VOICE_MODELS_RETRY_BACKOFF_SECS * 2 ** (attempt - 1)
+                logger.warning(f"Voice models failed to load (attempt {attempt}/{attempts}), retrying in {delay:.1f}s: {self.error}")
+                await asyncio.sleep(delay)
+
+    async def wait_ready(self) -> None:
+        """Wait for the warm-up; raises RuntimeError if it failed"""
+        if self.ready:
+            return
+        try:
+            await asyncio.shield(self.start())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Voice models are not available: {self.error}") from e
+
+    def vad_analyzer(self, params: Optional[VADParams] = None) -> SileroVADAnalyzer:
+        if self._vad is None:
+            raise RuntimeError("Voice models are not loaded")
+        return SharedSileroVADAnalyzer(self._vad._model, batcher=self.vad_batcher, params=params)
+
+    def turn_analyzer(self, **kwargs) -> LocalSmartTurnAnalyzerV3:
+        if self._turn is None:
+            raise RuntimeError("Voice models are not loaded")
+        return SharedSmartTurnAnalyzer(self._turn, batcher=self.turn_batcher, **kwargs)
+
+    def close(self) -> None:
+        for batcher in (self.vad_batcher, self.turn_batcher):
+            if batcher is not None:
+                batcher.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": "ready" if self.ready else "failed" if self.failed else "loading",
+            "attempts": self.attempts,
+            "error": self.error,
+            "load_secs": round(self.load_secs, 2) if self.load_secs is not None else None,
+            "batching": {
+                batcher.name: batcher.stats
+                for batcher in (self.vad_batcher, self.turn_batcher)
+                if batcher is not None
+            },
+        }
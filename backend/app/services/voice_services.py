@@ -0,0 +1,38 @@
+import os
+
+from deepgram import LiveOptions
+from pipecat.services.cartesia.tts import CartesiaTTSService
+from pipecat.services.deepgram.stt import DeepgramSTTService
+from pipecat.services.groq.llm import GroqLLMService
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+
+from app.config import settings
+
+
+class VoiceServiceFactory:
+    """Builds the STT, LLM and TTS services for each voice session (Deepgram, Groq, Cartesia).
+
+    The registry holds one factory; the voice load test swaps in one that
+    returns in-process stubs (benchmarks/voice_stubs.py).
+    """
+
+    def stt(self) -> STTService:
+        return DeepgramSTTService(
+            api_key=os.getenv("DEEPGRAM_API_KEY"),
+            live_options=LiveOptions(diarize=True),
+        )
+
+    def llm(self) -> LLMService:
+        return GroqLLMService(
+            api_key=os.getenv("GROQ_API_KEY"),
+            model=settings.GROQ_MODEL,
+            base_url=settings.GROQ_BASE_URL,
+        )
+
+    def tts(self) -> TTSService:
+        return CartesiaTTSService(
+            api_key=os.getenv("CARTESIA_API_KEY"),
+            voice_id="71a7ad14-091c-4e8e-a314-022ece01c121",  # British Reading Lady
+        )
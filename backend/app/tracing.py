@@ -0,0 +1,95 @@
+"""Named timing spans for hot paths.
+
+    with span("rag.embed_query"):
+        ...
+
+Every span's duration goes to the `span_duration_seconds{span=...}`
+histogram on /metrics. Spans slower than TRACING_SLOW_SPAN_MS are also
+logged. With TRACING_OTEL_ENABLED, spans are mirrored to OpenTelemetry
+when the `opentelemetry-api` package is installed; exporters are set up
+by the deployment, e.g. with `opentelemetry-instrument`.
+
+When TRACING_ENABLED is off, `span()` returns a shared no-op object, so
+the only cost left is the settings lookup.
+"""
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import SPAN_SECONDS
+
+_tracer: Any = None
+_otel_checked = False
+
+
+def _otel_tracer() -> Any:
+    global _tracer, _otel_checked
+    if not _otel_checked:
+        _otel_checked = True
+        try:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("rag-voice-ai")
+        except ImportError:
+            logger.warning("TRACING_OTEL_ENABLED is set but opentelemetry-api is not installed; spans stay local")
+    return _tracer
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attributes", "duration", "_started", "_otel_cm", "_otel_span")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.duration: Optional[float] = None
+        self._otel_cm = None
+        self._otel_span = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is None:
+            return
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def __enter__(self) -> "Span":
+        if settings.TRACING_OTEL_ENABLED and _otel_tracer() is not None:
+            self._otel_cm = _tracer.start_as_current_span(self.name, attributes=self.attributes or None)
+            self._otel_span = self._otel_cm.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.duration = time.perf_counter() - self._started
+        SPAN_SECONDS.labels(span=self.name).observe(self.duration)
+        if self._otel_cm is not None:
+            self._otel_cm.__exit__(exc_type, exc, tb)
+        if self.duration * 1000 >= settings.TRACING_SLOW_SPAN_MS:
+            logger.bind(**self.attributes).warning(f"Slow span {self.name}: {self.duration * 1000:.0f}ms")
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """Time a block as span `name`; attributes go to slow-span logs and OpenTelemetry.
+
+    None values are dropped: OpenTelemetry rejects them as attribute values.
+    """
+    if not settings.TRACING_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, {key: value for key, value in attributes.items() if value is not None})
@@ -0,0 +1,5 @@
+import os
+
+# Benchmarks run offline; the settings module still requires these to be set
+for _name in ("MONGO_URL", "DEEPGRAM_API_KEY", "GROQ_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(_name, "offline-benchmark")
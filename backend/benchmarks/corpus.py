@@ -0,0 +1,93 @@
+"""Deterministic synthetic manuals for the offline benchmarks"""
+import random
+from typing import List
+
+_WORDS = (
+    "pump valve torque spec bearing seal housing impeller motor shaft coupling "
+    "pressure flow rate inspect replace tighten calibrate reset procedure alarm "
+    "fault sensor voltage current breaker panel filter lubricate gasket bolt "
+    "clockwise counterclockwise maintenance interval warning caution operator"
+).split()
+
+
+def make_paragraphs(count: int, words_per_paragraph: int = 80, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        words = [rng.choice(_WORDS) for _ in range(words_per_paragraph)]
+        # Sprinkle in identifiers like the ones technicians ask about
+        words.insert(rng.randrange(len(words)), f"PN-{rng.randrange(10000, 99999)}")
+        words.insert(rng.randrange(len(words)), f"E{rng.randrange(100, 999)}")
+        paragraphs.append(" ".join(words).capitalize() + ".")
+    return paragraphs
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def write_pdf(path: str, pages: List[str]) -> None:
+    """Write a minimal text PDF (Helvetica, one content stream per page)"""
+    objects: List[bytes] = []
+    page_ids = [3 + 2 * i for i in range(len(pages))]
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + 2 * len(pages)
+
+    for i, page_text in enumerate(pages):
+        content_id = page_ids[i] + 1
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 750 Td"]
+        for line in _wrap(page_text):
+            commands.append(f"({_pdf_escape(line)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: List[str]) -> None:
+    from docx import Document as DocxDocument
+
+    document = DocxDocument()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_txt(path: str, paragraphs: List[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
@@ -0,0 +1,55 @@
+"""BSON size and decode throughput of each embedding storage format.
+
+    python -m benchmarks.embedding_storage --chunks 5000 --dimensions 768
+"""
+import argparse
+import json
+import time
+
+import bson
+import numpy as np
+
+from app.services.vector_codec import STORAGE_FORMATS, decode_embedding, encode_embedding
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.normal(size=(args.chunks, args.dimensions)).astype(np.float64)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    text = "x" * 1000  # a CHUNK_SIZE-sized chunk body, to show the share of the document the vector takes
+
+    report = {"benchmark": "embedding_storage", "chunks": args.chunks, "dimensions": args.dimensions, "formats": {}}
+    for storage_format in STORAGE_FORMATS:
+        encoded = [
+            bson.encode({"text": text, **encode_embedding(vector, storage_format)})
+            for vector in vectors
+        ]
+        total_bytes = sum(len(doc) for doc in encoded)
+
+        started = time.perf_counter()
+        decoded = np.stack([decode_embedding(bson.decode(doc)) for doc in encoded])
+        elapsed = time.perf_counter() - started
+
+        decoded_unit = decoded / np.linalg.norm(decoded, axis=1, keepdims=True)
+        report["formats"][storage_format] = {
+            "bytes_per_chunk": round(total_bytes / args.chunks, 1),
+            "decode_chunks_per_sec": round(args.chunks / elapsed),
+            "max_cosine_error": float(np.max(1.0 - np.sum(unit * decoded_unit, axis=1))),
+        }
+
+    baseline = report["formats"]["array"]
+    for stats in report["formats"].values():
+        stats["size_vs_array"] = round(stats["bytes_per_chunk"] / baseline["bytes_per_chunk"], 3)
+        stats["decode_speedup_vs_array"] = round(stats["decode_chunks_per_sec"] / baseline["decode_chunks_per_sec"], 2)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
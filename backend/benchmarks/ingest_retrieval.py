@@ -0,0 +1,328 @@
+"""Offline ingestion throughput and retrieval latency, using the local stand-ins.
+
+    python -m benchmarks.ingest_retrieval --docs 20 --corpus-sizes 1000 10000 --output bench.json
+
+Nothing leaves the machine: embeddings come from `FakeEmbeddings` (a fixed
+latency per API call, `--embed-latency-ms`) and Mongo / `$vectorSearch` from
+`MemoryDatabase` (`--db-latency-ms` per round trip).
+
+Ingestion: for each format, `--docs` generated files go through
+POST /api/v1/equipment/{id}/documents (the `upload_equipment_documents` route)
+and the background workers until every document is completed. Each format
+runs in its own interpreter so peak RSS is per format; PDF worker processes
+are not counted.
+
+Retrieval: `RAGService.retrieve` over corpora of `--corpus-sizes` chunks for
+each vector store backend, with the query embedding cache off.
+
+Both phases report event-loop lag: how late a 5 ms timer fires while the work
+runs, i.e. how long voice WebSockets sharing the loop would be stalled.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+from bson import ObjectId
+from loguru import logger
+
+from benchmarks.corpus import make_paragraphs, write_docx, write_pdf, write_txt
+from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install, populate_chunks
+from app.config import settings
+from app.metrics import SPAN_SECONDS
+from app.services.embeddings import EmbeddingService
+from app.services.rag import RAGService
+from app.services.vector_store import AtlasVectorStore, NumpyVectorStore
+
+FORMATS = {
+    "pdf": ("application/pdf", write_pdf),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", write_docx),
+    "txt": ("text/plain", write_txt),
+}
+BACKENDS = {"atlas": AtlasVectorStore, "numpy": NumpyVectorStore}
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer runs on the current event loop"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - due))
+
+    def __enter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._task.cancel()
+
+    def summary(self) -> Dict[str, float]:
+        return _percentiles(self.samples)
+
+
+def _span_totals() -> Dict[str, List[float]]:
+    totals: Dict[str, List[float]] = {}
+    for metric in SPAN_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith(("_count", "_sum")):
+                entry = totals.setdefault(sample.labels["span"], [0.0, 0.0])
+                entry[0 if sample.name.endswith("_count") else 1] = sample.value
+    return totals
+
+
+def _span_delta(before: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Mean time per traced stage since `before` (see app/tracing.py)"""
+    report = {}
+    for name, (count, total) in sorted(_span_totals().items()):
+        count -= before.get(name, [0.0, 0.0])[0]
+        total -= before.get(name, [0.0, 0.0])[1]
+        if count:
+            report[name] = {"count": int(count), "mean_ms": round(total / count * 1000, 3)}
+    return report
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _fake_embeddings(args: argparse.Namespace) -> FakeEmbeddings:
+    return FakeEmbeddings(dimensions=args.dimensions, latency_ms=args.embed_latency_ms)
+
+
+def _write_corpus(directory: str, file_format: str, docs: int, paragraphs: int) -> List[str]:
+    _, writer = FORMATS[file_format]
+    paths = []
+    for index in range(docs):
+        # A distinct seed per file so no upload is deduplicated against another
+        text = make_paragraphs(paragraphs, seed=index + 1)
+        path = os.path.join(directory, f"manual-{index:04d}.{file_format}")
+        if file_format == "pdf":
+            writer(path, [" ".join(text[i:i + 4]) for i in range(0, len(text), 4)])
+        else:
+            writer(path, text)
+        paths.append(path)
+    return paths
+
+
+async def _ingest(file_format: str, args: argparse.Namespace) -> Dict[str, Any]:
+    import main
+    from app.services.registry import ServiceRegistry
+    from app.services.text_extraction import shutdown_pdf_pool
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings.UPLOAD_DIR = os.path.join(directory, "uploads")
+        corpus = os.path.join(directory, "corpus")
+        os.makedirs(corpus)
+        paths = _write_corpus(corpus, file_format, args.docs, args.paragraphs)
+        corpus_bytes = sum(os.path.getsize(path) for path in paths)
+
+        database = MemoryDatabase(latency_ms=args.db_latency_ms)
+        install(database)
+        equipment_id = (await database.equipment.insert_one(
+            {"name": "Benchmark pump", "description": "offline benchmark", "tenant_id": settings.TENANT_ID}
+        )).inserted_id
+
+        services = ServiceRegistry()
+        embeddings = _fake_embeddings(args)
+        services.embedding_service.embeddings = embeddings
+        main.app.state.services = services
+        await services.ingestion_service.start()
+
+        content_type, _ = FORMATS[file_format]
+        documents = database.documents_metadata.documents
+        spans = _span_totals()
+        rss_before = _peak_rss_mb()
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                with LoopLagMonitor() as lag:
+                    started = time.perf_counter()
+                    for offset in range(0, len(paths), args.files_per_request):
+                        files = []
+                        for path in paths[offset:offset + args.files_per_request]:
+                            with open(path, "rb") as f:
+                                files.append(("files", (os.path.basename(path), f.read(), content_type)))
+                        response = await client.post(f"/api/v1/equipment/{equipment_id}/documents", files=files)
+                        response.raise_for_status()
+                    upload_secs = time.perf_counter() - started
+
+                    while sum(doc["embedding_status"] in ("completed", "failed") for doc in documents.values()) < len(paths):
+                        await asyncio.sleep(0.01)
+                    elapsed = time.perf_counter() - started
+        finally:
+            await services.close()
+            shutdown_pdf_pool()
+
+        chunks = len(database[settings.DOCUMENT_CHUNKS_COLLECTION].documents)
+        failed = sum(doc["embedding_status"] == "failed" for doc in documents.values())
+        return {
+            "format": file_format,
+            "docs": len(paths),
+            "corpus_mb": round(corpus_bytes / 1024 / 1024, 2),
+            "chunks": chunks,
+            "failed_docs": failed,
+            "upload_secs": round(upload_secs, 3),
+            "total_secs": round(elapsed, 3),
+            "docs_per_sec": round(len(paths) / elapsed, 2),
+            "chunks_per_sec": round(chunks / elapsed, 1),
+            "embedding_calls": embeddings.calls,
+            "db_round_trips": database.round_trips,
+            "rss_before_mb": round(rss_before, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "loop_lag": lag.summary(),
+            "spans": _span_delta(spans),
+        }
+
+
+async def _retrieve(backend: str, size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    database = MemoryDatabase(latency_ms=args.db_latency_ms)
+    install(database)
+    embeddings = _fake_embeddings(args)
+    equipment_id = ObjectId()
+    await populate_chunks(database, embeddings, size, equipment_id)
+
+    embedding_service = EmbeddingService()
+    embedding_service.embeddings = embeddings
+    rag_service = RAGService(vector_store=BACKENDS[backend](), embedding_service=embedding_service)
+    queries = [" ".join(p.split()[:8]) for p in make_paragraphs(args.queries + args.warmup, seed=10_000 + size)]
+
+    async def timed(query: str) -> float:
+        started = time.perf_counter()
+        await rag_service.retrieve(query, k=args.k, equipment_id=str(equipment_id), tenant_id=settings.TENANT_ID)
+        return time.perf_counter() - started
+
+    for query in queries[:args.warmup]:
+        await timed(query)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(query: str) -> float:
+        async with semaphore:
+            return await timed(query)
+
+    spans = _span_totals()
+    with LoopLagMonitor() as lag:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(bounded(query) for query in queries[args.warmup:]))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "corpus_chunks": size,
+        "queries": len(latencies),
+        "concurrency": args.concurrency,
+        "queries_per_sec": round(len(latencies) / elapsed, 1),
+        "latency": _percentiles(latencies),
+        "loop_lag": lag.summary(),
+        "spans": _span_delta(spans),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument("--docs", type=int, default=20, help="Files per format")
+    parser.add_argument("--paragraphs", type=int, default=40, help="~80-word paragraphs per file")
+    parser.add_argument("--files-per-request", type=int, default=5)
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--skip-retrieval", action="store_true")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--ingest-format", choices=list(FORMATS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.ingest_format:
+        print(json.dumps(asyncio.run(_ingest(args.ingest_format, args))))
+        return
+
+    report: Dict[str, Any] = {
+        "benchmark": "ingest_retrieval",
+        "commit": _git_commit(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "ingest_format", "skip_ingestion", "skip_retrieval")
+        },
+        "ingestion": {},
+        "retrieval": {},
+    }
+
+    if not args.skip_ingestion:
+        passthrough = [
+            f"--{name.replace('_', '-')}={getattr(args, name)}"
+            for name in ("docs", "paragraphs", "files_per_request", "dimensions", "embed_latency_ms", "db_latency_ms")
+        ]
+        for file_format in args.formats:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.ingest_retrieval", *passthrough, "--ingest-format", file_format],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            ).stdout
+            report["ingestion"][file_format] = json.loads(output.strip().splitlines()[-1])
+
+    if not args.skip_retrieval:
+        settings.QUERY_EMBEDDING_CACHE_ENABLED = False
+        for backend in args.backends:
+            report["retrieval"][backend] = [
+                asyncio.run(_retrieve(backend, size, args)) for size in args.corpus_sizes
+            ]
+
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Serial vs process-pool PDF extraction throughput.
+
+    python -m benchmarks.pdf_extraction --pages 200 --workers 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.corpus import make_paragraphs, write_pdf
+from app.config import settings
+from app.services.text_extraction import TextExtractionService, shutdown_pdf_pool
+
+
+def _run(extractor: TextExtractionService, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extractor.extract_text(path, "application/pdf")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="Existing PDF to benchmark (default: generate one)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--paragraphs-per-page", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--pages-per-task", type=int, default=settings.PDF_PAGES_PER_TASK)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp, "manual.pdf")
+            paragraphs = make_paragraphs(args.pages * args.paragraphs_per_page)
+            per_page = args.paragraphs_per_page
+            write_pdf(path, [" ".join(paragraphs[i:i + per_page]) for i in range(0, len(paragraphs), per_page)])
+
+        from pypdf import PdfReader
+        pages = len(PdfReader(path).pages)
+        extractor = TextExtractionService()
+
+        settings.PDF_EXTRACTION_WORKERS = 0
+        serial = _run(extractor, path, args.repeat)
+
+        settings.PDF_EXTRACTION_WORKERS = args.workers
+        settings.PDF_PAGES_PER_TASK = args.pages_per_task
+        settings.PDF_PARALLEL_MIN_PAGES = 1
+        extractor.extract_text(path, "application/pdf")  # spawn the pool outside the timing
+        parallel = _run(extractor, path, args.repeat)
+        shutdown_pdf_pool()
+
+    print(json.dumps({
+        "benchmark": "pdf_extraction",
+        "pages": pages,
+        "workers": args.workers,
+        "pages_per_task": args.pages_per_task,
+        "serial_pages_per_sec": round(pages / serial, 1),
+        "parallel_pages_per_sec": round(pages / parallel, 1),
+        "speedup": round(serial / parallel, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
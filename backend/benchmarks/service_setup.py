@@ -0,0 +1,138 @@
+"""Per-call overhead of building services on the hot path vs sharing them from the registry.
+
+    python -m benchmarks.service_setup --calls 200
+
+"construct" times building RAGService / EmbeddingService / TextExtractionService
+per call (what the bot tool and upload router used to do) against reading them
+from one ServiceRegistry. "http" times an embedding-sized POST to a local server
+with a new client per call against one pooled keep-alive client, and counts the
+TCP connections each opened. The local server has no TLS, so real savings
+against the embedding API are larger than the numbers here.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from app.config import settings
+from app.services.embeddings import EmbeddingService
+from app.services.rag import RAGService
+from app.services.registry import ServiceRegistry
+from app.services.text_extraction import TextExtractionService
+
+_RESPONSE_BODY = json.dumps({"embeddings": [{"values": [0.0] * 768}]}).encode()
+
+
+async def _serve(connections: list) -> asyncio.AbstractServer:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connections[0] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(_RESPONSE_BODY)}\r\n\r\n".encode()
+                    + _RESPONSE_BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def _summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+async def _bench_construct(calls: int) -> dict:
+    registry = ServiceRegistry()
+    per_call, shared = [], []
+    try:
+        for _ in range(calls):
+            started = time.perf_counter()
+            RAGService(embedding_service=EmbeddingService())
+            TextExtractionService()
+            per_call.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            _ = registry.rag_service, registry.embedding_service, registry.text_extractor
+            shared.append(time.perf_counter() - started)
+    finally:
+        await registry.http_client.aclose()
+    return {"per_call": _summary(per_call), "registry": _summary(shared)}
+
+
+async def _bench_http(calls: int) -> dict:
+    connections = [0]
+    server = await _serve(connections)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/v1beta/{settings.EMBEDDING_MODEL}:batchEmbedContents"
+    payload = {"requests": [{"content": {"parts": [{"text": "x" * settings.CHUNK_SIZE}]}}]}
+
+    report = {}
+    try:
+        samples = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            async with httpx.AsyncClient() as client:
+                (await client.post(url, json=payload)).json()
+            samples.append(time.perf_counter() - started)
+        report["per_call"] = {**_summary(samples), "connections": connections[0]}
+
+        connections[0] = 0
+        samples = []
+        async with httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=settings.EMBEDDING_HTTP_KEEPALIVE_SECS,
+            )
+        ) as client:
+            for _ in range(calls):
+                started = time.perf_counter()
+                (await client.post(url, json=payload)).json()
+                samples.append(time.perf_counter() - started)
+        report["registry"] = {**_summary(samples), "connections": connections[0]}
+    finally:
+        server.close()
+        await server.wait_closed()
+    return report
+
+
+async def _main(calls: int) -> None:
+    report = {
+        "benchmark": "service_setup",
+        "calls": calls,
+        "construct": await _bench_construct(calls),
+        "http": await _bench_http(calls),
+    }
+    for section in ("construct", "http"):
+        before, after = report[section]["per_call"]["mean_ms"], report[section]["registry"]["mean_ms"]
+        report[section]["saved_ms_per_call"] = round(before - after, 3)
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_main(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""Local stand-ins for the embedding API and MongoDB, so benchmarks run offline.
+
+`FakeEmbeddings` replaces GoogleGenerativeAIEmbeddings on an EmbeddingService.
+Vectors are hashed bags of words: deterministic, and texts sharing words land
+close together, so retrieval ranks like a real model would on the synthetic
+corpus. `MemoryDatabase` implements the subset of the motor API the app uses,
+including a brute-force `$vectorSearch` aggregate stage.
+"""
+import asyncio
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from benchmarks.corpus import make_paragraphs
+from app.config import settings
+from app.services.vector_codec import decode_embedding, encode_embedding
+
+_TOKEN = re.compile(r"[a-z0-9-]+")
+
+
+class FakeEmbeddings:
+    """Drop-in for the LangChain embeddings client with a fixed per-call latency"""
+
+    def __init__(self, dimensions: int = 768, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.texts = 0
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")))
+            vector = rng.standard_normal(self.dimensions).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            vector += self._token_vector(token)
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        # Computed off the loop: the real client only waits on the network here
+        return await asyncio.to_thread(lambda: [self._embed(text) for text in texts])
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def _matches(document: Mapping[str, Any], query: Mapping[str, Any]) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+            continue
+        value = document.get(field)
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator == "$exists" and (field in document) != bool(operand):
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > operand:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+                    if operator == "$lte" and not value <= operand:
+                        return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document: Dict[str, Any], projection: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return dict(document)
+    included = [field for field, flag in projection.items() if flag and not isinstance(flag, dict)]
+    if included:
+        result = {field: document[field] for field in included if field in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+
+def _group(documents: List[Dict[str, Any]], spec: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """`$group` on `$field` references (or a dict of them) with `{"$sum": 1}` counters"""
+    def resolve(expression: Any) -> Any:
+        if isinstance(expression, dict):
+            return {name: resolve(value) for name, value in expression.items()}
+        if isinstance(expression, str) and expression.startswith("$"):
+            return document.get(expression[1:])
+        return expression
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for document in documents:
+        key = resolve(spec["_id"])
+        group = groups.setdefault(repr(key), {"_id": key, **{field: 0 for field in spec if field != "_id"}})
+        for field, accumulator in spec.items():
+            if field != "_id":
+                group[field] += accumulator["$sum"]
+    return list(groups.values())
+
+
+def _apply_update(document: Dict[str, Any], update: Mapping[str, Any], inserting: bool) -> None:
+    document.update(update.get("$set", {}))
+    for field in update.get("$unset", {}):
+        document.pop(field, None)
+    if inserting:
+        document.update(update.get("$setOnInsert", {}))
+    for field, amount in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + amount
+
+
+class _Result:
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+
+class MemoryCursor:
+    def __init__(self, documents: List[Dict[str, Any]], collection: "MemoryCollection"):
+        self._documents = documents
+        self._collection = collection
+        self._skip = 0
+        self._limit: Optional[int] = None
+
+    def sort(self, key: Any, direction: int = 1) -> "MemoryCursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._documents.sort(key=lambda doc: (doc.get(field) is not None, doc.get(field)), reverse=order < 0)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count or None
+        return self
+
+    def _window(self) -> List[Dict[str, Any]]:
+        end = None if self._limit is None else self._skip + self._limit
+        return self._documents[self._skip:end]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await self._collection.database.round_trip()
+        documents = self._window()
+        return documents[:length] if length else documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection.database.round_trip()
+        for document in self._window():
+            yield document
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+        self._version = 0
+        self._vector_cache: Dict[str, Any] = {}
+        self._mask_cache: Dict[str, np.ndarray] = {}
+        self._mask_version = 0
+
+    def _changed(self) -> None:
+        self._version += 1
+
+    def _find(self, query: Optional[Mapping[str, Any]]) -> Iterable[Dict[str, Any]]:
+        query = query or {}
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document = self.documents.get(query["_id"])
+            return [document] if document is not None and _matches(document, query) else []
+        return (document for document in self.documents.values() if _matches(document, query))
+
+    async def insert_one(self, document: Dict[str, Any]) -> _Result:
+        await self.database.round_trip()
+        document.setdefault("_id", ObjectId())
+        self.documents[document["_id"]] = dict(document)
+        self._changed()
+        return _Result(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> _Result:
+        await self.database.round_trip()
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            self.documents[document["_id"]] = dict(document)
+        self._changed()
+        return _Result(inserted_ids=[document["_id"] for document in documents])
+
+    async def find_one(self, query: Optional[Mapping[str, Any]] = None, projection: Optional[Mapping[str, Any]] = None):
+        await self.database.round_trip()
+        for document in self._find(query):
+            return _project(document, projection)
+        return None
+
+    def find(self, query: Optional[Mapping[str, Any]] = None, projection: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> MemoryCursor:
+        return MemoryCursor([_project(document, projection) for document in self._find(query)], self)
+
+    def _update(self, query: Mapping[str, Any], update: Mapping[str, Any], upsert: bool, many: bool) -> _Result:
+        matched = 0
+        for document in list(self._find(query)):
+            _apply_update(document, update, inserting=False)
+            matched += 1
+            if not many:
+                break
+        upserted_id = None
+        if not matched and upsert:
+            document = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            document.setdefault("_id", ObjectId())
+            _apply_update(document, update, inserting=True)
+            self.documents[document["_id"]] = document
+            upserted_id = document["_id"]
+        self._changed()
+        return _Result(matched_count=matched, modified_count=matched, upserted_id=upserted_id)
+
+    async def update_one(self, query: Mapping[str, Any], update: Mapping[str, Any], upsert: bool = False) -> _Result:
+        await self.database.round_trip()
+        return self._update(query, update, upsert, many=False)
+
+    async def find_one_and_update(
+            self,
+            query: Mapping[str, Any],
+            update: Mapping[str, Any],
+            projection: Optional[Mapping[str, Any]] = None,
+            return_document: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        await self.database.round_trip()
+        for document in self._find(query):
+            before = dict(document)
+            _apply_update(document, update, inserting=False)
+            self._changed()
+            return _project(document if return_document else before, projection)
+        return None
+
+    async def update_many(self, query: Mapping[str, Any], update: Mapping[str, Any], upsert: bool = False) -> _Result:
+        await self.database.round_trip()
+        return self._update(query, update, upsert, many=True)
+
+    async def bulk_write(self, operations: List[Any], ordered: bool = True) -> _Result:
+        # pymongo UpdateOne keeps its arguments on private attributes
+        await self.database.round_trip()
+        for operation in operations:
+            self._update(operation._filter, operation._doc, bool(operation._upsert), many=False)
+        return _Result(acknowledged=True)
+
+    async def delete_many(self, query: Mapping[str, Any]) -> _Result:
+        await self.database.round_trip()
+        doomed = [document["_id"] for document in self._find(query)]
+        for document_id in doomed:
+            del self.documents[document_id]
+        self._changed()
+        return _Result(deleted_count=len(doomed))
+
+    async def count_documents(self, query: Optional[Mapping[str, Any]] = None) -> int:
+        await self.database.round_trip()
+        return sum(1 for _ in self._find(query))
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        return kwargs.get("name") or "_".join(f"{field}_{order}" for field, order in (keys if isinstance(keys, list) else [(keys, 1)]))
+
+    def _vectors(self, path: str):
+        """(documents, unit-normalized matrix) of every document with a vector at `path`, rebuilt after writes"""
+        cached = self._vector_cache.get(path)
+        if cached is not None and cached[0] == self._version:
+            return cached[1], cached[2]
+        documents = [document for document in self.documents.values() if document.get(path) is not None]
+        if documents:
+            matrix = np.stack([decode_embedding({**document, "embedding": document[path]}) for document in documents])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        self._vector_cache[path] = (self._version, documents, matrix)
+        return documents, matrix
+
+    def _filter_mask(self, documents: List[Dict[str, Any]], query: Mapping[str, Any]) -> np.ndarray:
+        # Cached per filter until the next write, like a pre-filter over indexed fields
+        if self._mask_version != self._version:
+            self._mask_cache, self._mask_version = {}, self._version
+        key = repr(sorted(query.items()))
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter((_matches(document, query) for document in documents), dtype=bool, count=len(documents))
+            self._mask_cache[key] = mask
+        return mask
+
+    def _vector_search(self, stage: Mapping[str, Any]) -> List[Dict[str, Any]]:
+        documents, matrix = self._vectors(stage["path"])
+        if not documents:
+            return []
+        query = decode_embedding({"embedding": stage["queryVector"]})
+        query = query / (np.linalg.norm(query) or 1.0)
+        mask = self._filter_mask(documents, stage.get("filter") or {})
+        scores = np.where(mask, matrix @ query, -np.inf)
+        limit = min(stage["limit"], int(mask.sum()))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [{**documents[i], "_score": float((1.0 + scores[i]) / 2.0)} for i in top]
+
+    def aggregate(self, pipeline: List[Mapping[str, Any]]) -> MemoryCursor:
+        documents: List[Dict[str, Any]] = list(self.documents.values())
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            if operator == "$vectorSearch":
+                documents = self._vector_search(spec)
+            elif operator == "$match":
+                documents = [document for document in documents if _matches(document, spec)]
+            elif operator == "$limit":
+                documents = documents[:spec]
+            elif operator == "$sample":
+                documents = random.sample(documents, min(spec["size"], len(documents)))
+            elif operator == "$group":
+                documents = _group(documents, spec)
+            elif operator == "$project":
+                projected = []
+                for document in documents:
+                    result = _project(document, spec)
+                    for field, value in spec.items():
+                        if isinstance(value, dict) and value.get("$meta") in ("vectorSearchScore", "searchScore"):
+                            result[field] = document.get("_score")
+                    projected.append(result)
+                documents = projected
+            else:
+                raise NotImplementedError(f"Aggregation stage {operator} is not supported by the stand-in")
+        return MemoryCursor([dict(document) for document in documents], self)
+
+
+class MemoryDatabase:
+    """In-process stand-in for an AsyncIOMotorDatabase.
+
+    `latency_ms` is added to every round trip to model the network hop to Atlas.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.round_trips = 0
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    async def round_trip(self) -> None:
+        self.round_trips += 1
+        await asyncio.sleep(self.latency_ms / 1000 if self.latency_ms else 0)
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+def install(database: MemoryDatabase) -> None:
+    """Make `get_database()` return `database`"""
+    import app.database
+
+    app.database.database = database
+
+
+async def populate_chunks(database: MemoryDatabase, embeddings: FakeEmbeddings, size: int, equipment_id: ObjectId) -> None:
+    """Seed `size` embedded chunks of one synthetic manual for `equipment_id`"""
+    texts = make_paragraphs(size, words_per_paragraph=150, seed=size)
+    vectors = embeddings.embed_documents(texts)
+    document_id = ObjectId()
+    await database[settings.DOCUMENT_CHUNKS_COLLECTION].insert_many([
+        {
+            "document_id": document_id,
+            "equipment_id": equipment_id,
+            "tenant_id": settings.TENANT_ID,
+            "file_name": "manual.pdf",
+            "chunk_id": f"chunk-{index}",
+            "chunk_index": index,
+            "text": text,
+            **encode_embedding(vector),
+            "is_disabled": False,
+        }
+        for index, (text, vector) in enumerate(zip(texts, vectors))
+    ])
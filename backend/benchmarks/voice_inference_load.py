@@ -0,0 +1,115 @@
+"""Sessions per CPU core for VAD + smart-turn inference, per-session calls vs cross-session batching.
+
+    python -m benchmarks.voice_inference_load --sessions 8 32 64 --seconds 5
+
+Every simulated session runs in its own thread like a live analyzer. It
+sends a 32 ms Silero window in real time and runs a smart-turn check every
+`--turn-every` seconds. CPU cores used = process CPU time / wall time, and
+sessions per core = sessions / cores used. VAD latency is the time from a
+window's due time until its confidence is ready. "late" counts windows whose
+latency exceeded the 32 ms window length.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services.voice_models import VoiceModels
+
+WINDOW_SECS = 512 / 16000
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _run(models: VoiceModels, sessions: int, seconds: float, turn_every: float) -> dict:
+    rng = np.random.default_rng(0)
+    speech = (rng.normal(size=512) * 3000).astype(np.int16).tobytes()
+    turn_audio = (rng.normal(size=16000 * 4) * 0.1).astype(np.float32)
+    latencies: list[list[float]] = [[] for _ in range(sessions)]
+    turn_latencies: list[list[float]] = [[] for _ in range(sessions)]
+    start_barrier = threading.Barrier(sessions + 1)
+
+    def session(index: int) -> None:
+        vad = models.vad_analyzer()
+        vad.set_sample_rate(16000)
+        turn = models.turn_analyzer()
+        start_barrier.wait()
+        started = time.monotonic() + index * WINDOW_SECS / sessions  # spread sessions across the window
+        next_turn = started + turn_every * (index / sessions)
+        window = 0
+        while True:
+            due = started + window * WINDOW_SECS
+            if due - started >= seconds:
+                return
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            vad.voice_confidence(speech)
+            latencies[index].append(time.monotonic() - due)
+            if time.monotonic() >= next_turn:
+                turn_started = time.monotonic()
+                turn._predict_endpoint(turn_audio)
+                turn_latencies[index].append(time.monotonic() - turn_started)
+                next_turn += turn_every
+            window += 1
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    cpu_started, wall_started = time.process_time(), time.monotonic()
+    for thread in threads:
+        thread.join()
+    cpu, wall = time.process_time() - cpu_started, time.monotonic() - wall_started
+
+    vad_ms = [s * 1000 for per_session in latencies for s in per_session]
+    turn_ms = [s * 1000 for per_session in turn_latencies for s in per_session]
+    cores = cpu / wall
+    return {
+        "sessions": sessions,
+        "cpu_cores_used": round(cores, 3),
+        "sessions_per_core": round(sessions / cores, 1) if cores else None,
+        "vad_windows": len(vad_ms),
+        "vad_latency_ms": {
+            "p50": round(_percentile(vad_ms, 0.50), 2),
+            "p95": round(_percentile(vad_ms, 0.95), 2),
+            "p99": round(_percentile(vad_ms, 0.99), 2),
+        },
+        "vad_late_fraction": round(sum(ms > WINDOW_SECS * 1000 for ms in vad_ms) / len(vad_ms), 4),
+        "turn_latency_ms_mean": round(statistics.fmean(turn_ms), 2) if turn_ms else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--turn-every", type=float, default=2.0)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.VOICE_INFERENCE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    report = {"benchmark": "voice_inference_load", "seconds": args.seconds, "modes": {}}
+    for mode, batching in (("per_session", False), ("batched", True)):
+        settings.VOICE_INFERENCE_BATCHING = batching
+        settings.VOICE_INFERENCE_MAX_WAIT_MS = args.max_wait_ms
+        models = VoiceModels()
+        models.load()
+        try:
+            report["modes"][mode] = [
+                _run(models, sessions, args.seconds, args.turn_every) for sessions in args.sessions
+            ]
+            if batching:
+                report["batching_stats"] = models.status()["batching"]
+        finally:
+            models.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
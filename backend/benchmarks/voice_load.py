@@ -0,0 +1,362 @@
+"""Concurrent voice sessions against one backend process, ramped until audio degrades.
+
+    python -m benchmarks.voice_load --ramp 5 10 20 40 --step-secs 30
+
+Starts a backend in a child process with the real stream router, bot pipeline,
+VAD and smart-turn models, but with the in-process stub STT/LLM/TTS from
+benchmarks/voice_stubs.py and the Mongo/embedding stand-ins. It then opens
+WebSockets to /api/v1/stream/ws/{equipment_id} and speaks to each bot with
+ProtobufFrameSerializer frames: 20 ms of 16 kHz PCM every 20 ms, silence
+between turns and synthetic voiced audio (which Silero scores as speech)
+during them.
+
+Per ramp level it reports:
+- time to first audio: connect until the first greeting audio frame
+- turn latency: end of user speech until the first reply audio frame
+  (includes the VAD stop_secs and smart-turn wait)
+- frame jitter: how far reply audio inter-arrival times drift from the
+  audio duration of each frame; "late" counts gaps over 20 ms
+- server CPU cores and RSS, and the client's own CPU so an overloaded
+  load generator is visible
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import websockets
+from bson import ObjectId
+from loguru import logger
+from pipecat.frames.frames import InputAudioRawFrame, OutputAudioRawFrame
+from pipecat.serializers.protobuf import ProtobufFrameSerializer
+
+from app.config import settings
+
+SAMPLE_RATE = 16000
+CHUNK_SECS = 0.02
+CHUNK_BYTES = int(SAMPLE_RATE * CHUNK_SECS) * 2
+EQUIPMENT_ID = "65f000000000000000000001"
+# Reply audio arriving this long after the previous frame starts a new utterance
+UTTERANCE_GAP_SECS = 0.25
+
+
+def _speech(seconds: float, f0: float = 120.0) -> bytes:
+    """Voiced, formant-filtered pulse train: not intelligible, but Silero scores it as speech"""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    phase = np.cumsum(2 * np.pi * f0 * (1 + 0.1 * np.sin(2 * np.pi * 3 * t)) / SAMPLE_RATE)
+    source = sum(np.sin(k * phase) / k for k in range(1, 40))
+    formants = ((700, 1200), (300, 2300), (500, 900), (400, 2000), (600, 1700))
+    segment = int(SAMPLE_RATE * 0.15)
+    out = np.zeros_like(t)
+    for index, start in enumerate(range(0, t.size, segment)):
+        chunk = source[start:start + segment]
+        spectrum = np.fft.rfft(chunk)
+        freqs = np.fft.rfftfreq(chunk.size, 1 / SAMPLE_RATE)
+        f1, f2 = formants[index % len(formants)]
+        response = np.exp(-((freqs - f1) / 120) ** 2) + 0.7 * np.exp(-((freqs - f2) / 180) ** 2)
+        out[start:start + segment] = np.fft.irfft(spectrum * response, n=chunk.size) * np.hanning(chunk.size) ** 0.5
+    return (out / np.abs(out).max() * 12000).astype(np.int16).tobytes()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 1),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "p99_ms": round(pick(0.99) * 1000, 1),
+    }
+
+
+# --- server -----------------------------------------------------------------
+
+def _serve(args: argparse.Namespace) -> None:
+    import uvicorn
+    from fastapi import FastAPI
+
+    from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install, populate_chunks
+    from benchmarks.voice_stubs import StubLatencies, StubVoiceServices
+    from app.metrics import register_admission, unregister_admission
+    from app.routers import stream
+    from app.services.registry import ServiceRegistry
+
+    settings.MAX_CONCURRENT_SESSIONS = args.max_sessions
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        database = MemoryDatabase()
+        install(database)
+        equipment_id = ObjectId(EQUIPMENT_ID)
+        await database.equipment.insert_one(
+            {"_id": equipment_id, "name": "Load test pump", "description": "voice load test", "tenant_id": settings.TENANT_ID}
+        )
+        embeddings = FakeEmbeddings(latency_ms=args.embed_latency_ms)
+        await populate_chunks(database, embeddings, args.kb_chunks, equipment_id)
+
+        services = ServiceRegistry()
+        services.embedding_service.embeddings = embeddings
+        services.voice_services = StubVoiceServices(
+            StubLatencies(
+                stt_ms=args.stt_latency_ms,
+                llm_first_token_ms=args.llm_latency_ms,
+                tts_first_audio_ms=args.tts_latency_ms,
+            ),
+            tool_calls=not args.no_tool_calls,
+        )
+        app.state.services = services
+        await services.start()
+        await services.voice_models.wait_ready()
+        register_admission(services.admission)
+        yield
+        unregister_admission()
+        await services.close()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(stream.router, prefix="/api/v1/stream")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def _process_usage(pid: int) -> Tuple[float, float]:
+    """(CPU seconds, RSS MB) of a process, from /proc"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+    return cpu, rss
+
+
+# --- client -----------------------------------------------------------------
+
+@dataclass
+class Recorder:
+    """Samples stamped with loop time, so each ramp level can take its own window"""
+
+    first_audio: List[Tuple[float, float]] = field(default_factory=list)
+    turns: List[Tuple[float, float]] = field(default_factory=list)
+    jitter: List[Tuple[float, float]] = field(default_factory=list)
+    timeouts: List[float] = field(default_factory=list)
+    rejected: List[float] = field(default_factory=list)
+    errors: List[float] = field(default_factory=list)
+
+    @staticmethod
+    def window(samples: List[Any], start: float, end: float) -> List[Any]:
+        return [sample for sample in samples if start <= (sample[0] if isinstance(sample, tuple) else sample) < end]
+
+
+class VoiceClient:
+    """One simulated caller: streams mic audio in real time and times the bot's replies"""
+
+    def __init__(self, url: str, speech: bytes, recorder: Recorder, args: argparse.Namespace):
+        self.url = url
+        self.speech = speech
+        self.recorder = recorder
+        self.args = args
+        self.serializer = ProtobufFrameSerializer()
+        self.last_audio_at: Optional[float] = None
+        self.last_audio_secs = 0.0
+        self.speech_ended_at: Optional[float] = None
+        self.replied = False
+
+    async def run(self, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            async with websockets.connect(self.url, max_size=None) as ws:
+                connected_at = loop.time()
+                receiver = asyncio.create_task(self._receive(ws, connected_at))
+                try:
+                    await self._send(ws, stop)
+                finally:
+                    receiver.cancel()
+        except websockets.ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == 1013:
+                self.recorder.rejected.append(loop.time())
+            else:
+                self.recorder.errors.append(loop.time())
+        except (OSError, websockets.InvalidHandshake):
+            self.recorder.errors.append(loop.time())
+
+    async def _receive(self, ws, connected_at: float) -> None:
+        loop = asyncio.get_running_loop()
+        first_audio = True
+        async for message in ws:
+            frame = await self.serializer.deserialize(message)
+            if not isinstance(frame, InputAudioRawFrame):
+                continue
+            now = loop.time()
+            if first_audio:
+                self.recorder.first_audio.append((now, now - connected_at))
+                first_audio = False
+            if self.last_audio_at is not None and now - self.last_audio_at < UTTERANCE_GAP_SECS:
+                self.recorder.jitter.append((now, abs(now - self.last_audio_at - self.last_audio_secs)))
+            elif self.speech_ended_at is not None and not self.replied:
+                self.recorder.turns.append((now, now - self.speech_ended_at))
+                self.replied = True
+            self.last_audio_at = now
+            self.last_audio_secs = len(frame.audio) / 2 / frame.sample_rate / frame.num_channels
+
+    def _bot_quiet(self, now: float) -> bool:
+        return self.last_audio_at is not None and now - self.last_audio_at > self.args.pause_secs
+
+    async def _send(self, ws, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        silence = bytes(CHUNK_BYTES)
+        speech_chunks = [self.speech[i:i + CHUNK_BYTES] for i in range(0, len(self.speech) - CHUNK_BYTES + 1, CHUNK_BYTES)]
+        speaking: Optional[int] = None
+        next_due = loop.time()
+        while not stop.is_set():
+            now = loop.time()
+            if speaking is None:
+                awaiting = self.speech_ended_at is not None and not self.replied
+                if awaiting and now - self.speech_ended_at > self.args.turn_timeout:
+                    self.recorder.timeouts.append(now)
+                    awaiting = False
+                if not awaiting and self._bot_quiet(now):
+                    speaking, self.speech_ended_at, self.replied = 0, None, False
+            if speaking is not None:
+                audio = speech_chunks[speaking]
+                speaking += 1
+                if speaking == len(speech_chunks):
+                    speaking, self.speech_ended_at = None, loop.time()
+            else:
+                audio = silence
+            await ws.send(await self.serializer.serialize(OutputAudioRawFrame(audio, SAMPLE_RATE, 1)))
+
+            next_due += CHUNK_SECS
+            delay = next_due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_due = loop.time()  # fell behind; don't burst to catch up
+
+
+async def _wait_for_server(base_url: str, process: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("Load test server exited during startup")
+            try:
+                if (await client.get(f"{base_url}/api/v1/stream/capacity")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError("Load test server did not start")
+
+
+async def _run(args: argparse.Namespace, server: subprocess.Popen) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    await _wait_for_server(base_url, server)
+
+    loop = asyncio.get_running_loop()
+    speech = _speech(args.speech_secs)
+    recorder = Recorder()
+    stop = asyncio.Event()
+    clients: List[asyncio.Task] = []
+    levels = []
+
+    async with httpx.AsyncClient() as http:
+        for level in args.ramp:
+            new_sessions = max(0, level - len(clients))
+            for _ in range(new_sessions):
+                client = VoiceClient(f"ws://127.0.0.1:{args.port}/api/v1/stream/ws/{EQUIPMENT_ID}", speech, recorder, args)
+                clients.append(asyncio.create_task(client.run(stop)))
+                # Stagger connects so sessions don't all speak in lockstep
+                await asyncio.sleep(args.connect_interval)
+
+            started = loop.time()
+            server_cpu, _ = _process_usage(server.pid)
+            client_cpu = time.process_time()
+            await asyncio.sleep(args.step_secs)
+            ended = loop.time()
+            server_cpu_end, server_rss = _process_usage(server.pid)
+            capacity = (await http.get(f"{base_url}/api/v1/stream/capacity")).json()
+
+            jitter = [value for _, value in Recorder.window(recorder.jitter, started, ended)]
+            levels.append({
+                "sessions": level,
+                "active_sessions": capacity.get("active"),
+                "time_to_first_audio": _percentiles([value for _, value in Recorder.window(recorder.first_audio, started - new_sessions * args.connect_interval, ended)]),
+                "turn_latency": _percentiles([value for _, value in Recorder.window(recorder.turns, started, ended)]),
+                "turn_timeouts": len(Recorder.window(recorder.timeouts, started, ended)),
+                "frame_jitter": _percentiles(jitter),
+                "late_frame_fraction": round(sum(value > CHUNK_SECS for value in jitter) / len(jitter), 4) if jitter else None,
+                "server_cpu_cores": round((server_cpu_end - server_cpu) / (ended - started), 3),
+                "server_rss_mb": round(server_rss, 1),
+                "client_cpu_cores": round((time.process_time() - client_cpu) / (ended - started), 3),
+                "rejected_total": len(recorder.rejected),
+                "errors_total": len(recorder.errors),
+            })
+            logger.info(f"Ramp level {level}: {json.dumps(levels[-1])}")
+
+    stop.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+    return {
+        "benchmark": "voice_load",
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("serve", "output")
+        },
+        "levels": levels,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ramp", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--step-secs", type=float, default=30)
+    parser.add_argument("--connect-interval", type=float, default=0.1, help="Seconds between new connections")
+    parser.add_argument("--speech-secs", type=float, default=1.5, help="Length of each user utterance")
+    parser.add_argument("--pause-secs", type=float, default=1.0, help="Bot silence before the caller speaks again")
+    parser.add_argument("--turn-timeout", type=float, default=10.0)
+    parser.add_argument("--stt-latency-ms", type=float, default=150)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--tts-latency-ms", type=float, default=150)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--kb-chunks", type=int, default=500)
+    parser.add_argument("--no-tool-calls", action="store_true", help="Answer without calling search_knowledge_base")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Server MAX_CONCURRENT_SESSIONS")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING" if args.serve else "INFO")
+
+    if args.serve:
+        _serve(args)
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.voice_load", "--serve", *sys.argv[1:]],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        report = asyncio.run(_run(args, server))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
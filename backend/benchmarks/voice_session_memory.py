@@ -0,0 +1,89 @@
+"""Memory and setup time per concurrent voice session: per-session VAD/smart-turn models vs shared ones.
+
+    python -m benchmarks.voice_session_memory --sessions 20
+
+Each mode runs in its own interpreter so RSS numbers don't leak between them.
+"per_session" builds SileroVADAnalyzer + LocalSmartTurnAnalyzerV3 for every
+session (the old bot() behaviour); "shared" loads VoiceModels once and builds
+per-session analyzers on top of it.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = ("per_session", "shared")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_mode(mode: str, sessions: int) -> dict:
+    from pipecat.audio.turn.smart_turn.local_smart_turn_v3 import LocalSmartTurnAnalyzerV3
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+    from pipecat.audio.vad.vad_analyzer import VADParams
+
+    from app.services.voice_models import VoiceModels
+
+    params = VADParams(stop_secs=0.5, start_secs=0.1, min_volume=0.5)
+    models = VoiceModels()
+    warmup_secs = 0.0
+    if mode == "shared":
+        models.load()
+        warmup_secs = models.load_secs
+
+    baseline = _rss_mb()
+    analyzers = []
+    setup = []
+    for _ in range(sessions):
+        started = time.perf_counter()
+        if mode == "shared":
+            analyzers.append((models.vad_analyzer(params=params), models.turn_analyzer()))
+        else:
+            analyzers.append((SileroVADAnalyzer(params=params), LocalSmartTurnAnalyzerV3()))
+        setup.append(time.perf_counter() - started)
+    total = _rss_mb()
+
+    return {
+        "sessions": sessions,
+        "warmup_secs": round(warmup_secs, 3),
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_total_mb": round(total, 1),
+        "rss_per_session_mb": round((total - baseline) / sessions, 2),
+        "setup_ms_per_session": round(sum(setup) / sessions * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_run_mode(args.mode, args.sessions)))
+        return
+
+    report = {"benchmark": "voice_session_memory", "modes": {}}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.voice_session_memory", "--mode", mode, "--sessions", str(args.sessions)],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        report["modes"][mode] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
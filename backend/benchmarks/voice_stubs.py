@@ -0,0 +1,147 @@
+"""In-process STT, LLM and TTS stand-ins for voice load tests.
+
+Each stub sleeps for a configurable latency where the real service would wait
+on the network, then produces the same frames the real service does, so the
+rest of the pipeline (VAD, smart-turn, aggregators, knowledge-base tool,
+transport pacing) runs unchanged.
+"""
+import asyncio
+import itertools
+import uuid
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+import numpy as np
+from pipecat.frames.frames import (
+    Frame,
+    FunctionCallFromLLM,
+    LLMContextFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import SegmentedSTTService
+from pipecat.services.tts_service import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+from app.services.voice_services import VoiceServiceFactory
+
+QUESTIONS = (
+    "What is the torque spec for the pump housing bolts",
+    "How do I reset the E204 fault on the motor controller",
+    "When should I replace the shaft seal and bearing",
+    "What is the maintenance interval for the filter",
+    "How do I calibrate the pressure sensor",
+)
+
+REPLY = "Tighten the housing bolts to forty newton meters in a star pattern and recheck after the first run."
+
+
+@dataclass
+class StubLatencies:
+    stt_ms: float = 150.0
+    llm_first_token_ms: float = 300.0
+    llm_token_ms: float = 15.0
+    tts_first_audio_ms: float = 150.0
+    tts_secs_per_word: float = 0.3
+
+
+class StubSTTService(SegmentedSTTService):
+    """Returns the next canned question once VAD reports the user stopped speaking"""
+
+    def __init__(self, latency_ms: float, **kwargs):
+        super().__init__(**kwargs)
+        self._latency = latency_ms / 1000
+        self._questions = itertools.cycle(QUESTIONS)
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._latency)
+        await self.stop_ttfb_metrics()
+        yield TranscriptionFrame(next(self._questions), self._user_id, time_now_iso8601())
+
+
+class StubLLMService(LLMService):
+    """Streams a fixed reply; calls `search_knowledge_base` first when the last message is from the user"""
+
+    def __init__(self, latencies: StubLatencies, tool_calls: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self._latencies = latencies
+        self._tool_calls = tool_calls
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if not isinstance(frame, LLMContextFrame):
+            await self.push_frame(frame, direction)
+            return
+
+        await self.push_frame(LLMFullResponseStartFrame())
+        await self.start_processing_metrics()
+        try:
+            await self.start_ttfb_metrics()
+            await asyncio.sleep(self._latencies.llm_first_token_ms / 1000)
+            await self.stop_ttfb_metrics()
+
+            messages = frame.context.get_messages()
+            last = messages[-1] if messages else {}
+            if self._tool_calls and last.get("role") == "user":
+                content = last.get("content")
+                query = content if isinstance(content, str) else " ".join(part.get("text", "") for part in content)
+                await self.run_function_calls([
+                    FunctionCallFromLLM(
+                        function_name="search_knowledge_base",
+                        tool_call_id=f"call_{uuid.uuid4().hex[:12]}",
+                        arguments={"query": query},
+                        context=frame.context,
+                    )
+                ])
+                return
+
+            for index, word in enumerate(REPLY.split()):
+                if index:
+                    await asyncio.sleep(self._latencies.llm_token_ms / 1000)
+                await self.push_frame(LLMTextFrame(f"{word} "))
+        finally:
+            await self.stop_processing_metrics()
+            await self.push_frame(LLMFullResponseEndFrame())
+
+
+class StubTTSService(TTSService):
+    """Synthesizes a quiet tone, `secs_per_word` of audio per word"""
+
+    def __init__(self, latencies: StubLatencies, **kwargs):
+        super().__init__(**kwargs)
+        self._latencies = latencies
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        await self.start_ttfb_metrics()
+        await asyncio.sleep(self._latencies.tts_first_audio_ms / 1000)
+        yield TTSStartedFrame()
+
+        samples = int(self.sample_rate * self._latencies.tts_secs_per_word * max(1, len(text.split())))
+        tone = (np.sin(2 * np.pi * 220 * np.arange(samples) / self.sample_rate) * 1000).astype(np.int16).tobytes()
+        for offset in range(0, len(tone), self.chunk_size):
+            await self.stop_ttfb_metrics()
+            yield TTSAudioRawFrame(tone[offset:offset + self.chunk_size], self.sample_rate, 1)
+        yield TTSStoppedFrame()
+
+
+class StubVoiceServices(VoiceServiceFactory):
+    def __init__(self, latencies: StubLatencies | None = None, tool_calls: bool = True):
+        self.latencies = latencies or StubLatencies()
+        self.tool_calls = tool_calls
+
+    def stt(self) -> StubSTTService:
+        return StubSTTService(self.latencies.stt_ms)
+
+    def llm(self) -> StubLLMService:
+        return StubLLMService(self.latencies, tool_calls=self.tool_calls)
+
+    def tts(self) -> StubTTSService:
+        return StubTTSService(self.latencies)
@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
@@ -6,8 +7,14 @@ from loguru import logger
 import sys
 import os
 
-from app.database import connect_to_mongo, close_mongo_connection
+from app.config import settings
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.metrics import register_admission, register_caches, render_latest, unregister_admission, unregister_caches
 from app.routers import equipment, stream
+from app.services.indexes import IndexManager
+from app.services.registry import ServiceRegistry
+from app.services.text_extraction import shutdown_pdf_pool
+from app.services.vector_store import NumpyVectorStore
 
 logger.remove()
 logger.add(sys.stdout, colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>")
@@ -18,9 +25,26 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Industrial MVP backend...")
     await connect_to_mongo()
+    if settings.INDEX_MANAGEMENT_ENABLED:
+        await IndexManager(await get_database()).run()
+    app.state.services = ServiceRegistry()
+    await app.state.services.start()
+    register_admission(app.state.services.admission)
+    caches = {
+        "query_embedding": app.state.services.rag_service.cache_stats,
+        "equipment": app.state.services.equipment_cache.stats,
+        "lexical_partitions": app.state.services.lexical_index.cache_stats,
+    }
+    if isinstance(app.state.services.vector_store, NumpyVectorStore):
+        caches["vector_partitions"] = app.state.services.vector_store.cache_stats
+    register_caches(caches)
     yield
     # Shutdown
     logger.info("🛑 Shutting down...")
+    unregister_admission()
+    unregister_caches()
+    await app.state.services.close()
+    shutdown_pdf_pool()
     await close_mongo_connection()
 
 
@@ -74,6 +98,31 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check(request: Request):
+    """200 once voice models are warmed up and sessions can start without loading them.
+
+    503 with status "warming_up" while they load, or "failed" and a reason once every load attempt failed.
+    """
+    services = getattr(request.app.state, "services", None)
+    voice_models = services.voice_models.status() if services else {"ready": False, "load_secs": None}
+    ready = bool(services and services.ready)
+    content = {"status": "ready" if ready else "warming_up", "voice_models": voice_models}
+    if services and services.voice_models.failed:
+        content.update(status="failed", reason=f"Voice models failed to load: {services.voice_models.error}")
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=content,
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 
 if __name__ == "__main__":
     import uvicorn
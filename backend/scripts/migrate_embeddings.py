@@ -0,0 +1,85 @@
+"""Convert stored embeddings to another storage format in place.
+
+    python -m scripts.migrate_embeddings --format float32
+    python -m scripts.migrate_embeddings --format int8 --collection embedding_store
+
+Only documents not already in the target format are rewritten, so the
+command can be re-run after an interruption.
+"""
+import argparse
+import asyncio
+
+from bson.binary import Binary, BinaryVectorDtype, VECTOR_SUBTYPE
+from loguru import logger
+from pymongo import UpdateOne
+
+from app import database
+from app.config import settings
+from app.services.vector_codec import STORAGE_FORMATS, decode_embedding, encode_embedding
+
+
+def _current_format(value) -> str:
+    if isinstance(value, Binary) and value.subtype == VECTOR_SUBTYPE:
+        return "int8" if bytes(value[:1]) == BinaryVectorDtype.INT8.value else "float32"
+    return "array"
+
+
+async def migrate(collection_name: str, storage_format: str, batch_size: int) -> int:
+    collection = database.database[collection_name]
+    cursor = collection.find(
+        {"embedding": {"$exists": True}},
+        {"embedding": 1, "embedding_scale": 1},
+        batch_size=batch_size,
+    )
+
+    converted = 0
+    batch = []
+    async for doc in cursor:
+        if _current_format(doc["embedding"]) == storage_format:
+            continue
+        fields = encode_embedding(decode_embedding(doc), storage_format)
+        update = {"$set": fields}
+        if "embedding_scale" not in fields:
+            update["$unset"] = {"embedding_scale": ""}
+        batch.append(UpdateOne({"_id": doc["_id"]}, update))
+
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            converted += len(batch)
+            batch = []
+            logger.info(f"{collection_name}: converted {converted} embeddings to {storage_format}")
+
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        converted += len(batch)
+
+    logger.success(f"{collection_name}: converted {converted} embeddings to {storage_format}")
+    return converted
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=STORAGE_FORMATS, default=settings.EMBEDDING_STORAGE_FORMAT)
+    parser.add_argument(
+        "--collection",
+        action="append",
+        help="Collection to convert (repeatable; default: chunks and the embedding store)",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    collections = args.collection or [settings.DOCUMENT_CHUNKS_COLLECTION, settings.EMBEDDING_STORE_COLLECTION]
+
+    await database.connect_to_mongo()
+    try:
+        for collection_name in collections:
+            await migrate(collection_name, args.format, args.batch_size)
+    finally:
+        await database.close_mongo_connection()
+
+    if args.format != settings.EMBEDDING_STORAGE_FORMAT:
+        logger.warning(f"Set EMBEDDING_STORAGE_FORMAT={args.format} so new chunks are written the same way")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,286 @@
+"""Tune `k` and `numCandidates` per corpus size against exact search.
+
+    python -m scripts.tune_retrieval --target-recall 0.95
+    python -m scripts.tune_retrieval --queries labelled.jsonl --ks 3 5 8 --dry-run --output report.json
+
+Equipment corpora are grouped into size buckets (active chunks per equipment,
+see `size_bucket`). Each bucket gets a query set: the lines of `--queries`
+(JSON: `query`, `equipment_id`, optional `tenant_id` and `relevant_chunk_ids`)
+for equipment in that bucket, or else passages sampled from its chunks.
+
+Every (k, numCandidates) in the sweep then runs through Atlas `$vectorSearch`
+and is scored by latency and by recall@k: the share of the exact brute-force
+top k (NumpyVectorStore) it returns, or of the labelled chunks when a query
+has them. For each bucket
+and k, the smallest numCandidates meeting `--target-recall` is written to
+RETRIEVAL_TUNING_COLLECTION. Only buckets scored on labelled queries get a
+recommended k (the smallest that meets the target), which
+`RAGService.retrieve(k=None)` then uses; recall against the exact top k says
+nothing about how many chunks a question needs, so sampled buckets keep
+RETRIEVAL_DEFAULT_K with its tuned numCandidates. `--dry-run` only reports.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from loguru import logger
+
+from app import database
+from app.config import settings
+from app.services.embeddings import EmbeddingService
+from app.services.rag import RAGService
+from app.services.retrieval_tuning import size_bucket
+from app.services.vector_store import AtlasVectorStore, NumpyVectorStore, VectorStore
+
+# Atlas rejects numCandidates above this
+MAX_NUM_CANDIDATES = 10_000
+
+
+async def corpus_sizes(db) -> Dict[str, Dict[str, Any]]:
+    """Active chunk count per equipment, keyed by equipment id"""
+    cursor = db[settings.DOCUMENT_CHUNKS_COLLECTION].aggregate([
+        {"$match": {"is_disabled": {"$ne": True}}},
+        {"$group": {"_id": {"equipment_id": "$equipment_id", "tenant_id": "$tenant_id"}, "chunks": {"$sum": 1}}},
+    ])
+    sizes = {}
+    async for group in cursor:
+        equipment_id = str(group["_id"]["equipment_id"])
+        sizes[equipment_id] = {
+            "equipment_id": equipment_id,
+            "tenant_id": group["_id"].get("tenant_id"),
+            "chunks": group["chunks"],
+        }
+    return sizes
+
+
+async def sample_queries(db, corpus: Dict[str, Any], count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Short passages cut from random chunks of one equipment's corpus"""
+    match: Dict[str, Any] = {"equipment_id": ObjectId(corpus["equipment_id"]), "is_disabled": {"$ne": True}}
+    if corpus["tenant_id"]:
+        match["tenant_id"] = corpus["tenant_id"]
+    cursor = db[settings.DOCUMENT_CHUNKS_COLLECTION].aggregate([
+        {"$match": match},
+        {"$sample": {"size": count}},
+        {"$project": {"text": 1}},
+    ])
+
+    queries = []
+    async for chunk in cursor:
+        words = (chunk.get("text") or "").split()
+        if len(words) < 4:
+            continue
+        length = min(len(words), rng.randint(6, 14))
+        start = rng.randrange(len(words) - length + 1)
+        queries.append({
+            "query": " ".join(words[start:start + length]),
+            "equipment_id": corpus["equipment_id"],
+            "tenant_id": corpus["tenant_id"],
+        })
+    return queries
+
+
+def _filters(query: Dict[str, Any]) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {"is_disabled": {"$ne": True}, "equipment_id": ObjectId(query["equipment_id"])}
+    if query.get("tenant_id"):
+        filters["tenant_id"] = query["tenant_id"]
+    return filters
+
+
+def _p(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def evaluate_bucket(
+        bucket: int,
+        queries: List[Dict[str, Any]],
+        rag_service: RAGService,
+        exact: VectorStore,
+        approximate: VectorStore,
+        ks: List[int],
+        multipliers: List[int],
+) -> List[Dict[str, Any]]:
+    """Recall@k and latency of every (k, numCandidates) setting over `queries`"""
+    embeddings = await rag_service.embed_queries([query["query"] for query in queries])
+
+    # Exact ranking down to the largest k; recall@k compares against its first k
+    max_k = max(ks)
+    ranked = []
+    for query, embedding in zip(queries, embeddings):
+        if query.get("relevant_chunk_ids"):
+            ranked.append(None)
+        else:
+            hits = await exact.search(embedding, k=max_k, num_candidates=max_k, filters=_filters(query))
+            ranked.append([str(hit["chunk_id"]) for hit in hits])
+
+    rows = []
+    for k in ks:
+        relevant = [
+            {str(chunk_id) for chunk_id in query["relevant_chunk_ids"]} if exact_ids is None else set(exact_ids[:k])
+            for query, exact_ids in zip(queries, ranked)
+        ]
+        for num_candidates in sorted({min(k * m, MAX_NUM_CANDIDATES) for m in multipliers}):
+            recalls, latencies, labelled = [], [], 0
+            for query, embedding, expected in zip(queries, embeddings, relevant):
+                if not expected:
+                    continue
+                labelled += bool(query.get("relevant_chunk_ids"))
+                started = time.perf_counter()
+                hits = await approximate.search(embedding, k=k, num_candidates=num_candidates, filters=_filters(query))
+                latencies.append(time.perf_counter() - started)
+                found = {str(hit["chunk_id"]) for hit in hits}
+                recalls.append(len(found & expected) / len(expected))
+            if not recalls:
+                continue
+            rows.append({
+                "bucket": bucket,
+                "k": k,
+                "num_candidates": num_candidates,
+                "queries": len(recalls),
+                "labelled": labelled,
+                "recall": round(statistics.fmean(recalls), 4),
+                "p50_ms": round(_p(latencies, 0.50) * 1000, 2),
+                "p95_ms": round(_p(latencies, 0.95) * 1000, 2),
+            })
+            logger.info(f"bucket={bucket} k={k} numCandidates={num_candidates}: {rows[-1]}")
+    return rows
+
+
+def choose(rows: List[Dict[str, Any]], target_recall: float) -> List[Dict[str, Any]]:
+    """Per k, the smallest numCandidates meeting the target.
+
+    The smallest such k is recommended only when all its queries were labelled:
+    against the exact top k, recall only gets easier as k shrinks, so sampled
+    queries would always pick the smallest k in the sweep.
+    """
+    chosen: Dict[int, Dict[str, Any]] = {}
+    for row in sorted(rows, key=lambda row: (row["k"], row["num_candidates"])):
+        if row["recall"] >= target_recall and row["k"] not in chosen:
+            chosen[row["k"]] = dict(row)
+    entries = [chosen[k] for k in sorted(chosen)]
+    if entries and entries[0]["labelled"] == entries[0]["queries"]:
+        entries[0]["recommended"] = True
+    return entries
+
+
+def print_report(rows: List[Dict[str, Any]], entries: List[Dict[str, Any]]) -> None:
+    chosen = {(entry["bucket"], entry["k"], entry["num_candidates"]): entry for entry in entries}
+    print(f"{'bucket':>8} {'k':>3} {'numCand':>8} {'recall':>7} {'p50_ms':>8} {'p95_ms':>8}")
+    for row in rows:
+        entry = chosen.get((row["bucket"], row["k"], row["num_candidates"]))
+        mark = "" if entry is None else (" <- recommended" if entry.get("recommended") else " <- chosen")
+        print(
+            f"{row['bucket']:>8} {row['k']:>3} {row['num_candidates']:>8} {row['recall']:>7.3f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}{mark}"
+        )
+
+
+async def store(db, bucket: int, entries: List[Dict[str, Any]], target_recall: float) -> None:
+    collection = db[settings.RETRIEVAL_TUNING_COLLECTION]
+    await collection.delete_many({"bucket": bucket})
+    if not entries:
+        return
+    tuned_at = datetime.now(timezone.utc)
+    await collection.insert_many([
+        {
+            **entry,
+            "recommended": bool(entry.get("recommended")),
+            "target_recall": target_recall,
+            "tuned_at": tuned_at,
+        }
+        for entry in entries
+    ])
+
+
+def load_labelled(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def tune(args: argparse.Namespace) -> Dict[str, Any]:
+    db = await database.get_database()
+    rng = random.Random(args.seed)
+    rag_service = RAGService(vector_store=AtlasVectorStore(), embedding_service=EmbeddingService())
+    exact = NumpyVectorStore()
+
+    sizes = await corpus_sizes(db)
+    buckets: Dict[int, List[Dict[str, Any]]] = {}
+    if args.queries:
+        for query in load_labelled(args.queries):
+            corpus = sizes.get(str(query["equipment_id"]))
+            if corpus is None:
+                logger.warning(f"Skipping query for equipment without active chunks: {query['equipment_id']}")
+                continue
+            query.setdefault("tenant_id", corpus["tenant_id"])
+            buckets.setdefault(size_bucket(corpus["chunks"]), []).append(query)
+    else:
+        corpora: Dict[int, List[Dict[str, Any]]] = {}
+        for corpus in sizes.values():
+            corpora.setdefault(size_bucket(corpus["chunks"]), []).append(corpus)
+        for bucket, members in corpora.items():
+            rng.shuffle(members)
+            members = members[:args.max_equipment]
+            per_equipment = max(1, args.queries_per_bucket // len(members))
+            for corpus in members:
+                buckets.setdefault(bucket, []).extend(await sample_queries(db, corpus, per_equipment, rng))
+
+    rows, entries = [], []
+    for bucket in sorted(buckets):
+        bucket_rows = await evaluate_bucket(
+            bucket,
+            buckets[bucket],
+            rag_service,
+            exact,
+            rag_service.vector_store,
+            args.ks,
+            args.candidate_multipliers,
+        )
+        bucket_entries = choose(bucket_rows, args.target_recall)
+        if not bucket_entries:
+            logger.warning(f"No setting reached recall {args.target_recall} for bucket {bucket}; defaults stay in use")
+        elif not bucket_entries[0].get("recommended"):
+            logger.info(f"Bucket {bucket} was tuned on unlabelled queries; k stays at RETRIEVAL_DEFAULT_K")
+        if not args.dry_run:
+            await store(db, bucket, bucket_entries, args.target_recall)
+        rows.extend(bucket_rows)
+        entries.extend(bucket_entries)
+
+    print_report(rows, entries)
+    return {"target_recall": args.target_recall, "settings": rows, "chosen": entries}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--ks", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--candidate-multipliers", type=int, nargs="+", default=[2, 5, 10, 20, 50])
+    parser.add_argument("--queries", help="Labelled query set (JSON lines); sampled from chunks when omitted")
+    parser.add_argument("--queries-per-bucket", type=int, default=100)
+    parser.add_argument("--max-equipment", type=int, default=10, help="Equipment sampled per bucket")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="Report only; leave the stored settings unchanged")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+async def main() -> None:
+    args = parse_args()
+    await database.connect_to_mongo()
+    try:
+        report = await tune(args)
+    finally:
+        await database.close_mongo_connection()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+# Tests run offline; the settings module still requires these to be set
+for _name in ("MONGO_URL", "DEEPGRAM_API_KEY", "GROQ_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(_name, "offline-test")
+
+
+@pytest.fixture
+async def documents_api(tmp_path, monkeypatch):
+    """Equipment document routes on the stand-in database, uploads under `tmp_path`.
+
+    Yields (client, database, services, documents URL); ingestion workers are not started.
+    """
+    from app.config import settings
+    from app.routers import equipment
+    from app.services.registry import ServiceRegistry
+    from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    database = MemoryDatabase()
+    install(database)
+    equipment_id = (await database.equipment.insert_one({"name": "Pump", "tenant_id": settings.TENANT_ID})).inserted_id
+
+    services = ServiceRegistry()
+    services.embedding_service.embeddings = FakeEmbeddings(dimensions=8)
+    app = FastAPI()
+    app.include_router(equipment.router, prefix="/api/v1/equipment")
+    app.state.services = services
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, database, services, f"/api/v1/equipment/{equipment_id}/documents"
+    await services.close()
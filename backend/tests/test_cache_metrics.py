@@ -0,0 +1,33 @@
+from prometheus_client import CollectorRegistry, generate_latest
+
+from app.metrics import CacheCollector
+from app.services.cache import TTLCache, WeightedLRUCache
+
+
+def test_cache_collector_exports_stats_per_cache():
+    query_cache = TTLCache(maxsize=4, ttl=60)
+    query_cache.set("pump", [0.1])
+    query_cache.get("pump")
+    query_cache.get("valve")
+    registry = CollectorRegistry()
+    registry.register(CacheCollector({"query_embedding": query_cache.stats, "equipment": TTLCache(8, 60).stats}))
+
+    text = generate_latest(registry).decode()
+
+    assert 'cache_hits_total{cache="query_embedding"} 1.0' in text
+    assert 'cache_misses_total{cache="query_embedding"} 1.0' in text
+    assert 'cache_entries{cache="query_embedding"} 1.0' in text
+    assert 'cache_max_entries{cache="equipment"} 8.0' in text
+
+
+def test_weighted_lru_evicts_least_recently_used_past_either_budget():
+    cache = WeightedLRUCache(maxsize=3, max_weight=10)
+    cache.set("a", "A", 4)
+    cache.set("b", "B", 4)
+    cache.get("a")
+    cache.set("c", "C", 4)  # over the weight budget: "b" is least recently used
+
+    assert "b" not in cache and "a" in cache and "c" in cache
+    cache.reweigh("c", 9)  # growing in place evicts others, never the entry itself
+    assert cache.items() == [("c", "C")]
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,29 @@
+import httpx
+import pytest
+
+from app.services.embeddings import EmbeddingService
+
+
+async def test_async_requests_use_the_pooled_client():
+    requests = []
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"embeddings": [{"values": [0.5, 0.5]}, {"values": [0.25, 0.75]}]})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(respond)) as http_client:
+        service = EmbeddingService(http_client=http_client)
+        service.check_http_client()
+
+        vectors = await service.aembed_texts(["pump seal", "valve"])
+
+    assert vectors == [[0.5, 0.5], [0.25, 0.75]]
+    assert len(requests) == 1
+
+
+def test_check_fails_when_the_sdk_ignores_the_pooled_client():
+    service = EmbeddingService(http_client=httpx.AsyncClient())
+    service.http_client = httpx.AsyncClient()
+
+    with pytest.raises(RuntimeError):
+        service.check_http_client()
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.embeddings import EmbeddingService
+
+LATENCY_SECS = 0.05
+TICK_SECS = 0.005
+# Well under one stub request; a blocking call would show up as a gap of at least LATENCY_SECS
+MAX_GAP_SECS = 0.03
+
+
+class SlowEmbeddings:
+    """Stands in for GoogleGenerativeAIEmbeddings: the sync calls block the thread, the async ones yield"""
+
+    def __init__(self, dimensions: int = 8):
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts, **kwargs):
+        time.sleep(LATENCY_SECS)
+        return [[0.0] * self.dimensions for _ in texts]
+
+    def embed_query(self, text, **kwargs):
+        time.sleep(LATENCY_SECS)
+        return [0.0] * self.dimensions
+
+    async def aembed_documents(self, texts, **kwargs):
+        await asyncio.sleep(LATENCY_SECS)
+        return [[0.0] * self.dimensions for _ in texts]
+
+    async def aembed_query(self, text, **kwargs):
+        await asyncio.sleep(LATENCY_SECS)
+        return [0.0] * self.dimensions
+
+
+@pytest.fixture
+def embedding_service():
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.embeddings = SlowEmbeddings()
+    return service
+
+
+async def max_tick_gap(work):
+    """Run `work` while a ticker sleeps TICK_SECS in a loop; the longest gap between its ticks"""
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(TICK_SECS)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)  # let the ticker start before the work does
+    try:
+        result = await work
+    finally:
+        done.set()
+        await task
+    return result, max(gaps)
+
+
+async def test_aembed_texts_does_not_block_loop(embedding_service):
+    vectors, gap = await max_tick_gap(embedding_service.aembed_texts(["alpha", "beta"]))
+
+    assert len(vectors) == 2
+    assert gap < MAX_GAP_SECS
+
+
+async def test_embed_chunks_does_not_block_loop(embedding_service, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "EMBEDDING_CONCURRENCY", 2)
+    texts = [f"chunk {i}" for i in range(20)]
+
+    vectors, gap = await max_tick_gap(embedding_service.embed_chunks(texts))
+
+    assert all(vector is not None for vector in vectors)
+    assert gap < MAX_GAP_SECS
+
+
+async def test_max_tick_gap_detects_blocking(embedding_service):
+    async def blocking():
+        return embedding_service.embeddings.embed_documents(["alpha"])
+
+    _, gap = await max_tick_gap(blocking())
+
+    assert gap >= LATENCY_SECS
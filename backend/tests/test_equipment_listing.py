@@ -0,0 +1,76 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+
+from app.config import settings
+from app.routers import equipment
+from app.services.equipment_cache import EquipmentCache
+from benchmarks.stand_ins import MemoryDatabase, install
+
+EQUIPMENT_COUNT = 250
+
+
+@pytest.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(settings, "LIST_PAGE_SIZE", 100)
+    database = MemoryDatabase()
+    install(database)
+    await database.equipment.insert_many([
+        {"name": f"eq{i}", "tenant_id": "t1" if i % 2 else "t2", "created_at": datetime.now(), "internal": 1}
+        for i in range(EQUIPMENT_COUNT)
+    ])
+    app = FastAPI()
+    app.include_router(equipment.router, prefix="/api/v1/equipment")
+    app.state.services = SimpleNamespace(equipment_cache=EquipmentCache())
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_list_without_paging_returns_everything(client):
+    response = await client.get("/api/v1/equipment/")
+
+    assert response.status_code == 200
+    assert len(response.json()) == EQUIPMENT_COUNT
+    assert "x-next-cursor" not in response.headers
+    assert "internal" not in response.json()[0]
+
+
+async def test_list_follows_the_cursor_page_by_page(client):
+    names = []
+    params = {"limit": 100}
+    while True:
+        response = await client.get("/api/v1/equipment/", params=params)
+        names.extend(item["name"] for item in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+        params = {"after": cursor}
+
+    assert names == [f"eq{i}" for i in range(EQUIPMENT_COUNT)]
+
+
+async def test_list_rejects_a_bad_cursor(client):
+    response = await client.get("/api/v1/equipment/", params={"after": "not-an-id"})
+    assert response.status_code == 400
+
+
+async def test_documents_without_paging_are_returned_in_full(documents_api, monkeypatch):
+    client, database, _, documents_url = documents_api
+    monkeypatch.setattr(settings, "LIST_PAGE_SIZE", 100)
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 64)
+    equipment_id = documents_url.split("/")[-2]
+    await database.documents_metadata.insert_many([
+        {"equipment_id": ObjectId(equipment_id), "tenant_id": settings.TENANT_ID, "file_name": f"doc{i}.pdf"}
+        for i in range(150)
+    ])
+
+    everything = (await client.get(documents_url)).json()
+    page = (await client.get(documents_url, params={"limit": 100})).json()
+
+    assert everything["count"] == 150 and everything["next_cursor"] is None
+    assert [doc["file_name"] for doc in everything["documents"]] == [f"doc{i}.pdf" for i in range(150)]
+    assert page["count"] == 100 and page["next_cursor"] is not None
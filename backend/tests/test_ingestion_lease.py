@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.services.ingestion import IngestionService, LeaseLost
+from benchmarks.stand_ins import MemoryDatabase, install
+
+
+@pytest.fixture
+def db():
+    database = MemoryDatabase()
+    install(database)
+    return database
+
+
+def make_service() -> IngestionService:
+    return IngestionService(embedding_service=object(), text_extractor=object(), rag_service=object())
+
+
+async def insert_job(db, **fields) -> ObjectId:
+    document = {"_id": ObjectId(), "tenant_id": "t", "embedding_status": "pending", **fields}
+    await db.documents_metadata.insert_one(document)
+    return document["_id"]
+
+
+async def test_only_one_worker_claims_a_job(db):
+    first, second = make_service(), make_service()
+    job_id = await insert_job(db)
+
+    claimed = await first._claim(job_id)
+
+    assert claimed["worker_id"] == first.worker_id
+    assert claimed["embedding_status"] == "processing"
+    assert await second._claim(job_id) is None
+
+
+async def test_lapsed_lease_is_claimed_again(db):
+    crashed, survivor = make_service(), make_service()
+    job_id = await insert_job(
+        db,
+        embedding_status="processing",
+        worker_id=crashed.worker_id,
+        lease_until=datetime.utcnow() - timedelta(seconds=1),
+    )
+
+    assert await survivor.resume_pending() == 1
+    claimed = await survivor._claim(job_id)
+
+    assert claimed["worker_id"] == survivor.worker_id
+    with pytest.raises(LeaseLost):
+        await crashed._set_status(job_id, "processing", chunks_embedded=1)
+
+
+async def test_held_job_is_not_resumed(db):
+    holder, other = make_service(), make_service()
+    job_id = await insert_job(db)
+    await holder._claim(job_id)
+
+    assert await other.resume_pending() == 0
+
+
+async def test_finishing_drops_the_lease(db):
+    service = make_service()
+    job_id = await insert_job(db)
+    await service._claim(job_id)
+
+    await service._set_status(job_id, "completed")
+
+    document = await db.documents_metadata.find_one({"_id": job_id})
+    assert document["lease_until"] is None
+    assert await make_service()._claim(job_id) is None
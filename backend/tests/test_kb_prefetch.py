@@ -0,0 +1,27 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app.bot import KnowledgePrefetchProcessor, _Prefetch
+
+
+def lookups(result):
+    labels = {"result": result, "equipment_id": "eq-prefetch", "tenant_id": "t"}
+    return REGISTRY.get_sample_value("kb_prefetch_lookups_total", labels) or 0.0
+
+
+async def test_lookup_counts_hits_and_misses_in_prometheus():
+    processor = KnowledgePrefetchProcessor(rag_service=None, equipment_id="eq-prefetch", tenant_id="t")
+    text = "how do I replace the pump seal"
+    prefetch = _Prefetch(text, asyncio.ensure_future(asyncio.sleep(0, result=["chunk"])))
+    await prefetch.task
+    prefetch.duration_ms = 200.0
+    processor._prefetches[text] = prefetch
+    hits, misses = lookups("hit"), lookups("miss")
+    saved = REGISTRY.get_sample_value("kb_prefetch_saved_seconds_count", {"equipment_id": "eq-prefetch", "tenant_id": "t"}) or 0.0
+
+    assert await processor.lookup("replace the pump seal") == ["chunk"]
+    assert await processor.lookup("what voltage does the controller need") is None
+
+    assert lookups("hit") == hits + 1 and lookups("miss") == misses + 1
+    assert REGISTRY.get_sample_value("kb_prefetch_saved_seconds_count", {"equipment_id": "eq-prefetch", "tenant_id": "t"}) == saved + 1
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.config import settings
+from app.services.lexical_index import LexicalIndex, code_terms, is_code
+from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install, populate_chunks
+
+
+@pytest.mark.parametrize("term", ["e204", "a320", "pn-88231", "xk-9931", "v2.1", "m10-10mm", "4471822"])
+def test_identifiers_are_codes(term):
+    assert is_code(term)
+
+
+@pytest.mark.parametrize(
+    "term",
+    [
+        # units
+        "10mm", "24v", "3.5mm", "1500rpm", "10x20", "2x4in", "24v-dc",
+        # ordinals
+        "1st", "2nd", "3rd", "4th",
+        # years and other plain numbers
+        "2024", "2024-01-15", "88231", "3.5",
+        # too short to tell from a word
+        "e2", "mk2", "pump",
+    ],
+)
+def test_measurements_ordinals_and_numbers_are_not_codes(term):
+    assert not is_code(term)
+
+
+def test_code_terms_keeps_only_identifiers():
+    query = "Error E204 on the 24V pump after the 1st 10mm bolt in 2024, part PN-88231"
+    assert code_terms(query) == {"e204", "pn-88231"}
+
+
+async def test_search_codes_skips_queries_without_codes():
+    # Returns before loading a partition, so no database is needed
+    index = LexicalIndex()
+    assert await index.search_codes("replace the 10mm bolt on the 2nd 24v unit from 2024", k=5, equipment_id="x") is None
+
+
+@pytest.fixture
+async def equipment_ids(monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_MAX_PARTITIONS", 2)
+    database = MemoryDatabase()
+    install(database)
+    ids = [ObjectId() for _ in range(3)]
+    for equipment_id in ids:
+        await populate_chunks(database, FakeEmbeddings(dimensions=8), 5, equipment_id)
+    return [str(equipment_id) for equipment_id in ids]
+
+
+async def test_least_recently_searched_partition_is_evicted(equipment_ids):
+    index = LexicalIndex()
+    first, second, third = equipment_ids
+    await index.search("pump", k=3, equipment_id=first, tenant_id=settings.TENANT_ID)
+    await index.search("pump", k=3, equipment_id=second, tenant_id=settings.TENANT_ID)
+    await index.search("pump", k=3, equipment_id=first, tenant_id=settings.TENANT_ID)
+    await index.search("pump", k=3, equipment_id=third, tenant_id=settings.TENANT_ID)
+
+    assert [equipment_id for (_, equipment_id), _ in index._partitions.items()] == [first, third]
+
+
+async def test_background_refresh_does_not_reinsert_an_evicted_partition(equipment_ids, monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_REFRESH_SECS", 1)
+    index = LexicalIndex()
+    first, second, third = equipment_ids
+    key = (settings.TENANT_ID, first)
+    await index.search("pump", k=3, equipment_id=first, tenant_id=settings.TENANT_ID)
+    index._partitions.peek(key).loaded_at -= 10
+
+    await index.search("pump", k=3, equipment_id=first, tenant_id=settings.TENANT_ID)  # starts the refresh
+    refresh = index._loads[key]
+    index._partitions.invalidate(key)  # evicted while the refresh runs
+    await refresh
+
+    assert key not in index._partitions
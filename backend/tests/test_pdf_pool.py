@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from app.config import settings
+from app.services import text_extraction
+from app.services.text_extraction import TextExtractionService, shutdown_pdf_pool
+from benchmarks.corpus import write_pdf
+
+
+@pytest.fixture
+def pdf_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_WORKERS", 1)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(settings, "PDF_PAGES_PER_TASK", 2)
+    path = str(tmp_path / "manual.pdf")
+    write_pdf(path, [f"Page {i} covers the pump seal" for i in range(4)])
+    yield path
+    shutdown_pdf_pool()
+
+
+def test_broken_pool_is_rebuilt(pdf_path):
+    service = TextExtractionService()
+    assert "Page 3" in service.extract_text(pdf_path, "application/pdf")
+
+    # A worker dying takes the whole pool down with it
+    broken = text_extraction._get_pdf_pool()
+    with pytest.raises(Exception):
+        broken.submit(os._exit, 1).result()
+
+    text = service.extract_text(pdf_path, "application/pdf")
+
+    assert "Page 0" in text and "Page 3" in text
+    assert text_extraction._pdf_pool is not broken
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+V1 = b"Pump manual. Check the seal every month.\n\n" * 40
+V2 = b"Pump manual, revised. Check the seal every week.\n\n" * 40
+
+
+def stored_files(root):
+    return {os.path.relpath(os.path.join(path, name), root) for path, _, names in os.walk(root) for name in names}
+
+
+async def wait_for_status(database, document_id, wanted):
+    for _ in range(500):
+        document = await database.documents_metadata.find_one({"_id": document_id})
+        if document["embedding_status"] == wanted:
+            return document
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"document never reached {wanted}")
+
+
+async def test_replace_keeps_the_old_file_until_the_new_version_completes(documents_api, tmp_path):
+    client, database, services, documents_url = documents_api
+    await client.post(documents_url, files=[("files", ("manual.txt", V1, "text/plain"))])
+    document_id = (await database.documents_metadata.find_one({}))["_id"]
+    await services.ingestion_service.process_document(document_id)
+    v1_key = (await wait_for_status(database, document_id, "completed"))["storage_key"]
+
+    response = await client.put(f"{documents_url}/{document_id}", files=[("file", ("manual.txt", V2, "text/plain"))])
+    assert response.status_code == 202
+    document = await database.documents_metadata.find_one({"_id": document_id})
+    assert document["previous_storage_key"] == v1_key
+    assert v1_key in stored_files(tmp_path)
+
+    # A second replace while the first is queued is refused and leaves no file behind
+    files_before = stored_files(tmp_path)
+    response = await client.put(f"{documents_url}/{document_id}", files=[("file", ("manual.txt", V1, "text/plain"))])
+    assert response.status_code == 409
+    assert stored_files(tmp_path) == files_before
+
+    await services.ingestion_service.process_document(document_id)
+    document = await wait_for_status(database, document_id, "completed")
+    assert document["previous_storage_key"] is None
+    assert stored_files(tmp_path) == {document["storage_key"]}
+
+
+async def test_replacing_a_failed_version_drops_its_file_and_keeps_the_committed_one(documents_api, tmp_path):
+    client, database, services, documents_url = documents_api
+    await client.post(documents_url, files=[("files", ("manual.txt", V1, "text/plain"))])
+    document_id = (await database.documents_metadata.find_one({}))["_id"]
+    await services.ingestion_service.process_document(document_id)
+    v1_key = (await wait_for_status(database, document_id, "completed"))["storage_key"]
+
+    await client.put(f"{documents_url}/{document_id}", files=[("file", ("manual.txt", V2, "text/plain"))])
+    failed_key = (await database.documents_metadata.find_one({"_id": document_id}))["storage_key"]
+    await database.documents_metadata.update_one({"_id": document_id}, {"$set": {"embedding_status": "failed"}})
+
+    response = await client.put(f"{documents_url}/{document_id}", files=[("file", ("manual.txt", V2, "text/plain"))])
+
+    assert response.status_code == 202
+    document = await database.documents_metadata.find_one({"_id": document_id})
+    assert document["previous_storage_key"] == v1_key
+    assert stored_files(tmp_path) == {v1_key, document["storage_key"]}
+    assert failed_key not in stored_files(tmp_path)
+
+
+async def test_replace_with_a_traversal_name_is_stored_inside_the_upload_dir(documents_api, tmp_path):
+    client, database, services, documents_url = documents_api
+    await client.post(documents_url, files=[("files", ("manual.txt", V1, "text/plain"))])
+    document_id = (await database.documents_metadata.find_one({}))["_id"]
+    await services.ingestion_service.process_document(document_id)
+    name = "../../../../../../../tmp/replaced.txt"
+
+    response = await client.put(f"{documents_url}/{document_id}", files=[("file", (name, V2, "text/plain"))])
+
+    assert response.status_code == 202
+    document = await database.documents_metadata.find_one({"_id": document_id})
+    assert document["file_name"] == name
+    assert document["storage_key"] in stored_files(tmp_path)
+    assert not os.path.exists("/tmp/replaced.txt")
@@ -0,0 +1,40 @@
+from bson import ObjectId
+
+from app.config import settings
+from app.services.retrieval_tuning import RetrievalTuning
+from benchmarks.stand_ins import MemoryDatabase, install
+from scripts.tune_retrieval import choose
+
+
+def row(k, num_candidates, recall, labelled):
+    return {"bucket": 100, "k": k, "num_candidates": num_candidates, "queries": 10, "labelled": labelled, "recall": recall}
+
+
+def test_choose_recommends_the_smallest_k_only_for_labelled_queries():
+    rows = [row(3, 30, 0.97, 10), row(5, 25, 0.90, 10), row(5, 50, 0.96, 10)]
+
+    entries = choose(rows, target_recall=0.95)
+
+    assert [(entry["k"], entry["num_candidates"]) for entry in entries] == [(3, 30), (5, 50)]
+    assert entries[0]["recommended"] and "recommended" not in entries[1]
+
+
+def test_choose_recommends_nothing_for_sampled_queries():
+    entries = choose([row(3, 30, 0.99, 0), row(5, 50, 0.96, 0)], target_recall=0.95)
+
+    assert [entry["k"] for entry in entries] == [3, 5]
+    assert not any(entry.get("recommended") for entry in entries)
+
+
+async def test_without_a_recommendation_the_default_k_keeps_its_tuned_num_candidates(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_DEFAULT_K", 5)
+    database = MemoryDatabase()
+    install(database)
+    equipment_id = ObjectId()
+    await database[settings.DOCUMENT_CHUNKS_COLLECTION].insert_one({"equipment_id": equipment_id, "tenant_id": "t"})
+    await database[settings.RETRIEVAL_TUNING_COLLECTION].insert_many([
+        {"bucket": 100, "k": 3, "num_candidates": 30, "recommended": False},
+        {"bucket": 100, "k": 5, "num_candidates": 50, "recommended": False},
+    ])
+
+    assert await RetrievalTuning().parameters(None, str(equipment_id), "t") == (5, 50)
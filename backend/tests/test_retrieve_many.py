@@ -0,0 +1,40 @@
+from bson import ObjectId
+
+from app.config import settings
+from app.services.rag import RAGService
+from app.services.vector_store import NumpyVectorStore
+from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install, populate_chunks
+
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings(dimensions=8)
+        self.embedded = []
+
+    async def aembed_queries(self, texts):
+        self.embedded.extend(texts)
+        return self.embeddings.embed_documents(texts)
+
+
+async def test_code_queries_skip_the_embedding_batch(monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_EMBEDDING_CACHE_ENABLED", False)
+    database = MemoryDatabase()
+    install(database)
+    equipment_id = ObjectId()
+    await populate_chunks(database, FakeEmbeddings(dimensions=8), 5, equipment_id)
+    await database[settings.DOCUMENT_CHUNKS_COLLECTION].update_one(
+        {"chunk_index": 0}, {"$set": {"text": "Fault E204 means the inlet valve PN-88231 is stuck"}},
+    )
+    embeddings = RecordingEmbeddings()
+    rag_service = RAGService(vector_store=NumpyVectorStore(), embedding_service=embeddings)
+
+    results = await rag_service.retrieve_many(
+        ["what does error E204 mean", "how often should the pump be serviced"],
+        k=3,
+        equipment_id=str(equipment_id),
+        tenant_id=settings.TENANT_ID,
+    )
+
+    assert embeddings.embedded == ["how often should the pump be serviced"]
+    assert results[0].metadata.chunks[0].chunk_index == 0
+    assert results[1].metadata.chunks_retrieved == 3
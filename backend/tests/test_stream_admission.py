@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.routers import stream
+from app.services.admission import SessionAdmission
+
+
+class MissingEquipment:
+    async def get(self, equipment_id):
+        return None
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(stream.router, prefix="/api/v1/stream")
+    app.state.services = SimpleNamespace(
+        admission=SessionAdmission(max_sessions=1, queue_size=0),
+        equipment_cache=MissingEquipment(),
+    )
+    return app
+
+
+def close_code(client: TestClient) -> int:
+    with client.websocket_connect("/api/v1/stream/ws/unknown") as websocket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_text()
+    return closed.value.code
+
+
+def test_slot_is_released_when_the_session_ends(app):
+    admission = app.state.services.admission
+    with TestClient(app) as client:
+        assert close_code(client) == 4004
+        assert close_code(client) == 4004
+
+    assert admission.active == 0
+    assert admission.admitted_total == 2
+
+
+async def test_full_process_rejects_with_try_again_later(app):
+    admission = app.state.services.admission
+    await admission.acquire()
+    with TestClient(app) as client:
+        assert close_code(client) == 1013
+
+    assert admission.rejected_total == 1
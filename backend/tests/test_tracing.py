@@ -0,0 +1,37 @@
+from bson import ObjectId
+from prometheus_client import REGISTRY
+
+from app.config import settings
+from app.services.vector_store import AtlasVectorStore
+from app.tracing import span
+from benchmarks.stand_ins import FakeEmbeddings, MemoryDatabase, install, populate_chunks
+
+
+def span_count(name):
+    return REGISTRY.get_sample_value("span_duration_seconds_count", {"span": name}) or 0.0
+
+
+def test_span_drops_none_attributes(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+
+    with span("test.none", k=None, equipment_id="eq1") as traced:
+        traced.set_attribute("tenant_id", None)
+
+    assert traced.attributes == {"equipment_id": "eq1"}
+
+
+async def test_atlas_search_times_execution_and_cursor_drain_separately(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    database = MemoryDatabase()
+    install(database)
+    embeddings = FakeEmbeddings(dimensions=8)
+    equipment_id = ObjectId()
+    await populate_chunks(database, embeddings, 10, equipment_id)
+    before = span_count("atlas.vector_search"), span_count("atlas.cursor_drain")
+
+    hits = await AtlasVectorStore().search(
+        embeddings.embed_query("pump seal"), k=4, num_candidates=40, filters={"equipment_id": equipment_id},
+    )
+
+    assert len(hits) == 4
+    assert (span_count("atlas.vector_search"), span_count("atlas.cursor_drain")) == (before[0] + 1, before[1] + 1)
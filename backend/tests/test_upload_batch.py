@@ -0,0 +1,43 @@
+import os
+
+from app.config import settings
+
+
+def stored_files(root):
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+async def test_an_oversized_file_rejects_the_batch_before_anything_is_stored(documents_api, tmp_path, monkeypatch):
+    client, database, services, documents_url = documents_api
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE_BYTES", 16)
+
+    response = await client.post(documents_url, files=[
+        ("files", ("a.txt", b"pump seal", "text/plain")),
+        ("files", ("b.txt", b"x" * 64, "text/plain")),
+    ])
+
+    assert response.status_code == 413
+    assert await database.documents_metadata.count_documents({}) == 0
+    assert len(services.ingestion_service.queue) == 0
+    assert stored_files(tmp_path) == []
+
+
+async def test_a_file_whose_metadata_insert_fails_leaves_no_stored_copy(documents_api, tmp_path, monkeypatch):
+    client, database, services, documents_url = documents_api
+    insert_one = database.documents_metadata.insert_one
+
+    async def failing_insert(document):
+        if document["file_name"] == "b.txt":
+            raise RuntimeError("write failed")
+        return await insert_one(document)
+
+    monkeypatch.setattr(database.documents_metadata, "insert_one", failing_insert)
+
+    response = await client.post(documents_url, files=[
+        ("files", ("a.txt", b"pump seal", "text/plain")),
+        ("files", ("b.txt", b"valve seat", "text/plain")),
+    ])
+
+    assert response.status_code == 202
+    assert [doc["file_name"] for doc in response.json()["documents"]] == ["a.txt"]
+    assert len(stored_files(tmp_path)) == 1
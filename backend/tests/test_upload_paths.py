@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from app.config import settings
+from app.services.ingestion import IngestionService
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    ["../../../../../../tmp/x.txt", "..\\\\..\\\\windows\\\\x.txt", "/etc/cron.d/x.txt", "..", "manual v2 (final).pdf"],
+)
+def test_storage_key_stays_in_the_equipment_directory(file_name):
+    key = IngestionService.storage_key("tenant", "eq1", file_name)
+
+    directory, name = os.path.split(key)
+    assert directory == "tenant/equipment/eq1"
+    assert ".." not in name and "/" not in name and "\\\\" not in name
+
+
+def test_storage_path_rejects_keys_outside_the_upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+    assert IngestionService.storage_path("t/equipment/e/a.txt") == str(tmp_path / "t/equipment/e/a.txt")
+    with pytest.raises(ValueError):
+        IngestionService.storage_path("t/equipment/../../../x.txt")
+    with pytest.raises(ValueError):
+        IngestionService.storage_path("/tmp/x.txt")
+
+
+async def test_upload_with_a_traversal_name_is_stored_inside_the_upload_dir(documents_api, tmp_path):
+    client, database, _, documents_url = documents_api
+    name = "../../../../../../../tmp/escaped.txt"
+
+    response = await client.post(documents_url, files=[("files", (name, b"pump seal", "text/plain"))])
+
+    assert response.status_code == 202
+    document = await database.documents_metadata.find_one({})
+    assert document["file_name"] == name
+    assert os.path.isfile(IngestionService.storage_path(document["storage_key"]))
+    assert os.path.realpath(IngestionService.storage_path(document["storage_key"])).startswith(str(tmp_path))
+    assert not os.path.exists("/tmp/escaped.txt")
@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.voice_models import VoiceModels
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "VOICE_MODELS_LOAD_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "VOICE_MODELS_RETRY_BACKOFF_SECS", 0)
+
+
+def flaky_load(models: VoiceModels, failures: int):
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OSError("model file unreadable")
+        models._vad, models._turn = object(), object()
+
+    models.load = load
+    return calls
+
+
+def readiness(models: VoiceModels):
+    from main import readiness_check
+
+    services = SimpleNamespace(voice_models=models, ready=models.ready)
+    response = readiness_check(SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(services=services))))
+    return response.status_code, json.loads(response.body)
+
+
+async def test_warm_up_retries_until_it_loads():
+    models = VoiceModels()
+    calls = flaky_load(models, failures=2)
+
+    await models.wait_ready()
+
+    assert models.ready and not models.failed
+    assert len(calls) == 3
+    assert models.status()["state"] == "ready"
+    assert readiness(models)[0] == 200
+
+
+async def test_warm_up_failure_is_reported():
+    models = VoiceModels()
+    calls = flaky_load(models, failures=10)
+
+    with pytest.raises(RuntimeError, match="model file unreadable"):
+        await models.wait_ready()
+
+    assert models.failed
+    assert len(calls) == settings.VOICE_MODELS_LOAD_ATTEMPTS
+    code, body = readiness(models)
+    assert code == 503
+    assert body["status"] == "failed"
+    assert "model file unreadable" in body["reason"]